@@ -1,26 +1,3181 @@
+import asyncio
+import bisect
+import codecs
+import copy
+import csv
+import gzip
+import hashlib
+import inspect
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
 import requests
-from typing import Union, Literal, Dict, List
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from itertools import islice
+from urllib.parse import urlencode
+from requests.adapters import HTTPAdapter
+from typing import Union, Literal, Dict, List, Tuple, Callable, Iterable, Iterator, AsyncIterator, Mapping, BinaryIO
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# orjson decodes API responses several times faster than the standard library, when it is installed.
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+class RateLimiter:
+    """
+    Client-side token bucket. Every request takes one token; tokens refill at rate per second up to burst.
+    When the bucket is empty, callers wait for their turn instead of being rejected by the API.
+
+    The bucket also adapts to the API's responses: a Retry-After header, or an exhausted
+    X-RateLimit-Remaining with its X-RateLimit-Reset, pauses every caller until the server allows requests
+    again, and a lower X-RateLimit-Remaining shrinks the tokens available. Share one instance between all
+    clients that use the same API key.
+
+    ### Args:
+        * rate (float): The number of requests allowed per second. Defaults to 5.
+        * burst (int | None): The maximum number of requests sent back to back. Defaults to rate.
+    """
+
+    def __init__(self, rate: float = 5, burst: Union[int, None] = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens +
+                               (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(delay, self._paused_until - now)
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent
+        """
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """
+        Waits without blocking the event loop until a request may be sent
+        """
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def update(self, status: int, headers: Mapping[str, str]):
+        """
+        Adapts the bucket to the rate-limit headers of a response
+        """
+        now = time.monotonic()
+        pause = _retry_after(headers) if status == 429 else None
+        remaining = headers.get('X-RateLimit-Remaining')
+        if pause is None and remaining is not None and remaining.strip() == '0':
+            pause = _reset_after(headers)
+        if pause is None and status == 429:
+            pause = 1 / self.rate
+        with self._lock:
+            if pause is not None:
+                self._paused_until = max(self._paused_until, now + pause)
+                self._tokens = min(self._tokens, 0.0)
+            elif remaining is not None and remaining.strip().isdigit():
+                self._tokens = min(self._tokens, float(remaining))
+
+
+def _retry_after(headers: Mapping[str, str]) -> Union[float, None]:
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _reset_after(headers: Mapping[str, str]) -> Union[float, None]:
+    value = headers.get('X-RateLimit-Reset')
+    try:
+        reset = float(value)
+    except (TypeError, ValueError):
+        return None
+    # Either an epoch timestamp or a number of seconds until the window resets.
+    return max(0.0, reset - time.time()) if reset > 1e9 else reset
+
+
+class MemoryCacheBackend:
+    """
+    In-process LRU store for ResponseCache. Thread-safe.
+
+    ### Args:
+        * maxsize (int): The maximum number of responses kept. The least recently used one is evicted first.
+          Defaults to 1024.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        value, expires = entry
+        return copy.deepcopy(value), expires
+
+    def set(self, key: str, value, expires: float):
+        with self._lock:
+            self._entries[key] = (copy.deepcopy(value), expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, path: str):
+        with self._lock:
+            for key in [key for key in self._entries if key == path or key.startswith(path + '?')]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend:
+    """
+    On-disk LRU store for ResponseCache, kept in a SQLite database so it survives restarts and can be shared
+    by processes on the same machine.
+
+    ### Args:
+        * path (str): The path of the database file
+        * maxsize (int): The maximum number of responses kept. The least recently used one is evicted first.
+          Defaults to 10000.
+    """
+
+    def __init__(self, path: str, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, expires REAL, used REAL)')
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS responses_used ON responses (used)')
+        self._db.commit()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT value, expires FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                'UPDATE responses SET used = ? WHERE key = ?', (time.time(), key))
+            self._db.commit()
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value, expires: float):
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)',
+                             (key, json.dumps(value), expires, time.time()))
+            self._db.execute('DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY used DESC LIMIT -1 OFFSET ?)',
+                             (self.maxsize,))
+            self._db.commit()
+
+    def delete(self, path: str):
+        with self._lock:
+            self._db.execute('DELETE FROM responses WHERE key = ? OR substr(key, 1, ?) = ?',
+                             (path, len(path) + 1, path + '?'))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM responses')
+            self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+class ResponseCache:
+    """
+    Opt-in TTL cache for read-mostly GET endpoints. Only endpoints listed in ttls are cached, keyed by their
+    path, query and account (a hash of the client's API key and base url), so clients of different accounts
+    can share one cache without seeing each other's responses. A successful write to a path invalidates the
+    cached GET responses of that same path (e.g. save_sequences invalidates get_sequences of that campaign),
+    as well as the endpoints listed for it in invalidations, for every account.
+
+    ### Args:
+        * ttls (Dict[str, float], optional): The time to live in seconds of each cached endpoint template.
+          Defaults to default_ttls.
+        * backend (MemoryCacheBackend | SQLiteCacheBackend, optional): Where responses are stored. Any object with the
+          same get/set/delete/clear methods works. Defaults to a MemoryCacheBackend.
+        * invalidations (Dict[str, List[str]], optional): The endpoint templates invalidated by a write to each endpoint
+          template, in addition to its own path. Defaults to default_invalidations.
+    """
+
+    default_ttls = {
+        '/campaigns': 300,
+        '/campaigns/{campaign_id}/sequences': 300,
+        '/campaigns/{campaign_id}/webhooks': 300,
+        '/leads/fetch-categories': 3600,
+        '/email-accounts': 300,
+        '/client': 600,
+    }
+
+    default_invalidations = {
+        '/campaigns/create': ['/campaigns'],
+        '/campaigns/{campaign_id}': ['/campaigns', '/campaigns/{campaign_id}/sequences', '/campaigns/{campaign_id}/webhooks'],
+        '/campaigns/{campaign_id}/settings': ['/campaigns'],
+        '/campaigns/{campaign_id}/status': ['/campaigns'],
+        '/email-accounts/{email_account_id}': ['/email-accounts'],
+        '/email-accounts/{email_account_id}/warmup': ['/email-accounts'],
+        '/email-accounts/reconnect-failed-email-accounts': ['/email-accounts'],
+        '/client/save': ['/client'],
+    }
+
+    def __init__(self, ttls: Union[Dict[str, float], None] = None, backend=None,
+                 invalidations: Union[Dict[str, List[str]], None] = None):
+        self.ttls = self.default_ttls if ttls is None else ttls
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.invalidations = self.default_invalidations if invalidations is None else invalidations
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(path: str, query: Union[Dict, None], account: str) -> str:
+        # The account goes in the query part, so that invalidating a path still matches every account's entries.
+        params = sorted((k, v) for k, v in (query or {}).items() if v is not None)
+        return f"{path}?{urlencode([*params, ('account', account)])}"
+
+    def get(self, method: str, endpoint: str, path: str, query: Union[Dict, None] = None, account: str = ''):
+        """
+        Returns (True, response) for a fresh cached response and (False, None) otherwise
+        """
+        if method != 'GET' or endpoint not in self.ttls:
+            return False, None
+        entry = self.backend.get(self._key(path, query, account))
+        if entry is None or entry[1] < time.time():
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, entry[0]
+
+    def update(self, method: str, endpoint: str, path: str, query: Union[Dict, None], path_params: Dict, response,
+               account: str = ''):
+        """
+        Stores a successful GET response, or applies the invalidations of a successful write
+        """
+        if method == 'GET':
+            if endpoint in self.ttls:
+                self.backend.set(self._key(path, query, account), response,
+                                 time.time() + self.ttls[endpoint])
+            return
+        self.backend.delete(path)
+        for related in self.invalidations.get(endpoint, []):
+            self.backend.delete(related.format(**path_params))
+
+    def invalidate(self, path: str):
+        """
+        Drops every cached response of a path, e.g. '/campaigns/42/sequences'
+        """
+        self.backend.delete(path)
+
+    def clear(self):
+        """
+        Drops every cached response
+        """
+        self.backend.clear()
+
+
+class RequestEvent:
+    """
+    Describes one API request to the hooks of a transport. endpoint is the endpoint template, e.g.
+    '/campaigns/{campaign_id}/statistics', and path the formatted path. status, latency (seconds, including
+    retries and their backoff), response_bytes and retries are set once the request completed, and error if
+    it raised. hedges counts the hedge requests sent and hedge_wins the ones that answered first.
+    """
+
+    __slots__ = ('method', 'endpoint', 'path', 'status', 'latency',
+                 'request_bytes', 'response_bytes', 'retries', 'hedges', 'hedge_wins', 'error')
+
+    def __init__(self, method: str, endpoint: str, path: str, request_bytes: int = 0):
+        self.method = method
+        self.endpoint = endpoint
+        self.path = path
+        self.status = None
+        self.latency = None
+        self.request_bytes = request_bytes
+        self.response_bytes = None
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.error = None
+
+    def __repr__(self):
+        return (f"RequestEvent({self.method} {self.endpoint}, status={self.status}, latency={self.latency}, "
+                f"request_bytes={self.request_bytes}, response_bytes={self.response_bytes}, retries={self.retries})")
+
+
+# The exceptions raised when a request exceeded its timeout. aiohttp's timeouts subclass asyncio.TimeoutError.
+_TIMEOUT_ERRORS = (requests.Timeout, asyncio.TimeoutError)
+
+
+class MetricsCollector:
+    """
+    Aggregates the RequestEvents of one or more clients per endpoint template: call and error counts,
+    retries, timeouts, hedge requests and wins, calls rejected by a circuit breaker, bytes sent and received,
+    and a latency histogram. Attach it to a client with collector.attach(client).
+
+    ### Args:
+        * buckets (Tuple[float, ...]): The upper bounds in seconds of the latency histogram buckets.
+          Defaults to default_buckets.
+    """
+
+    default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                       0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+    def __init__(self, buckets: Tuple[float, ...] = default_buckets):
+        self.buckets = tuple(buckets) if buckets[-1] == float(
+            'inf') else tuple(buckets) + (float('inf'),)
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def attach(self, client) -> 'MetricsCollector':
+        """
+        Registers the collector's hooks on a Smartlead or AsyncSmartlead client, or on a transport
+        """
+        client.add_hook('after_response', self.record)
+        client.add_hook('on_error', self.record)
+        return self
+
+    def record(self, event: RequestEvent):
+        """
+        Adds a completed or failed request to the aggregates
+        """
+        key = f"{event.method} {event.endpoint}"
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = {
+                    'calls': 0, 'errors': 0, 'retries': 0, 'timeouts': 0, 'hedges': 0, 'hedge_wins': 0,
+                    'rejected': 0, 'total_latency': 0.0, 'max_latency': 0.0, 'request_bytes': 0,
+                    'response_bytes': 0, 'histogram': [0] * len(self.buckets)}
+            stats['calls'] += 1
+            if event.error is not None or (event.status or 0) >= 400:
+                stats['errors'] += 1
+            if isinstance(event.error, _TIMEOUT_ERRORS):
+                stats['timeouts'] += 1
+            elif isinstance(event.error, CircuitOpenError):
+                stats['rejected'] += 1
+            stats['retries'] += event.retries
+            stats['hedges'] += event.hedges
+            stats['hedge_wins'] += event.hedge_wins
+            stats['request_bytes'] += event.request_bytes or 0
+            stats['response_bytes'] += event.response_bytes or 0
+            latency = event.latency or 0.0
+            stats['total_latency'] += latency
+            stats['max_latency'] = max(stats['max_latency'], latency)
+            stats['histogram'][bisect.bisect_left(self.buckets, latency)] += 1
+
+    def _percentile(self, histogram: List[int], q: float) -> float:
+        rank = q * sum(histogram)
+        seen = 0
+        for bound, count in zip(self.buckets, histogram):
+            seen += count
+            if count and seen >= rank:
+                return bound
+        return 0.0
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Returns the aggregates of every endpoint, keyed by 'METHOD /endpoint/{template}'. p50 and p99 are the
+        upper bounds of the histogram buckets they fall in.
+        """
+        with self._lock:
+            endpoints = copy.deepcopy(self._endpoints)
+        for stats in endpoints.values():
+            stats['mean_latency'] = stats['total_latency'] / stats['calls']
+            stats['p50'] = self._percentile(stats['histogram'], 0.5)
+            stats['p99'] = self._percentile(stats['histogram'], 0.99)
+            stats['histogram'] = dict(zip(self.buckets, stats['histogram']))
+        return endpoints
+
+    def hot_paths(self, n: int = 10) -> List[Tuple[str, Dict]]:
+        """
+        Returns the n endpoints with the most total time spent in them
+        """
+        return sorted(self.snapshot().items(), key=lambda item: item[1]['total_latency'], reverse=True)[:n]
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+class _NestedRecord:
+    """
+    Descriptor decoding a nested object (or list of objects) into its record class on first access
+    """
+
+    def __init__(self, slot: str, record: type):
+        self.slot = slot
+        self.record = record
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = getattr(instance, self.slot)
+        if isinstance(value, dict):
+            value = self.record(value)
+            setattr(instance, self.slot, value)
+        elif isinstance(value, list):
+            value = [self.record(item) if isinstance(item, dict) else item for item in value]
+            setattr(instance, self.slot, value)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.slot, value)
+
+
+class Record:
+    """
+    Base of the typed response records returned by clients created with typed=True. A record stores its
+    fields in __slots__ instead of a per-row dict, which takes about half the memory for pages of
+    thousands of rows. The trade-off is speed: every row is still decoded into a dict first and then copied
+    field by field into its record, so decoding a page takes longer than with dicts (roughly half the rows
+    per second when decoding alone; a few percent of a page request's time against a local server).
+    Fields the API returns beyond the declared ones are kept in extra, and fields it leaves out read as
+    None. Nested objects stay as decoded JSON until they are first accessed.
+
+    Records also support record['field'], record.get('field') and 'field' in record, so code written
+    against the dict responses keeps working. to_dict() returns the plain JSON object.
+    """
+
+    __slots__ = ('extra',)
+    _nested: Dict[str, type] = {}
+    _slots: Dict[str, str] = {}
+    _names = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Subclasses of a record class (e.g. per event type) inherit its fields, so collect them along the MRO.
+        slots = [name for base in reversed(cls.__mro__) for name in base.__dict__.get('__slots__', ())]
+        cls._slots = {name: name for name in slots if not name.startswith('_') and name != 'extra'}
+        for name, record in cls._nested.items():
+            cls._slots[name] = f'_{name}'
+            setattr(cls, name, _NestedRecord(f'_{name}', record))
+        cls._names = frozenset(cls._slots) | frozenset(cls._slots.values())
+
+    def __init__(self, data: Mapping):
+        slots = self._slots
+        extra = None
+        for key, value in data.items():
+            slot = slots.get(key)
+            if slot is not None:
+                setattr(self, slot, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self.extra = extra
+
+    def __getattr__(self, name):
+        # Only reached for slots the response did not set.
+        if name in self._names:
+            return None
+        raise AttributeError(
+            f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def __getitem__(self, key: str):
+        if key in self._slots:
+            return getattr(self, key)
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.to_dict()
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict:
+        """
+        Returns the record as the JSON object it was decoded from, with nested records converted back too
+        """
+        data = {}
+        for name, slot in self._slots.items():
+            try:
+                value = object.__getattribute__(self, slot)
+            except AttributeError:
+                continue
+            if isinstance(value, Record):
+                value = value.to_dict()
+            elif isinstance(value, list):
+                value = [item.to_dict() if isinstance(item, Record) else item for item in value]
+            data[name] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __reduce__(self):
+        return type(self), (self.to_dict(),)
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return type(self) is type(other) and self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={value!r}' for name, value in self.to_dict().items())
+        return f'{type(self).__name__}({fields})'
+
+
+class Campaign(Record):
+    """
+    A campaign, as returned by campaigns.get, campaigns.all and leads.get_campaigns
+    """
+    __slots__ = ('id', 'user_id', 'created_at', 'updated_at', 'status', 'name', 'track_settings',
+                 'scheduler_cron_value', 'min_time_btwn_emails', 'max_leads_per_day', 'stop_lead_settings',
+                 'unsubscribe_text', 'client_id', 'enable_ai_esp_matching', 'send_as_plain_text',
+                 'follow_up_percentage', 'parent_campaign_id')
+
+
+class Lead(Record):
+    """
+    A lead, as returned by leads.get_by_email_address and nested in every CampaignLead
+    """
+    __slots__ = ('id', 'first_name', 'last_name', 'email', 'phone_number', 'company_name', 'website',
+                 'location', 'custom_fields', 'linkedin_profile', 'company_url', 'is_unsubscribed',
+                 'created_at', 'updated_at', 'user_id')
+
+
+class CampaignLead(Record):
+    """
+    A lead of a campaign, as listed by campaigns.get_leads and campaigns.iter_leads. The lead is decoded
+    into a Lead when first accessed.
+    """
+    __slots__ = ('campaign_lead_map_id', 'lead_category_id', 'status', 'created_at', '_lead')
+    _nested = {'lead': Lead}
+
+
+class StatisticsRow(Record):
+    """
+    One sent email of a campaign, as listed by campaigns.get_statistics and campaigns.iter_statistics
+    """
+    __slots__ = ('lead_name', 'lead_email', 'lead_category', 'sequence_number', 'email_campaign_seq_id',
+                 'seq_variant_id', 'email_subject', 'email_message', 'sent_time', 'open_time', 'click_time',
+                 'reply_time', 'open_count', 'click_count', 'is_unsubscribed', 'is_bounced', 'email_status')
+
+
+class WarmupDetails(Record):
+    """
+    The warmup settings and counters of an email account
+    """
+    __slots__ = ('id', 'status', 'total_sent_count', 'total_spam_count', 'warmup_reputation',
+                 'warmup_key_id', 'warmup_created_at', 'reply_rate', 'blocked_reason')
+
+
+class EmailAccount(Record):
+    """
+    An email account, as returned by email_accounts.all and campaigns.get_all_email_accounts. Its
+    warmup_details are decoded into WarmupDetails when first accessed.
+    """
+    __slots__ = ('id', 'created_at', 'updated_at', 'user_id', 'from_name', 'from_email', 'username',
+                 'smtp_host', 'smtp_port', 'smtp_port_type', 'message_per_day', 'max_email_per_day',
+                 'different_reply_to_address', 'is_different_imap_account', 'imap_username', 'imap_host',
+                 'imap_port', 'imap_port_type', 'signature', 'custom_tracking_domain', 'bcc_email',
+                 'is_smtp_success', 'is_imap_success', 'smtp_failure_error', 'imap_failure_error', 'type',
+                 'daily_sent_count', 'client_id', 'campaign_count', '_warmup_details')
+    _nested = {'warmup_details': WarmupDetails}
+
+
+def _to_records(response, record: type, key: Union[str, None]):
+    if key is not None:
+        if isinstance(response, dict) and isinstance(response.get(key), list):
+            response[key] = [record(row) if isinstance(row, dict) else row for row in response[key]]
+        return response
+    if isinstance(response, list):
+        return [record(row) if isinstance(row, dict) else row for row in response]
+    if isinstance(response, dict):
+        return record(response)
+    return response
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'shared')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.shared = False
+
+
+class RequestCoalescer:
+    """
+    Single-flight coalescing of identical GET requests. While a GET is in flight, the same GET (same url and
+    query) made from another thread or task waits for it and shares its response instead of sending a
+    request of its own. Once the request completed, the next identical GET is sent again, so responses are
+    never older than the request they waited for. Use a ResponseCache to reuse responses for longer.
+
+    Callers that shared a response each get their own copy of it. hits counts the calls served by another
+    call's request, and misses the calls that sent a request. One coalescer can be shared by the sync and
+    async clients of several accounts, as the api key is part of the url.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._tasks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def run(self, key: Tuple, fetch: Callable):
+        """
+        Returns fetch() or, when a call with the same key is already running in another thread, its result
+
+        ### Args:
+            * key (Tuple): The identity of the request
+            * fetch (Callable): Sends the request
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                flight.shared = True
+                self.hits += 1
+        if leader:
+            try:
+                flight.result = fetch()
+            except BaseException as e:
+                flight.error = e
+            finally:
+                # Nobody can join the flight once it is removed, so flight.shared is final from here.
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return copy.deepcopy(flight.result) if flight.shared else flight.result
+
+    async def arun(self, key: Tuple, fetch: Callable):
+        """
+        Returns await fetch() or, when a call with the same key is already running on this event loop, its
+        result. Cancelling one caller does not cancel the request the others wait for.
+
+        ### Args:
+            * key (Tuple): The identity of the request
+            * fetch (Callable[[], Awaitable]): Sends the request
+        """
+        key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            flight = self._tasks.get(key)
+            if flight is None:
+                flight = self._tasks[key] = [asyncio.ensure_future(fetch()), 1]
+                flight[0].add_done_callback(lambda _: self._land(key, flight))
+                self.misses += 1
+            else:
+                flight[1] += 1
+                self.hits += 1
+        result = await asyncio.shield(flight[0])
+        return copy.deepcopy(result) if flight[1] > 1 else result
+
+    def _land(self, key: Tuple, flight: List):
+        with self._lock:
+            if self._tasks.get(key) is flight:
+                del self._tasks[key]
+
+    @property
+    def in_flight(self) -> int:
+        """
+        The number of distinct requests currently in flight
+        """
+        with self._lock:
+            return len(self._flights) + len(self._tasks)
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of sending a request to an endpoint whose circuit breaker is open. retry_after is the
+    number of seconds until the breaker lets a probe request through.
+    """
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(f'Circuit open for {endpoint}, retry in {retry_after:.1f}s')
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Fails fast on endpoints whose error rate spiked, instead of letting callers queue up behind a degraded
+    API. Outcomes are tracked per endpoint template ('METHOD /endpoint/{template}') over a sliding window;
+    exceptions (timeouts, connection errors) and 5xx responses count as failures. Once at least min_calls
+    requests were seen in the window and failure_rate of them failed, the circuit opens: requests to that
+    endpoint raise CircuitOpenError without being sent. After cooldown seconds a single probe request is let
+    through; its success closes the circuit and its failure opens it again.
+
+    trips counts the times a circuit opened, rejected the requests it refused, and transitions keeps the
+    last state changes as (time.time(), endpoint, 'open' | 'half-open' | 'closed'). One breaker can be shared
+    by several transports.
+
+    ### Args:
+        * failure_rate (float): The fraction of failed requests that opens the circuit. Defaults to 0.5.
+        * min_calls (int): The minimum number of requests in the window before the circuit can open. Defaults to 20.
+        * window (float): The length in seconds of the sliding window. Defaults to 60.
+        * cooldown (float): How long in seconds the circuit stays open before a probe is let through. Defaults to 30.
+    """
+
+    def __init__(self, failure_rate: float = 0.5, min_calls: int = 20, window: float = 60, cooldown: float = 30):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self.trips = 0
+        self.rejected = 0
+        self.transitions = deque(maxlen=100)
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._opened = {}
+        self._probing = set()
+
+    def _transition(self, endpoint: str, state: str):
+        self.transitions.append((time.time(), endpoint, state))
+
+    def allow(self, endpoint: str):
+        """
+        Raises CircuitOpenError when requests to the endpoint must not be sent
+        """
+        with self._lock:
+            opened = self._opened.get(endpoint)
+            if opened is None:
+                return
+            remaining = opened + self.cooldown - time.monotonic()
+            if remaining <= 0 and endpoint not in self._probing:
+                self._probing.add(endpoint)
+                self._transition(endpoint, 'half-open')
+                return
+            self.rejected += 1
+        raise CircuitOpenError(endpoint, max(remaining, 0.0))
+
+    def record(self, endpoint: str, failed: Union[bool, None]):
+        """
+        Records the outcome of a request let through by allow. None (e.g. a cancelled request) records nothing.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if endpoint in self._probing:
+                if failed is None:
+                    self._probing.discard(endpoint)
+                elif failed:
+                    self._probing.discard(endpoint)
+                    self._opened[endpoint] = now
+                    self._transition(endpoint, 'open')
+                else:
+                    self._probing.discard(endpoint)
+                    del self._opened[endpoint]
+                    self._transition(endpoint, 'closed')
+                return
+            if failed is None or endpoint in self._opened:
+                return
+            calls = self._calls.setdefault(endpoint, [deque(), 0])
+            calls[0].append((now, failed))
+            calls[1] += failed
+            while calls[0][0][0] < now - self.window:
+                calls[1] -= calls[0].popleft()[1]
+            if len(calls[0]) >= self.min_calls and calls[1] >= self.failure_rate * len(calls[0]):
+                del self._calls[endpoint]
+                self._opened[endpoint] = now
+                self.trips += 1
+                self._transition(endpoint, 'open')
+
+    def state(self, endpoint: str) -> str:
+        """
+        Returns 'closed', 'open' or 'half-open'
+        """
+        with self._lock:
+            if endpoint in self._probing:
+                return 'half-open'
+            return 'open' if endpoint in self._opened else 'closed'
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Returns the state, requests and failures in the window of every endpoint seen
+        """
+        with self._lock:
+            endpoints = set(self._calls) | set(self._opened)
+            calls = {endpoint: (len(self._calls[endpoint][0]), self._calls[endpoint][1]) if endpoint in self._calls else (0, 0)
+                     for endpoint in endpoints}
+        return {endpoint: {'state': self.state(endpoint), 'calls': calls[endpoint][0], 'failures': calls[endpoint][1]}
+                for endpoint in endpoints}
+
+
+class HedgePolicy:
+    """
+    Hedged GET requests: when a GET has not been answered after the delay its endpoint usually answers in,
+    a second identical request is sent and the first response to arrive wins. This trims the latency tail
+    caused by one slow connection or server at the cost of a few extra requests. Only GETs are hedged, as
+    they are safe to send twice.
+
+    The delay of each endpoint template is the quantile of its recent latencies, bounded by min_delay and
+    max_delay; initial_delay is used until min_samples latencies were seen. hedged counts the hedge requests
+    sent per endpoint and wins the ones that answered first.
+
+    ### Args:
+        * quantile (float): The latency quantile after which a hedge request is sent. Defaults to 0.95.
+        * min_delay (float): The minimum delay in seconds. Defaults to 0.05.
+        * max_delay (float): The maximum delay in seconds. Defaults to 5.
+        * initial_delay (float): The delay in seconds before enough latencies were seen. Defaults to 1.
+        * min_samples (int): The number of latencies needed to use the quantile. Defaults to 20.
+        * window (int): The number of recent latencies kept per endpoint. Defaults to 200.
+        * endpoints (Iterable[str], optional): The endpoint templates to hedge, e.g.
+          ['/campaigns/{campaign_id}/statistics']. Defaults to every GET.
+    """
+
+    def __init__(self, quantile: float = 0.95, min_delay: float = 0.05, max_delay: float = 5, initial_delay: float = 1,
+                 min_samples: int = 20, window: int = 200, endpoints: Union[Iterable[str], None] = None):
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.endpoints = None if endpoints is None else set(endpoints)
+        self.hedged = {}
+        self.wins = {}
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def applies(self, method: str, endpoint: str) -> bool:
+        return method == 'GET' and (self.endpoints is None or endpoint in self.endpoints)
+
+    def delay(self, endpoint: str) -> float:
+        """
+        Returns how long to wait for a response before sending a hedge request
+        """
+        with self._lock:
+            latencies = sorted(self._latencies.get(endpoint, ()))
+        if len(latencies) < self.min_samples:
+            return self.initial_delay
+        return min(self.max_delay, max(self.min_delay, latencies[min(len(latencies) - 1, int(self.quantile * len(latencies)))]))
+
+    def observe(self, endpoint: str, latency: float, hedged: bool = False, won: bool = False):
+        """
+        Records the latency of the response that won, and whether a hedge was sent and won
+        """
+        with self._lock:
+            latencies = self._latencies.get(endpoint)
+            if latencies is None:
+                latencies = self._latencies[endpoint] = deque(maxlen=self.window)
+            latencies.append(latency)
+            if hedged:
+                self.hedged[endpoint] = self.hedged.get(endpoint, 0) + 1
+            if won:
+                self.wins[endpoint] = self.wins.get(endpoint, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Returns the current delay, hedge requests sent and hedge wins of every endpoint seen
+        """
+        with self._lock:
+            endpoints = list(self._latencies)
+        return {endpoint: {'delay': self.delay(endpoint), 'hedged': self.hedged.get(endpoint, 0), 'wins': self.wins.get(endpoint, 0)}
+                for endpoint in endpoints}
+
+
+class _BaseTransport:
+    """
+    Settings, retry policy and hooks shared by the sync and async transports
+    """
+
+    retry_statuses = (429, 500, 502, 503, 504)
+    idempotent_methods = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+    hook_names = ('before_request', 'after_response', 'on_error')
+
+    # The record class of each GET endpoint template when typed is on, and the key of the response's rows
+    # (None when the whole response is the record or list of records).
+    response_models = {
+        '/campaigns': (Campaign, None),
+        '/campaigns/{campaign_id}': (Campaign, None),
+        '/campaigns/{campaign_id}/email-accounts': (EmailAccount, None),
+        '/campaigns/{campaign_id}/leads': (CampaignLead, 'data'),
+        '/campaigns/{campaign_id}/statistics': (StatisticsRow, 'data'),
+        '/leads': (Lead, None),
+        '/leads/{lead_id}/campaigns': (Campaign, None),
+        '/email-accounts': (EmailAccount, None),
+    }
+
+    def __init__(self, timeout, rate_limiter: Union[RateLimiter, None], max_retries: int, backoff: float,
+                 max_backoff: float, retry_non_idempotent: bool, cache: Union[ResponseCache, None],
+                 api_key: Union[str, None], base_url: Union[str, None], typed: bool,
+                 coalescer: Union[RequestCoalescer, None], timeouts: Union[Dict, None],
+                 hedging: Union[HedgePolicy, None], circuit_breaker: Union[CircuitBreaker, None],
+                 compress_requests: Union[int, None], compress_responses: bool):
+        self.compress_requests = compress_requests
+        self.compress_responses = compress_responses
+        self.timeouts = timeouts or {}
+        self.hedging = hedging
+        self.circuit_breaker = circuit_breaker
+        self.api_key = api_key
+        self.base_url = base_url
+        self.typed = typed
+        self.coalescer = coalescer
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_non_idempotent = retry_non_idempotent
+        self.cache = cache
+        self.hooks = {name: [] for name in self.hook_names}
+
+    def add_hook(self, name: Literal['before_request', 'after_response', 'on_error'],
+                 callback: Callable[[RequestEvent], None]):
+        """
+        Registers a callback called with the RequestEvent of every request sent over the wire. Cached responses
+        do not reach the hooks.
+
+        ### Args:
+            * name (str): 'before_request' before the first attempt, 'after_response' once the final response arrived
+              (whatever its status), or 'on_error' when the request raised
+            * callback (Callable[[RequestEvent], None]): The function to call. It runs inline, so keep it fast.
+        """
+        if name not in self.hooks:
+            raise ValueError(
+                f"Unknown hook {name!r}, expected one of {', '.join(self.hook_names)}")
+        self.hooks[name].append(callback)
+
+    def remove_hook(self, name: str, callback: Callable[[RequestEvent], None]):
+        """
+        Unregisters a callback added with add_hook
+        """
+        self.hooks[name].remove(callback)
+
+    def _url(self, path: str) -> str:
+        return Smartlead._V1.endpoint(path, api_key=self.api_key, base_url=self.base_url)
+
+    def _account(self) -> str:
+        # Identifies the API key and base url in cache keys without storing the key itself.
+        return hashlib.sha256(self._url('').encode()).hexdigest()[:16]
+
+    def _flight_key(self, path: str, query: Union[Dict, None]) -> Tuple:
+        return self._url(path), tuple(sorted((k, str(v)) for k, v in (query or {}).items() if v is not None))
+
+    def _typed(self, method: str, endpoint: str, response):
+        if not self.typed or method != 'GET' or endpoint not in self.response_models:
+            return response
+        record, key = self.response_models[endpoint]
+        return _to_records(response, record, key)
+
+    def _emit(self, name: str, event: RequestEvent):
+        for callback in self.hooks[name]:
+            callback(event)
+
+    def _timeout(self, endpoint: str):
+        return self.timeouts.get(endpoint, self.timeout)
+
+    def _admit(self, event: RequestEvent):
+        if self.circuit_breaker is None:
+            return
+        try:
+            self.circuit_breaker.allow(f"{event.method} {event.endpoint}")
+        except CircuitOpenError as e:
+            event.latency = 0.0
+            event.error = e
+            self._emit('on_error', event)
+            raise
+
+    def _settle(self, event: RequestEvent, failed: Union[bool, None]):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(f"{event.method} {event.endpoint}", failed)
+
+    @staticmethod
+    def _encode(body) -> Union[bytes, None]:
+        return None if body is None else json.dumps(body).encode()
+
+    def _compress(self, body: Union[bytes, None]) -> Tuple[Union[bytes, None], Union[Dict[str, str], None]]:
+        if body is None:
+            return None, None
+        if self.compress_requests is not None and len(body) >= self.compress_requests:
+            return gzip.compress(body, compresslevel=5), _GZIP_JSON_HEADERS
+        return body, _JSON_HEADERS
+
+    def _rejected_compression(self, status: int, headers: Mapping[str, str]) -> bool:
+        # The API does not take compressed bodies: send this one again as is, and stop compressing.
+        if status != 415 or headers is not _GZIP_JSON_HEADERS:
+            return False
+        self.compress_requests = None
+        return True
+
+    def _should_retry(self, method: str, status: int, attempt: int) -> bool:
+        if attempt >= self.max_retries or status not in self.retry_statuses:
+            return False
+        # A 429 was rejected before being processed, so it is always safe to send again.
+        return status == 429 or self.retry_non_idempotent or method in self.idempotent_methods
+
+    def _retry_delay(self, attempt: int, headers: Mapping[str, str]) -> float:
+        retry_after = _retry_after(headers)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+_GZIP_JSON_HEADERS = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+
+
+class Transport(_BaseTransport):
+    """
+    Pooled HTTP transport shared by every resource of a Smartlead client. Connections to the API are kept
+    alive and reused across calls instead of paying a new TCP+TLS handshake per request.
+
+    Requests rejected with 429 are retried with jittered exponential backoff, honouring Retry-After, and so
+    are 5xx responses to idempotent requests. Give the transport a RateLimiter to stay under the API's rate
+    limit in the first place.
+
+    ### Args:
+        * pool_connections (int): The number of per-host connection pools to keep. Defaults to 10.
+        * pool_maxsize (int): The maximum number of connections kept alive per host. Defaults to 10.
+        * pool_block (bool): Whether to block when a host's pool is exhausted instead of opening throwaway connections,
+          which makes pool_maxsize a hard per-host limit. Defaults to False.
+        * timeout (float | Tuple[float, float] | None): The connect and read timeout in seconds, either as a single
+          value or a (connect, read) tuple. None waits forever. Defaults to (10, 60).
+        * rate_limiter (RateLimiter | None): The token bucket every request waits on. Defaults to None.
+        * max_retries (int): How many times a 429 or 5xx response is retried. Defaults to 3.
+        * backoff (float): The base delay in seconds of the exponential backoff. Defaults to 0.5.
+        * max_backoff (float): The maximum delay in seconds between two attempts. Defaults to 30.
+        * retry_non_idempotent (bool): Whether 5xx responses to POST requests are retried too. They may have been
+          applied. Defaults to False.
+        * cache (ResponseCache | None): The cache of read-mostly GET responses. Defaults to None.
+        * api_key (str | None): The API key sent with every request. None falls back to Smartlead.api_key.
+          Defaults to None.
+        * base_url (str | None): The base url of the API. None falls back to the default API url. Defaults to None.
+        * typed (bool): Whether GET responses listed in response_models are decoded into Record objects instead of
+          dicts. Defaults to False.
+        * coalescer (RequestCoalescer | None): Shares one in-flight request between identical concurrent GETs.
+          Defaults to None.
+        * timeouts (Dict[str, float | Tuple[float, float]], optional): The timeout of each endpoint template that
+          overrides timeout, e.g. {'/campaigns/{campaign_id}/statistics': (5, 20)}. Defaults to None.
+        * hedging (HedgePolicy | None): Sends a second GET when the first is slower than usual, and uses whichever
+          answers first. Defaults to None.
+        * circuit_breaker (CircuitBreaker | None): Fails fast on endpoints whose error rate spiked. Defaults to None.
+        * compress_requests (int | None): The minimum size in bytes of a JSON body sent gzip-compressed. If the API
+          answers 415, the body is sent again uncompressed and compression is turned off. None never compresses.
+          Defaults to None.
+        * compress_responses (bool): Whether gzip-compressed responses are requested. They are decompressed
+          incrementally as they are read. Defaults to True.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10, pool_block: bool = False,
+                 timeout: Union[float, Tuple[float, float], None] = (10, 60),
+                 rate_limiter: Union[RateLimiter, None] = None, max_retries: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 30, retry_non_idempotent: bool = False, cache: Union[ResponseCache, None] = None,
+                 api_key: Union[str, None] = None, base_url: Union[str, None] = None, typed: bool = False,
+                 coalescer: Union[RequestCoalescer, None] = None,
+                 timeouts: Union[Dict[str, Union[float, Tuple[float, float]]], None] = None,
+                 hedging: Union[HedgePolicy, None] = None, circuit_breaker: Union[CircuitBreaker, None] = None,
+                 compress_requests: Union[int, None] = None, compress_responses: bool = True):
+        super().__init__(timeout, rate_limiter, max_retries, backoff, max_backoff, retry_non_idempotent, cache,
+                         api_key, base_url, typed, coalescer, timeouts, hedging, circuit_breaker,
+                         compress_requests, compress_responses)
+        self.pool_maxsize = pool_maxsize
+        self._hedge_executor = None
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate' if compress_responses else 'identity'
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method: str, endpoint: str, query: Union[Dict, None] = None, json=None, **path_params):
+        """
+        Sends a request through the pooled session and returns the decoded JSON response.
+
+        ### Args:
+            * method (str): The HTTP method, e.g. 'GET'
+            * endpoint (str): The endpoint template, e.g. '/campaigns/{campaign_id}'. It is formatted with path_params.
+            * query (Dict, optional): The query parameters. Parameters set to None are left out. Defaults to None.
+            * json (optional): The JSON body of the request. Defaults to None.
+        """
+        path = endpoint.format(**path_params)
+        if self.cache is not None:
+            hit, cached = self.cache.get(method, endpoint, path, query, self._account())
+            if hit:
+                return self._typed(method, endpoint, cached)
+        if self.coalescer is not None and method == 'GET':
+            ok, response = self.coalescer.run(self._flight_key(path, query),
+                                              lambda: self._fetch(method, endpoint, path, query, json, path_params))
+        else:
+            ok, response = self._fetch(method, endpoint, path, query, json, path_params)
+        return self._typed(method, endpoint, response) if ok else response
+
+    def _fetch(self, method: str, endpoint: str, path: str, query: Union[Dict, None], payload,
+               path_params: Dict) -> Tuple[bool, object]:
+        url = self._url(path)
+        body = self._encode(payload)
+        event = RequestEvent(method, endpoint, path, len(body or b''))
+        self._admit(event)
+        self._emit('before_request', event)
+        hedge = self.hedging is not None and self.hedging.applies(method, endpoint)
+        timeout = self._timeout(endpoint)
+        started = time.perf_counter()
+        try:
+            while True:
+                if hedge:
+                    r = self._send_hedged(method, url, query, timeout, event)
+                else:
+                    r = self._send(method, url, query, body, timeout)[0]
+                if not self._should_retry(method, r.status_code, event.retries):
+                    break
+                time.sleep(self._retry_delay(event.retries, r.headers))
+                event.retries += 1
+            event.status = r.status_code
+            event.response_bytes = len(r.content)
+            response = _loads(r.content) if r.content else None
+        except Exception as e:
+            event.latency = time.perf_counter() - started
+            event.error = e
+            self._settle(event, True)
+            self._emit('on_error', event)
+            raise
+        except BaseException:
+            self._settle(event, None)
+            raise
+        event.latency = time.perf_counter() - started
+        self._settle(event, event.status >= 500)
+        self._emit('after_response', event)
+        if r.ok and self.cache is not None:
+            self.cache.update(method, endpoint, path,
+                              query, path_params, response, self._account())
+        return r.ok, response
+
+    def _send(self, method: str, url: str, query: Union[Dict, None], body: Union[bytes, None],
+              timeout) -> Tuple[requests.Response, float]:
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        started = time.perf_counter()
+        data, headers = self._compress(body)
+        r = self.session.request(method, url, params=query, data=data, headers=headers, timeout=timeout)
+        if self.rate_limiter:
+            self.rate_limiter.update(r.status_code, r.headers)
+        if self._rejected_compression(r.status_code, headers):
+            return self._send(method, url, query, body, timeout)
+        return r, time.perf_counter() - started
+
+    def _send_hedged(self, method: str, url: str, query: Union[Dict, None], timeout,
+                     event: RequestEvent) -> requests.Response:
+        if self._hedge_executor is None:
+            self._hedge_executor = ThreadPoolExecutor(max_workers=2 * self.pool_maxsize)
+        first = self._hedge_executor.submit(self._send, method, url, query, None, timeout)
+        done, _ = wait([first], timeout=self.hedging.delay(event.endpoint))
+        if done:
+            r, latency = first.result()
+            self.hedging.observe(event.endpoint, latency)
+            return r
+        second = self._hedge_executor.submit(self._send, method, url, query, None, timeout)
+        event.hedges += 1
+        done, pending = wait([first, second], return_when=FIRST_COMPLETED)
+        winner = first if first in done else second
+        if winner.exception() is not None and pending:
+            winner = pending.pop()
+            winner.exception()
+        # The losing request cannot be cancelled; its response is dropped when it arrives.
+        won = winner is second
+        event.hedge_wins += won
+        r, latency = winner.result()
+        self.hedging.observe(event.endpoint, latency, hedged=True, won=won)
+        return r
+
+    def stream(self, method: str, endpoint: str, query: Union[Dict, None] = None, chunk_size: int = 65536,
+               **path_params) -> Iterator[bytes]:
+        """
+        Sends a request and yields the raw response body in chunks as it arrives, without buffering it.
+        Raises requests.HTTPError if the API answers with an error status.
+
+        ### Args:
+            * method (str): The HTTP method, e.g. 'GET'
+            * endpoint (str): The endpoint template, e.g. '/campaigns/{campaign_id}/leads-export'. It is formatted
+              with path_params.
+            * query (Dict, optional): The query parameters. Parameters set to None are left out. Defaults to None.
+            * chunk_size (int): The maximum size in bytes of each chunk. Defaults to 65536.
+        """
+        path = endpoint.format(**path_params)
+        url = self._url(path)
+        event = RequestEvent(method, endpoint, path)
+        self._admit(event)
+        self._emit('before_request', event)
+        started = time.perf_counter()
+        try:
+            while True:
+                if self.rate_limiter:
+                    self.rate_limiter.acquire()
+                r = self.session.request(method, url, params=query,
+                                         timeout=self._timeout(endpoint), stream=True)
+                if self.rate_limiter:
+                    self.rate_limiter.update(r.status_code, r.headers)
+                if not self._should_retry(method, r.status_code, event.retries):
+                    break
+                r.close()
+                time.sleep(self._retry_delay(event.retries, r.headers))
+                event.retries += 1
+            event.status = r.status_code
+            event.response_bytes = 0
+            with r:
+                r.raise_for_status()
+                for chunk in r.iter_content(chunk_size):
+                    event.response_bytes += len(chunk)
+                    yield chunk
+        except Exception as e:
+            event.latency = time.perf_counter() - started
+            event.error = e
+            self._settle(event, event.status is None or event.status >= 500)
+            self._emit('on_error', event)
+            raise
+        except BaseException:
+            self._settle(event, None)
+            raise
+        event.latency = time.perf_counter() - started
+        self._settle(event, False)
+        self._emit('after_response', event)
+
+    def close(self):
+        """
+        Closes every pooled connection
+        """
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+            self._hedge_executor = None
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncTransport(_BaseTransport):
+    """
+    Pooled asyncio HTTP transport backed by an aiohttp session. The session is opened on the first request,
+    so the transport can be created outside of a running event loop. Requires aiohttp (pip install aiohttp).
+
+    Retries, rate limiting and hooks work as in Transport.
+
+    ### Args:
+        * limit (int): The maximum number of open connections across all hosts. Defaults to 100.
+        * limit_per_host (int): The maximum number of open connections per host. 0 means no per-host limit.
+          Defaults to 0.
+        * max_concurrency (int | None): The maximum number of requests in flight at once. Extra requests wait for a free
+          slot. None means no limit. Defaults to None.
+        * timeout (float | Tuple[float, float] | None): The connect and read timeout in seconds, either as a single
+          value or a (connect, read) tuple. None waits forever. Defaults to (10, 60).
+        * rate_limiter (RateLimiter | None): The token bucket every request waits on. Defaults to None.
+        * max_retries (int): How many times a 429 or 5xx response is retried. Defaults to 3.
+        * backoff (float): The base delay in seconds of the exponential backoff. Defaults to 0.5.
+        * max_backoff (float): The maximum delay in seconds between two attempts. Defaults to 30.
+        * retry_non_idempotent (bool): Whether 5xx responses to POST requests are retried too. Defaults to False.
+        * cache (ResponseCache | None): The cache of read-mostly GET responses. Defaults to None.
+        * api_key (str | None): The API key sent with every request. None falls back to Smartlead.api_key.
+          Defaults to None.
+        * base_url (str | None): The base url of the API. None falls back to the default API url. Defaults to None.
+        * typed (bool): Whether GET responses listed in response_models are decoded into Record objects instead of
+          dicts. Defaults to False.
+        * coalescer (RequestCoalescer | None): Shares one in-flight request between identical concurrent GETs.
+          Defaults to None.
+        * timeouts (Dict[str, float | Tuple[float, float]], optional): The timeout of each endpoint template that
+          overrides timeout, e.g. {'/campaigns/{campaign_id}/statistics': (5, 20)}. Defaults to None.
+        * hedging (HedgePolicy | None): Sends a second GET when the first is slower than usual, and uses whichever
+          answers first. Defaults to None.
+        * circuit_breaker (CircuitBreaker | None): Fails fast on endpoints whose error rate spiked. Defaults to None.
+        * compress_requests (int | None): The minimum size in bytes of a JSON body sent gzip-compressed. If the API
+          answers 415, the body is sent again uncompressed and compression is turned off. None never compresses.
+          Defaults to None.
+        * compress_responses (bool): Whether gzip-compressed responses are requested. They are decompressed
+          incrementally as they are read. Defaults to True.
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 0, max_concurrency: Union[int, None] = None,
+                 timeout: Union[float, Tuple[float, float], None] = (10, 60),
+                 rate_limiter: Union[RateLimiter, None] = None, max_retries: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 30, retry_non_idempotent: bool = False, cache: Union[ResponseCache, None] = None,
+                 api_key: Union[str, None] = None, base_url: Union[str, None] = None, typed: bool = False,
+                 coalescer: Union[RequestCoalescer, None] = None,
+                 timeouts: Union[Dict[str, Union[float, Tuple[float, float]]], None] = None,
+                 hedging: Union[HedgePolicy, None] = None, circuit_breaker: Union[CircuitBreaker, None] = None,
+                 compress_requests: Union[int, None] = None, compress_responses: bool = True):
+        if aiohttp is None:
+            raise ImportError(
+                'AsyncTransport requires aiohttp. Install it with: pip install aiohttp')
+        super().__init__(timeout, rate_limiter, max_retries, backoff, max_backoff, retry_non_idempotent, cache,
+                         api_key, base_url, typed, coalescer, timeouts, hedging, circuit_breaker,
+                         compress_requests, compress_responses)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.max_concurrency = max_concurrency
+        self.session = None
+        self._semaphore = None
+
+    @staticmethod
+    def _client_timeout(timeout) -> 'aiohttp.ClientTimeout':
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        return aiohttp.ClientTimeout(connect=connect, sock_read=read)
+
+    def _open(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host),
+            timeout=self._client_timeout(self.timeout),
+            headers=None if self.compress_responses else {'Accept-Encoding': 'identity'})
+        if self.max_concurrency:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def request(self, method: str, endpoint: str, query: Union[Dict, None] = None, json=None, **path_params):
+        """
+        Sends a request through the pooled session and returns the decoded JSON response.
+
+        ### Args:
+            * method (str): The HTTP method, e.g. 'GET'
+            * endpoint (str): The endpoint template, e.g. '/campaigns/{campaign_id}'. It is formatted with path_params.
+            * query (Dict, optional): The query parameters. Parameters set to None are left out. Defaults to None.
+            * json (optional): The JSON body of the request. Defaults to None.
+        """
+        path = endpoint.format(**path_params)
+        if self.cache is not None:
+            hit, cached = self.cache.get(method, endpoint, path, query, self._account())
+            if hit:
+                return self._typed(method, endpoint, cached)
+        if self.coalescer is not None and method == 'GET':
+            ok, response = await self.coalescer.arun(self._flight_key(path, query),
+                                                     lambda: self._fetch(method, endpoint, path, query, json, path_params))
+        else:
+            ok, response = await self._fetch(method, endpoint, path, query, json, path_params)
+        return self._typed(method, endpoint, response) if ok else response
+
+    async def _fetch(self, method: str, endpoint: str, path: str, query: Union[Dict, None], payload,
+                     path_params: Dict) -> Tuple[bool, object]:
+        if self.session is None:
+            self._open()
+        params = {k: str(v) for k, v in (query or {}).items() if v is not None}
+        url = self._url(path)
+        body = self._encode(payload)
+        event = RequestEvent(method, endpoint, path, len(body or b''))
+        self._admit(event)
+        self._emit('before_request', event)
+        started = time.perf_counter()
+        try:
+            if self._semaphore is None:
+                response = await self._send(method, url, params, body, event)
+            else:
+                async with self._semaphore:
+                    response = await self._send(method, url, params, body, event)
+        except Exception as e:
+            event.latency = time.perf_counter() - started
+            event.error = e
+            self._settle(event, True)
+            self._emit('on_error', event)
+            raise
+        except BaseException:
+            self._settle(event, None)
+            raise
+        event.latency = time.perf_counter() - started
+        self._settle(event, event.status >= 500)
+        self._emit('after_response', event)
+        if event.status < 400 and self.cache is not None:
+            self.cache.update(method, endpoint, path,
+                              query, path_params, response, self._account())
+        return event.status < 400, response
+
+    async def _send(self, method: str, url: str, params: Dict, body: Union[bytes, None], event: RequestEvent):
+        hedge = self.hedging is not None and self.hedging.applies(method, event.endpoint)
+        timeout = self._client_timeout(self._timeout(event.endpoint))
+        while True:
+            if hedge:
+                status, headers, content = await self._attempt_hedged(method, url, params, timeout, event)
+            else:
+                status, headers, content, _ = await self._attempt(method, url, params, body, timeout)
+            if not self._should_retry(method, status, event.retries):
+                event.status = status
+                event.response_bytes = len(content)
+                return _loads(content) if content else None
+            await asyncio.sleep(self._retry_delay(event.retries, headers))
+            event.retries += 1
+
+    async def _attempt(self, method: str, url: str, params: Dict, body: Union[bytes, None],
+                       timeout: 'aiohttp.ClientTimeout'):
+        if self.rate_limiter:
+            await self.rate_limiter.acquire_async()
+        started = time.perf_counter()
+        data, headers = self._compress(body)
+        async with self.session.request(method, url, params=params, data=data, timeout=timeout, headers=headers) as r:
+            if self.rate_limiter:
+                self.rate_limiter.update(r.status, r.headers)
+            if self._rejected_compression(r.status, headers):
+                return await self._attempt(method, url, params, body, timeout)
+            content = await r.read()
+            return r.status, r.headers, content, time.perf_counter() - started
+
+    async def _attempt_hedged(self, method: str, url: str, params: Dict, timeout: 'aiohttp.ClientTimeout',
+                              event: RequestEvent):
+        first = asyncio.ensure_future(self._attempt(method, url, params, None, timeout))
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.hedging.delay(event.endpoint))
+            if done:
+                status, headers, content, latency = first.result()
+                self.hedging.observe(event.endpoint, latency)
+                return status, headers, content
+            second = asyncio.ensure_future(self._attempt(method, url, params, None, timeout))
+            event.hedges += 1
+            try:
+                done, pending = await asyncio.wait({first, second}, return_when=asyncio.FIRST_COMPLETED)
+                winner = first if first in done else second
+                if winner.exception() is not None and pending:
+                    winner = pending.pop()
+                    await asyncio.wait({winner})
+                won = winner is second
+                event.hedge_wins += won
+                status, headers, content, latency = winner.result()
+                self.hedging.observe(event.endpoint, latency, hedged=True, won=won)
+                return status, headers, content
+            finally:
+                second.cancel()
+        finally:
+            first.cancel()
+
+    async def stream(self, method: str, endpoint: str, query: Union[Dict, None] = None, chunk_size: int = 65536,
+                     **path_params) -> AsyncIterator[bytes]:
+        """
+        Sends a request and yields the raw response body in chunks as it arrives, without buffering it.
+        Raises aiohttp.ClientResponseError if the API answers with an error status.
+
+        ### Args:
+            * method (str): The HTTP method, e.g. 'GET'
+            * endpoint (str): The endpoint template, e.g. '/campaigns/{campaign_id}/leads-export'. It is formatted
+              with path_params.
+            * query (Dict, optional): The query parameters. Parameters set to None are left out. Defaults to None.
+            * chunk_size (int): The maximum size in bytes of each chunk. Defaults to 65536.
+        """
+        if self.session is None:
+            self._open()
+        params = {k: str(v) for k, v in (query or {}).items() if v is not None}
+        path = endpoint.format(**path_params)
+        url = self._url(path)
+        event = RequestEvent(method, endpoint, path)
+        self._admit(event)
+        self._emit('before_request', event)
+        started = time.perf_counter()
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+        try:
+            while True:
+                if self.rate_limiter:
+                    await self.rate_limiter.acquire_async()
+                r = await self.session.request(method, url, params=params,
+                                               timeout=self._client_timeout(self._timeout(endpoint)))
+                if self.rate_limiter:
+                    self.rate_limiter.update(r.status, r.headers)
+                if not self._should_retry(method, r.status, event.retries):
+                    break
+                r.release()
+                await asyncio.sleep(self._retry_delay(event.retries, r.headers))
+                event.retries += 1
+            event.status = r.status
+            event.response_bytes = 0
+            async with r:
+                r.raise_for_status()
+                async for chunk in r.content.iter_chunked(chunk_size):
+                    event.response_bytes += len(chunk)
+                    yield chunk
+        except Exception as e:
+            event.latency = time.perf_counter() - started
+            event.error = e
+            self._settle(event, event.status is None or event.status >= 500)
+            self._emit('on_error', event)
+            raise
+        except BaseException:
+            self._settle(event, None)
+            raise
+        finally:
+            if self._semaphore is not None:
+                self._semaphore.release()
+        event.latency = time.perf_counter() - started
+        self._settle(event, False)
+        self._emit('after_response', event)
+
+    async def close(self):
+        """
+        Closes every pooled connection
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class Paginator:
+    """
+    Lazily iterates over the rows of an offset/limit paginated endpoint, one page at a time. While the rows
+    of a page are consumed, the next page is fetched in the background. Iterate it with for on a Smartlead
+    client and with async for on an AsyncSmartlead client.
+
+    The offset attribute is the offset of the next row to be yielded. Pass it back as offset to resume an
+    interrupted iteration; the row being processed when it stopped is yielded again. A page the API answers
+    with an error, or that is neither a list nor a dict with data, raises RuntimeError.
+
+    The iteration ends at the total the pages report under total_key. Pages without it end the iteration
+    at the first page shorter than page_size, so a page_size above the API's cap would end it early.
+
+    ### Args:
+        * fetch (Callable[[int, int], Dict | List]): Fetches the page at (offset, limit)
+        * page_size (int): The number of rows to request per page. Defaults to 100.
+        * offset (int): The offset to start from. Defaults to 0.
+        * prefetch (bool): Whether to fetch the next page while the current one is consumed. Defaults to True.
+        * total_key (str | None): The key of the total number of rows in a page, e.g. 'total_leads'. Defaults to None.
+    """
+
+    def __init__(self, fetch: Callable[[int, int], Union[Dict, List]], page_size: int = 100, offset: int = 0,
+                 prefetch: bool = True, total_key: Union[str, None] = None):
+        self.fetch = fetch
+        self.page_size = page_size
+        self.offset = offset
+        self.prefetch = prefetch
+        self.total_key = total_key
+
+    @staticmethod
+    def _rows(page: Union[Dict, List]) -> List:
+        # Only an empty or short page ends the iteration: an error page raises instead of passing for the end.
+        error = _response_error(page)
+        if error is not None:
+            raise RuntimeError(f'Could not fetch page: {error}')
+        if isinstance(page, dict) and 'data' in page:
+            page = page['data']
+        if page is None:
+            return []
+        if not isinstance(page, list):
+            raise RuntimeError(f'Unexpected page: {page!r}')
+        return page
+
+    def _page(self, page: Union[Dict, List]) -> Tuple[List, Union[int, None]]:
+        rows = self._rows(page)
+        if self.total_key is None or not isinstance(page, dict) or page.get(self.total_key) is None:
+            return rows, None
+        return rows, int(page[self.total_key])
+
+    def _last_page(self, rows: List, total: Union[int, None]) -> bool:
+        # Called before the rows of the page are yielded, while offset is still the offset of the page.
+        if total is not None:
+            return self.offset + len(rows) >= total
+        return len(rows) < self.page_size
+
+    def _fetch_page(self, offset: int) -> Tuple[List, Union[int, None]]:
+        page = self.fetch(offset, self.page_size)
+        if inspect.isawaitable(page):
+            page.close()
+            raise TypeError(
+                'This paginator belongs to an async client, iterate it with async for')
+        return self._page(page)
+
+    def __iter__(self):
+        executor = ThreadPoolExecutor(max_workers=1) if self.prefetch else None
+        try:
+            rows, total = self._fetch_page(self.offset)
+            while rows:
+                last_page = self._last_page(rows, total)
+                upcoming = None
+                if executor and not last_page:
+                    upcoming = executor.submit(
+                        self._fetch_page, self.offset + len(rows))
+                for row in rows:
+                    yield row
+                    self.offset += 1
+                if last_page:
+                    break
+                rows, total = upcoming.result() if upcoming else self._fetch_page(self.offset)
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
+
+    async def _aiter(self):
+        upcoming = None
+        try:
+            rows, total = self._page(await self.fetch(self.offset, self.page_size))
+            while rows:
+                last_page = self._last_page(rows, total)
+                if self.prefetch and not last_page:
+                    upcoming = asyncio.ensure_future(
+                        self.fetch(self.offset + len(rows), self.page_size))
+                for row in rows:
+                    yield row
+                    self.offset += 1
+                if last_page:
+                    break
+                if upcoming is not None:
+                    page, upcoming = await upcoming, None
+                else:
+                    page = await self.fetch(self.offset, self.page_size)
+                rows, total = self._page(page)
+        finally:
+            if upcoming is not None:
+                upcoming.cancel()
+
+    def __aiter__(self):
+        return self._aiter()
+
+
+class _ExportRowParser:
+    """
+    Incrementally parses a leads export body fed in chunks. CSV bodies are decoded record by record, so memory
+    stays bounded by the largest record. A JSON body cannot be split safely and is decoded once complete.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self._is_json = None
+        self._head = b''
+        self._json_chunks = []
+        self._partial = ''
+        self._record = ''
+        self._fieldnames = None
+
+    def feed(self, data: bytes, final: bool = False) -> List[Dict]:
+        if self._is_json is None:
+            # The format is told by the first byte after an optional UTF-8 BOM and whitespace, which may only
+            # arrive in a later chunk.
+            self._head += data
+            body = self._head[len(codecs.BOM_UTF8):] if self._head.startswith(codecs.BOM_UTF8) else self._head
+            if not final and (not body.lstrip() or codecs.BOM_UTF8.startswith(self._head)):
+                return []
+            self._is_json = body.lstrip()[:1] in (b'[', b'{')
+            data, self._head = self._head, b''
+        if self._is_json:
+            self._json_chunks.append(data)
+            if not final:
+                return []
+            body = b''.join(self._json_chunks)
+            if body.startswith(codecs.BOM_UTF8):
+                body = body[len(codecs.BOM_UTF8):]
+            page = json.loads(body.strip() or b'[]')
+            return Paginator._rows(page)
+        lines = (self._partial + self._decoder.decode(data, final)).split('\n')
+        self._partial = '' if final else lines.pop()
+        records = []
+        for i, line in enumerate(lines):
+            self._record += line if final and i == len(lines) - 1 else line + '\n'
+            # A record is complete once its quotes are balanced; quoted fields may span several lines.
+            if self._record.count('"') % 2 == 0:
+                records.append(self._record)
+                self._record = ''
+        if final and self._record:
+            records.append(self._record)
+        rows = []
+        for values in csv.reader(records):
+            if not values:
+                continue
+            if self._fieldnames is None:
+                self._fieldnames = values
+            else:
+                rows.append(dict(zip(self._fieldnames, values)))
+        return rows
+
+
+def _iter_export_rows(chunks: Iterator[bytes]) -> Iterator[Dict]:
+    parser = _ExportRowParser()
+    try:
+        for chunk in chunks:
+            yield from parser.feed(chunk)
+        yield from parser.feed(b'', final=True)
+    finally:
+        chunks.close()
+
+
+async def _aiter_export_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict]:
+    parser = _ExportRowParser()
+    try:
+        async for chunk in chunks:
+            for row in parser.feed(chunk):
+                yield row
+        for row in parser.feed(b'', final=True):
+            yield row
+    finally:
+        # Closing the stream releases its connection and concurrency slot now rather than when it is collected.
+        await chunks.aclose()
+
+
+def _write_chunks(chunks: Iterator[bytes], destination: Union[str, os.PathLike, BinaryIO]) -> int:
+    if isinstance(destination, (str, os.PathLike)):
+        with open(destination, 'wb') as f:
+            return _write_chunks(chunks, f)
+    written = 0
+    for chunk in chunks:
+        destination.write(chunk)
+        written += len(chunk)
+    return written
+
+
+async def _awrite_chunks(chunks: AsyncIterator[bytes], destination: Union[str, os.PathLike, BinaryIO]) -> int:
+    if isinstance(destination, (str, os.PathLike)):
+        with open(destination, 'wb') as f:
+            return await _awrite_chunks(chunks, f)
+    written = 0
+    try:
+        async for chunk in chunks:
+            destination.write(chunk)
+            written += len(chunk)
+    finally:
+        await chunks.aclose()
+    return written
+
+
+class BulkUploadReport:
+    """
+    Combined result of a bulk lead upload. The counters are summed from the API's per-request responses,
+    and every lead of a request that still failed after its retries is listed in failed_leads as a dict
+    with the lead's index in the input, the lead itself and the error.
+    """
+
+    def __init__(self):
+        self.total_leads = 0
+        self.upload_count = 0
+        self.duplicate_count = 0
+        self.invalid_email_count = 0
+        self.already_added_to_campaign = 0
+        self.unsubscribed_leads = []
+        self.failed_leads = []
+        self.requests_sent = 0
+        self.elapsed = 0.0
+
+    @property
+    def leads_per_second(self) -> float:
+        return self.total_leads / self.elapsed if self.elapsed else 0.0
+
+    def _add(self, start: int, chunk: List[Dict], response, error, attempts: int):
+        self.total_leads += len(chunk)
+        self.requests_sent += attempts
+        if error is not None:
+            self.failed_leads.extend({'index': start + i, 'lead': lead, 'error': error}
+                                     for i, lead in enumerate(chunk))
+            return
+        self.upload_count += int(response.get('upload_count') or 0)
+        self.duplicate_count += int(response.get('duplicate_count') or 0)
+        self.invalid_email_count += int(response.get('invalid_email_count') or 0)
+        self.already_added_to_campaign += int(
+            response.get('already_added_to_campaign') or 0)
+        self.unsubscribed_leads.extend(response.get('unsubscribed_leads') or [])
+
+    def __repr__(self):
+        return (f"BulkUploadReport(total_leads={self.total_leads}, upload_count={self.upload_count}, "
+                f"failed={len(self.failed_leads)}, leads_per_second={self.leads_per_second:.1f})")
+
+
+class BulkLeadUploader:
+    """
+    Uploads any iterable of leads to a campaign in chunks of at most chunk_size leads, sending up to
+    max_concurrency chunks at once and retrying failed chunks with exponential backoff. Leads are read
+    from the iterable only as chunks are sent, so generators over large files are never fully loaded.
+
+    ### Args:
+        * send (Callable[[List[Dict]], Dict]): Sends one chunk, e.g. a bound add_leads_to_campaign
+        * chunk_size (int): The number of leads per request. Defaults to 100, the API's maximum.
+        * max_concurrency (int): The maximum number of chunks in flight. Defaults to 4.
+        * retries (int): How many times a failed chunk is retried on top of max_retries, see _retrying. Defaults to 2.
+        * backoff (float): The delay in seconds before the first retry, doubled after every attempt. Defaults to 1.0.
+    """
+
+    max_chunk_size = 100
+
+    def __init__(self, send: Callable[[List[Dict]], Dict], chunk_size: int = 100, max_concurrency: int = 4,
+                 retries: int = 2, backoff: float = 1.0):
+        if not 0 < chunk_size <= self.max_chunk_size:
+            raise ValueError(
+                f'chunk_size must be between 1 and {self.max_chunk_size}')
+        self.send = send
+        self.chunk_size = chunk_size
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+
+    def _chunks(self, leads: Iterable[Dict]):
+        leads = iter(leads)
+        start = 0
+        while True:
+            chunk = list(islice(leads, self.chunk_size))
+            if not chunk:
+                return
+            yield start, chunk
+            start += len(chunk)
+
+    @staticmethod
+    def _error(response) -> Union[str, None]:
+        if not isinstance(response, dict):
+            return f'Unexpected response: {response!r}'
+        if response.get('ok') is False or 'error' in response:
+            return str(response.get('error') or response.get('message') or response)
+        return None
+
+    def _upload_chunk(self, chunk: List[Dict]):
+        return _retrying(lambda: self.send(chunk), self.retries, self.backoff, self._error)
+
+    async def _upload_chunk_async(self, chunk: List[Dict]):
+        return await _aretrying(lambda: self.send(chunk), self.retries, self.backoff, self._error)
+
+    def run(self, leads: Iterable[Dict]) -> BulkUploadReport:
+        """
+        Uploads the leads using a thread pool and returns the combined report
+        """
+        report = BulkUploadReport()
+        started = time.perf_counter()
+        pending = {}
+
+        def collect(done):
+            for future in done:
+                start, chunk = pending.pop(future)
+                report._add(start, chunk, *future.result())
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            for start, chunk in self._chunks(leads):
+                if len(pending) >= self.max_concurrency:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                pending[executor.submit(self._upload_chunk, chunk)] = (start, chunk)
+            collect(wait(pending).done)
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    async def arun(self, leads: Iterable[Dict]) -> BulkUploadReport:
+        """
+        Uploads the leads using asyncio tasks and returns the combined report
+        """
+        report = BulkUploadReport()
+        started = time.perf_counter()
+        pending = {}
+
+        def collect(done):
+            for task in done:
+                start, chunk = pending.pop(task)
+                report._add(start, chunk, *task.result())
+
+        for start, chunk in self._chunks(leads):
+            if len(pending) >= self.max_concurrency:
+                collect((await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED))[0])
+            pending[asyncio.ensure_future(
+                self._upload_chunk_async(chunk))] = (start, chunk)
+        if pending:
+            collect((await asyncio.wait(pending))[0])
+        report.elapsed = time.perf_counter() - started
+        return report
+
+
+class BulkMutationReport:
+    """
+    Result of a BulkMutationExecutor run. succeeded and failed list every operation of this run as a dict
+    with its index in the input, the operation and either the API's response or the error. skipped counts
+    the operations already completed by an earlier run, according to the checkpoint file.
+    """
+
+    def __init__(self):
+        self.succeeded = []
+        self.failed = []
+        self.skipped = 0
+        self.requests_sent = 0
+        self.elapsed = 0.0
+
+    @property
+    def completed(self) -> int:
+        return len(self.succeeded) + len(self.failed)
+
+    @property
+    def operations_per_second(self) -> float:
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"BulkMutationReport(succeeded={len(self.succeeded)}, failed={len(self.failed)}, skipped={self.skipped}, "
+                f"operations_per_second={self.operations_per_second:.1f})")
+
+
+def _operation_error(operation, operations: Dict[str, Tuple]) -> Union[str, None]:
+    if not isinstance(operation, dict) or operation.get('operation') not in operations:
+        return f"Unknown operation {operation!r}, expected one of {', '.join(operations)}"
+    missing = [key for key in operations[operation['operation']][1] if key not in operation]
+    if missing:
+        return f"Operation {operation!r} is missing {', '.join(missing)}"
+    return None
+
+
+class BulkMutationExecutor:
+    """
+    Runs a stream of per-lead operations with bounded concurrency, retrying failed ones with exponential
+    backoff. Every operation is a dict naming one of the supported operations and its arguments, e.g.
+
+        {'operation': 'update_lead_category', 'campaign_id': 1, 'lead_id': 2, 'category_id': 3}
+        {'operation': 'unsubscribe_lead_from_campaign', 'campaign_id': 1, 'lead_id': 2}
+        {'operation': 'delete_lead_from_campaign', 'campaign_id': 1, 'lead_id': 2}
+        {'operation': 'update_lead', 'lead_id': 2, 'lead_input': {...}}
+        {'operation': 'unsubscribe_from_all_campaigns', 'lead_id': 2}
+
+    Operations are read from the iterable only as they are sent, so generators over large files are never
+    fully loaded. With a checkpoint file, every successful operation is appended to it, and a later run with
+    the same file skips them, so a crashed run can be started again without repeating completed work. An
+    operation is identified by its 'id' key when it has one, and by its content otherwise.
+
+    ### Args:
+        * client (Smartlead | AsyncSmartlead): The client to send the operations with. Use run with a Smartlead client
+          and arun with an AsyncSmartlead one.
+        * max_concurrency (int): The maximum number of operations in flight. Defaults to 8.
+        * retries (int): How many times a failed operation is retried on top of max_retries, see _retrying.
+          Defaults to 2.
+        * backoff (float): The delay in seconds before the first retry, doubled after every attempt. Defaults to 1.0.
+        * checkpoint (str | os.PathLike | None): The path of the checkpoint file. Defaults to None, no checkpoint.
+        * progress (Callable[[BulkMutationReport], None] | None): Called with the report after every completed
+          operation. Defaults to None.
+    """
+
+    # The client method of every operation and the keys passed to it as positional arguments.
+    operations = {
+        'update_lead_category': (lambda v1: v1.campaigns.update_lead_category, ('campaign_id', 'lead_id', 'category_id')),
+        'unsubscribe_lead_from_campaign': (lambda v1: v1.campaigns.unsubscribe_lead_from_campaign, ('campaign_id', 'lead_id')),
+        'delete_lead_from_campaign': (lambda v1: v1.campaigns.delete_lead_from_campaign, ('campaign_id', 'lead_id')),
+        'update_lead': (lambda v1: v1.leads.update, ('lead_id', 'lead_input')),
+        'unsubscribe_from_all_campaigns': (lambda v1: v1.leads.unsubscribe_from_all_campaigns, ('lead_id',)),
+    }
+
+    def __init__(self, client, max_concurrency: int = 8, retries: int = 2, backoff: float = 1.0,
+                 checkpoint: Union[str, os.PathLike, None] = None,
+                 progress: Union[Callable[[BulkMutationReport], None], None] = None):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.checkpoint = checkpoint
+        self.progress = progress
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(operation: Dict) -> str:
+        if isinstance(operation, dict) and 'id' in operation:
+            return json.dumps(operation['id'])
+        return json.dumps(operation, sort_keys=True, default=str)
+
+    def _completed_keys(self) -> set:
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return set()
+        with open(self.checkpoint) as f:
+            # A crash can leave a truncated last line; it is simply not counted as done.
+            return {line.rstrip('\n') for line in f if line.endswith('\n')}
+
+    def _pending(self, operations: Iterable[Dict], report: BulkMutationReport):
+        completed = self._completed_keys()
+        for index, operation in enumerate(operations):
+            if completed and self._key(operation) in completed:
+                report.skipped += 1
+                continue
+            yield index, operation
+
+    def _call(self, operation: Dict):
+        method, keys = self.operations[operation['operation']]
+        return method(self.client.v1)(*(operation[key] for key in keys))
+
+    def _run_one(self, operation: Dict):
+        error = _operation_error(operation, self.operations)
+        if error is not None:
+            return None, error, 0
+        return _retrying(lambda: self._call(operation), self.retries, self.backoff)
+
+    async def _run_one_async(self, operation: Dict):
+        error = _operation_error(operation, self.operations)
+        if error is not None:
+            return None, error, 0
+        return await _aretrying(lambda: self._call(operation), self.retries, self.backoff)
+
+    def _record(self, report: BulkMutationReport, checkpoint, index: int, operation: Dict, response, error,
+                attempts: int):
+        with self._lock:
+            report.requests_sent += attempts
+            if error is None:
+                report.succeeded.append({'index': index, 'operation': operation, 'response': response})
+                if checkpoint is not None:
+                    checkpoint.write(self._key(operation) + '\n')
+                    checkpoint.flush()
+            else:
+                report.failed.append({'index': index, 'operation': operation, 'error': error})
+        if self.progress is not None:
+            self.progress(report)
+
+    def run(self, operations: Iterable[Dict]) -> BulkMutationReport:
+        """
+        Runs the operations using a thread pool and returns the report. Raises TypeError for an AsyncSmartlead
+        client; use arun.
+        """
+        if isinstance(self.client, AsyncSmartlead):
+            raise TypeError('BulkMutationExecutor.run needs a Smartlead client; use arun with an AsyncSmartlead one')
+        report = BulkMutationReport()
+        started = time.perf_counter()
+        pending = {}
+        checkpoint = open(self.checkpoint, 'a') if self.checkpoint is not None else None
+
+        def collect(done):
+            for future in done:
+                index, operation = pending.pop(future)
+                self._record(report, checkpoint, index, operation, *future.result())
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                for index, operation in self._pending(operations, report):
+                    if len(pending) >= self.max_concurrency:
+                        collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                    pending[executor.submit(self._run_one, operation)] = (index, operation)
+                collect(wait(pending).done)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    async def arun(self, operations: Iterable[Dict]) -> BulkMutationReport:
+        """
+        Runs the operations using asyncio tasks and returns the report. Raises TypeError for a Smartlead
+        client; use run.
+        """
+        if not isinstance(self.client, AsyncSmartlead):
+            raise TypeError('BulkMutationExecutor.arun needs an AsyncSmartlead client; use run with a Smartlead one')
+        report = BulkMutationReport()
+        started = time.perf_counter()
+        pending = {}
+        checkpoint = open(self.checkpoint, 'a') if self.checkpoint is not None else None
+
+        def collect(done):
+            for task in done:
+                index, operation = pending.pop(task)
+                self._record(report, checkpoint, index, operation, *task.result())
+
+        try:
+            for index, operation in self._pending(operations, report):
+                if len(pending) >= self.max_concurrency:
+                    collect((await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED))[0])
+                pending[asyncio.ensure_future(self._run_one_async(operation))] = (index, operation)
+            if pending:
+                collect((await asyncio.wait(pending))[0])
+        finally:
+            for task in pending:
+                task.cancel()
+            if checkpoint is not None:
+                checkpoint.close()
+        report.elapsed = time.perf_counter() - started
+        return report
+
+
+class WriteBehindQueue:
+    """
+    Write-behind mode for mutating calls. submit appends an operation to a durable SQLite queue and returns at
+    once, so request handlers do not wait for the API round trip. A background thread hands the queued
+    operations to a pool of workers that send them with a Smartlead client.
+
+    Compatible operations waiting in the queue together are merged before they are sent. add_leads_to_campaign
+    calls of the same campaign are batched into requests of up to max_batch_leads leads. update_status calls
+    of one campaign, and update_lead_category calls of one lead, are sent one at a time in the order they were
+    submitted. Once a newer one is picked up, the older ones still queued for that target (waiting for a
+    retry included) are dropped as superseded, so a failed older call is never sent after a newer one. Failed
+    requests are retried with exponential backoff. Operations still failing after retries stay in the queue
+    with their error; see failed and retry_failed.
+
+    Operations use the format of BulkMutationExecutor, plus
+
+        {'operation': 'add_leads_to_campaign', 'campaign_id': 1, 'lead_list': [{...}]}
+        {'operation': 'update_status', 'campaign_id': 1, 'status': 'PAUSED'}
+
+    Queued operations survive a restart of the process. The ones in flight when it stopped are sent again
+    on the next start, so an operation can be sent more than once. Operations are not guaranteed to be
+    applied in the order they were submitted. snapshot returns the queue depth, the operations in flight,
+    counters and the flush latency (from submit to the API's confirmation) as metrics.
+
+    ### Args:
+        * client (Smartlead): The client to send the operations with
+        * path (str | os.PathLike): The path of the SQLite queue file
+        * workers (int): The maximum number of requests in flight. Defaults to 4.
+        * retries (int): How many times a failed request is retried. Defaults to 3.
+        * backoff (float): The delay in seconds before the first retry, doubled after every attempt. Defaults to 1.0.
+        * max_batch_leads (int): The maximum number of leads merged into one add_leads_to_campaign request.
+          Defaults to 100.
+        * poll_interval (float): How often in seconds the queue is checked for retries due when idle. Defaults to 0.05.
+        * durable (bool): Whether every submit is synced to disk, so queued operations survive a power loss and not only
+          a crash of the process. Slower. Defaults to False.
+    """
+
+    operations = {
+        **BulkMutationExecutor.operations,
+        'add_leads_to_campaign': (lambda v1: v1.campaigns.add_leads_to_campaign, ('campaign_id', 'lead_list')),
+        'update_status': (lambda v1: v1.campaigns.update_status, ('campaign_id', 'status')),
+    }
+
+    # The arguments identifying the target of the operations sent one at a time, of which only the last queued one counts.
+    last_write_wins = {
+        'update_status': ('campaign_id',),
+        'update_lead_category': ('campaign_id', 'lead_id'),
+    }
+
+    def __init__(self, client, path: Union[str, os.PathLike], workers: int = 4, retries: int = 3, backoff: float = 1.0,
+                 max_batch_leads: int = 100, poll_interval: float = 0.05, durable: bool = False):
+        if isinstance(client, AsyncSmartlead):
+            raise TypeError('WriteBehindQueue sends with worker threads and needs a Smartlead client')
+        self.client = client
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_batch_leads = max_batch_leads
+        self.poll_interval = poll_interval
+        self.flushed = 0
+        self.requests = 0
+        self.merged = 0
+        self.superseded = 0
+        self.retried = 0
+        self._latencies = deque(maxlen=1000)
+        self._busy = 0
+        self._targets = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._executor = None
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(f"PRAGMA synchronous={'FULL' if durable else 'NORMAL'}")
+        self._db.execute('CREATE TABLE IF NOT EXISTS operations (id INTEGER PRIMARY KEY AUTOINCREMENT, operation TEXT, '
+                         'submitted REAL, attempts INTEGER DEFAULT 0, next_attempt REAL DEFAULT 0, error TEXT, '
+                         'claimed INTEGER DEFAULT 0, failed INTEGER DEFAULT 0, target TEXT)')
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS operations_ready ON operations (failed, claimed, next_attempt)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS operations_target ON operations (target, id)')
+        # Operations in flight when a previous process stopped were never confirmed, so they are sent again.
+        self._db.execute('UPDATE operations SET claimed = 0')
+        self._db.commit()
+
+    def submit(self, operation: Dict) -> int:
+        """
+        Queues an operation and returns its id in the queue. Raises ValueError if the operation is invalid.
+        An add_leads_to_campaign operation of more than max_batch_leads leads is queued as several operations
+        of at most max_batch_leads leads each; the id of the first one is returned.
+
+        ### Args:
+            * operation (Dict): The operation, e.g. {'operation': 'update_status', 'campaign_id': 1, 'status': 'PAUSED'}
+        """
+        error = _operation_error(operation, self.operations)
+        if error is not None:
+            raise ValueError(error)
+        operations = [operation]
+        if operation['operation'] == 'add_leads_to_campaign':
+            leads = operation['lead_list']
+            operations = [{**operation, 'lead_list': leads[i:i + self.max_batch_leads]}
+                          for i in range(0, max(len(leads), 1), self.max_batch_leads)]
+        submitted = time.time()
+        with self._lock:
+            ids = [self._db.execute('INSERT INTO operations (operation, submitted, target) VALUES (?, ?, ?)',
+                                    (json.dumps(part), submitted, self._target(part))).lastrowid for part in operations]
+            self._db.commit()
+        self._wakeup.set()
+        return ids[0]
+
+    def start(self) -> 'WriteBehindQueue':
+        """
+        Starts sending the queued operations in the background
+        """
+        if self._thread is None:
+            self._stopping = False
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+            self._thread = threading.Thread(target=self._flush_loop, name='smartlead-write-behind', daemon=True)
+            self._thread.start()
+        return self
+
+    def join(self, timeout: Union[float, None] = None) -> bool:
+        """
+        Waits until every queued operation was sent or failed for good, and returns whether it happened
+        within timeout seconds. Operations waiting for a retry are waited for.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.depth:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    def stop(self, drain: bool = True, timeout: Union[float, None] = None):
+        """
+        Stops the background workers, first waiting up to timeout seconds for the queue to drain when drain is
+        set. Operations left in the queue are sent on the next start.
+        """
+        if self._thread is None:
+            return
+        if drain:
+            self.join(timeout)
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+        self._thread = None
+        self._executor = None
+
+    def close(self):
+        """
+        Drains and stops the workers, then closes the queue file
+        """
+        self.stop()
+        self._db.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _flush_loop(self):
+        while not self._stopping:
+            self._wakeup.clear()
+            groups = self._claim() if self._busy < self.workers else []
+            if not groups:
+                self._wakeup.wait(self.poll_interval)
+                continue
+            with self._lock:
+                self._busy += len(groups)
+            for group in groups:
+                self._executor.submit(self._send, *group)
+
+    def _target(self, operation: Dict) -> Union[str, None]:
+        arguments = self.last_write_wins.get(operation['operation'])
+        if arguments is None:
+            return None
+        return json.dumps([operation['operation'], *(operation[argument] for argument in arguments)])
+
+    def _claim(self) -> List[List]:
+        with self._lock:
+            rows = self._db.execute('SELECT id, operation, submitted, attempts, target FROM operations WHERE failed = 0 AND '
+                                    'claimed = 0 AND next_attempt <= ? ORDER BY id LIMIT 1000', (time.time(),)).fetchall()
+            claimed = [row[:4] for row in rows if row[4] is None]
+            latest = {}
+            for row in rows:
+                # Rows are in submit order, so the last one of a target is its newest. A target with an operation
+                # in flight waits for it, so that operations of one target are never sent concurrently.
+                if row[4] is not None and row[4] not in self._targets:
+                    latest[row[4]] = row[:4]
+            for target, row in latest.items():
+                self.superseded += self._db.execute('DELETE FROM operations WHERE target = ? AND id < ?',
+                                                    (target, row[0])).rowcount
+                claimed.append(row)
+            self._targets.update(latest)
+            self._db.executemany('UPDATE operations SET claimed = 1 WHERE id = ?', [(row[0],) for row in claimed])
+            self._db.commit()
+        groups = self._merge(claimed)
+        self.merged += len(claimed) - len(groups)
+        return groups
+
+    def _merge(self, rows: List[Tuple]) -> List[List]:
+        groups = {}
+        for operation_id, text, submitted, attempts in rows:
+            operation = json.loads(text)
+            name = operation['operation']
+            if name == 'add_leads_to_campaign':
+                key = (name, operation['campaign_id'])
+                group = groups.get(key)
+                if group is not None and len(group[1]['lead_list']) + len(operation['lead_list']) > self.max_batch_leads:
+                    # The batch is full: keep it under its first id and start a new one.
+                    groups[group[0][0]] = groups.pop(key)
+                    group = None
+                if group is None:
+                    group = groups[key] = [[], operation, [], 0]
+                else:
+                    group[1]['lead_list'].extend(operation['lead_list'])
+            else:
+                group = groups[operation_id] = [[], operation, [], 0]
+            group[0].append(operation_id)
+            group[2].append(submitted)
+            group[3] = max(group[3], attempts)
+        return list(groups.values())
+
+    def _send(self, ids: List[int], operation: Dict, submitted: List[float], attempts: int):
+        method, keys = self.operations[operation['operation']]
+        try:
+            response = method(self.client.v1)(*(operation[key] for key in keys))
+            error = _response_error(response)
+        except Exception as e:
+            error = repr(e)
+        now = time.time()
+        with self._lock:
+            self.requests += 1
+            if error is None:
+                self._db.executemany('DELETE FROM operations WHERE id = ?', [(i,) for i in ids])
+                self.flushed += len(ids)
+                self._latencies.extend(now - at for at in submitted)
+            else:
+                failed = attempts >= self.retries
+                self._db.executemany('UPDATE operations SET claimed = 0, attempts = ?, next_attempt = ?, error = ?, '
+                                     'failed = ? WHERE id = ?',
+                                     [(attempts + 1, now + self.backoff * 2 ** attempts, error, failed, i) for i in ids])
+                if not failed:
+                    self.retried += len(ids)
+            self._db.commit()
+            self._targets.discard(self._target(operation))
+            self._busy -= 1
+        self._wakeup.set()
+
+    @property
+    def depth(self) -> int:
+        """
+        The number of operations waiting to be sent or in flight, retries included
+        """
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM operations WHERE failed = 0').fetchone()[0]
+
+    def failed(self) -> List[Dict]:
+        """
+        Returns the operations that failed after every retry, with their id, attempts and last error
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT id, operation, attempts, error FROM operations WHERE failed = 1 ORDER BY id').fetchall()
+        return [{'id': row[0], 'operation': json.loads(row[1]), 'attempts': row[2], 'error': row[3]} for row in rows]
+
+    def retry_failed(self) -> int:
+        """
+        Queues the failed operations again and returns how many there were
+        """
+        with self._lock:
+            count = self._db.execute(
+                'UPDATE operations SET failed = 0, attempts = 0, next_attempt = 0 WHERE failed = 1').rowcount
+            self._db.commit()
+        self._wakeup.set()
+        return count
+
+    def snapshot(self) -> Dict:
+        """
+        Returns the queue metrics: depth, in_flight and failed operations; operations flushed, requests sent,
+        operations saved by merging, dropped as superseded and retried; and the mean, p50, p99 and max flush
+        latency in seconds of the last 1000 operations flushed
+        """
+        with self._lock:
+            depth, in_flight, failed = self._db.execute(
+                'SELECT COALESCE(SUM(failed = 0), 0), COALESCE(SUM(claimed = 1), 0), COALESCE(SUM(failed = 1), 0) '
+                'FROM operations').fetchone()
+            latencies = sorted(self._latencies)
+            counters = {'flushed': self.flushed, 'requests': self.requests, 'merged': self.merged,
+                        'superseded': self.superseded, 'retried': self.retried}
+
+        def percentile(q: float) -> float:
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+        return {'depth': depth, 'in_flight': in_flight, 'failed': failed, **counters,
+                'flush_latency': {'mean': sum(latencies) / len(latencies) if latencies else 0.0, 'p50': percentile(0.5),
+                                  'p99': percentile(0.99), 'max': latencies[-1] if latencies else 0.0}}
+
+
+class MessageHistoryExportReport:
+    """
+    Result of a message history export. exported counts the histories written by this run and skipped the
+    leads already in the output of an earlier run. failed lists the leads whose history could not be fetched
+    as dicts with the lead id and the error; they are not written, so resuming the export retries them.
+    error is set when the leads themselves could not be listed, e.g. a page of leads failed: the export
+    stopped there, complete is False and resuming the export continues it.
+    """
+
+    def __init__(self):
+        self.exported = 0
+        self.skipped = 0
+        self.failed = []
+        self.requests_sent = 0
+        self.elapsed = 0.0
+        self.error = None
+
+    @property
+    def complete(self) -> bool:
+        return self.error is None and not self.failed
+
+    @property
+    def leads_per_second(self) -> float:
+        return self.exported / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"MessageHistoryExportReport(exported={self.exported}, skipped={self.skipped}, failed={len(self.failed)}, "
+                f"error={self.error!r}, leads_per_second={self.leads_per_second:.1f})")
+
+
+class _JSONLinesSink:
+    """
+    Appends one JSON record per line to a file, flushed after every record
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], resume: bool):
+        self.done = set()
+        if resume and os.path.exists(path):
+            with open(path, 'r+b') as f:
+                complete = 0
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    complete += len(line)
+                    try:
+                        record = _loads(line)
+                    except ValueError:
+                        continue
+                    # A line that is not a record of a lead is kept as is, and does not count as exported.
+                    if isinstance(record, dict) and record.get('lead_id') is not None:
+                        self.done.add(record['lead_id'])
+                # A crash can leave a truncated last record, which is dropped and fetched again.
+                f.truncate(complete)
+        self._file = open(path, 'ab' if resume else 'wb')
+
+    def write(self, record: Dict):
+        self._file.write(json.dumps(record).encode() + b'\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetSink:
+    """
+    Writes records to a directory of Parquet files of at most rows_per_file rows each. A file is only renamed
+    into place once complete, so a crashed export leaves no partial file behind. Needs pyarrow.
+    """
+
+    def __init__(self, directory: Union[str, os.PathLike], resume: bool, rows_per_file: int):
+        if pyarrow is None:
+            raise ImportError(
+                'Parquet exports require pyarrow. Install it with: pip install pyarrow')
+        self.directory = directory
+        self.rows_per_file = rows_per_file
+        self.done = set()
+        self._rows = []
+        os.makedirs(directory, exist_ok=True)
+        parts = sorted(name for name in os.listdir(directory) if name.startswith('part-') and name.endswith('.parquet'))
+        for name in parts:
+            path = os.path.join(directory, name)
+            if resume:
+                self.done.update(pyarrow.parquet.read_table(path, columns=['lead_id']).column('lead_id').to_pylist())
+            else:
+                os.remove(path)
+        self._next_part = int(parts[-1][5:-8]) + 1 if resume and parts else 0
+
+    def write(self, record: Dict):
+        self._rows.append(record)
+        if len(self._rows) >= self.rows_per_file:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        table = pyarrow.table({
+            'campaign_id': pyarrow.array([row['campaign_id'] for row in rows], pyarrow.int64()),
+            'lead_id': pyarrow.array([row['lead_id'] for row in rows], pyarrow.int64()),
+            'lead_email': pyarrow.array([row['lead_email'] for row in rows], pyarrow.string()),
+            'from': pyarrow.array([row['from'] for row in rows], pyarrow.string()),
+            'to': pyarrow.array([row['to'] for row in rows], pyarrow.string()),
+            # Messages vary in shape between event types, so they are kept as JSON text.
+            'history': pyarrow.array([json.dumps(row['history']) for row in rows], pyarrow.string()),
+        })
+        path = os.path.join(self.directory, f'part-{self._next_part:05d}.parquet')
+        pyarrow.parquet.write_table(table, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        self._next_part += 1
+
+    def close(self):
+        self._flush()
+
+
+class MessageHistoryExporter:
+    """
+    Fetches the message history of every lead of an iterable (usually a campaign's iter_leads paginator),
+    with up to max_concurrency requests in flight, and writes each history to the output as soon as it
+    arrives. At most max_concurrency histories and one page of leads are held in memory at any time.
+
+    Every output record is {'campaign_id', 'lead_id', 'lead_email', 'history', 'from', 'to'}. With format
+    'jsonl', destination is a file with one record per line. With 'parquet', it is a directory of
+    part-NNNNN.parquet files of rows_per_file records each, with history as JSON text (needs pyarrow).
+
+    With resume, leads already in the output are skipped, so an interrupted export can be run again and
+    only fetches the missing histories. Without it, the output is overwritten.
+
+    ### Args:
+        * campaign_id (int): The id of the campaign, written in every record
+        * fetch (Callable[[int], Dict]): Fetches the history of one lead, e.g. a bound get_lead_message_history
+        * destination (str | os.PathLike): The output file (jsonl) or directory (parquet)
+        * format (str): 'jsonl' or 'parquet'. Defaults to 'jsonl'.
+        * max_concurrency (int): The maximum number of history requests in flight. Defaults to 8.
+        * retries (int): How many times a failed request is retried on top of max_retries, see _retrying. Defaults to 2.
+        * backoff (float): The delay in seconds before the first retry, doubled after every attempt. Defaults to 1.0.
+        * resume (bool): Whether to keep the existing output and skip the leads in it. Defaults to True.
+        * rows_per_file (int): The number of records per Parquet file. Defaults to 10000.
+    """
+
+    def __init__(self, campaign_id: int, fetch: Callable[[int], Dict], destination: Union[str, os.PathLike],
+                 format: Literal['jsonl', 'parquet'] = 'jsonl', max_concurrency: int = 8, retries: int = 2,
+                 backoff: float = 1.0, resume: bool = True, rows_per_file: int = 10000):
+        if format not in ('jsonl', 'parquet'):
+            raise ValueError(f"Unknown format {format!r}, expected 'jsonl' or 'parquet'")
+        self.campaign_id = campaign_id
+        self.fetch = fetch
+        self.destination = destination
+        self.format = format
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.resume = resume
+        self.rows_per_file = rows_per_file
+
+    def _open(self):
+        if self.format == 'parquet':
+            return _ParquetSink(self.destination, self.resume, self.rows_per_file)
+        return _JSONLinesSink(self.destination, self.resume)
+
+    @staticmethod
+    def _lead(row) -> Tuple[int, Union[str, None]]:
+        row = _plain_record(row)
+        lead = _plain_record(row.get('lead')) or {}
+        return lead.get('id'), lead.get('email')
+
+    def _record(self, lead_id: int, lead_email: Union[str, None], response: Dict) -> Dict:
+        return {'campaign_id': self.campaign_id, 'lead_id': lead_id, 'lead_email': lead_email,
+                'history': response.get('history') or [], 'from': response.get('from'), 'to': response.get('to')}
+
+    @staticmethod
+    def _error(response) -> Union[str, None]:
+        return _response_error(response) or (None if isinstance(response, dict) else f'Unexpected response: {response!r}')
+
+    def _fetch_one(self, lead_id: int):
+        return _retrying(lambda: self.fetch(lead_id), self.retries, self.backoff, self._error)
+
+    async def _fetch_one_async(self, lead_id: int):
+        return await _aretrying(lambda: self.fetch(lead_id), self.retries, self.backoff, self._error)
+
+    @staticmethod
+    def _add(report: MessageHistoryExportReport, sink, record: Union[Dict, None], lead_id: int, error, attempts: int):
+        report.requests_sent += attempts
+        if error is None:
+            sink.write(record)
+            report.exported += 1
+        else:
+            report.failed.append({'lead_id': lead_id, 'error': error})
+
+    def run(self, leads: Iterable[Dict]) -> MessageHistoryExportReport:
+        """
+        Exports the histories of the leads using a thread pool and returns the report. An error raised while
+        iterating leads stops the export and is stored in report.error; the histories already requested are
+        still written.
+        """
+        report = MessageHistoryExportReport()
+        started = time.perf_counter()
+        sink = self._open()
+        pending = {}
+
+        def collect(done):
+            for future in done:
+                lead_id, lead_email = pending.pop(future)
+                response, error, attempts = future.result()
+                record = None if error is not None else self._record(lead_id, lead_email, response)
+                self._add(report, sink, record, lead_id, error, attempts)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                try:
+                    for row in leads:
+                        lead_id, lead_email = self._lead(row)
+                        if lead_id in sink.done:
+                            report.skipped += 1
+                            continue
+                        if len(pending) >= self.max_concurrency:
+                            collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                        pending[executor.submit(self._fetch_one, lead_id)] = (lead_id, lead_email)
+                except Exception as e:
+                    report.error = repr(e)
+                collect(wait(pending).done)
+        finally:
+            sink.close()
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    async def arun(self, leads: AsyncIterator[Dict]) -> MessageHistoryExportReport:
+        """
+        Exports the histories of the leads using asyncio tasks and returns the report. An error raised while
+        iterating leads stops the export and is stored in report.error; the histories already requested are
+        still written.
+        """
+        report = MessageHistoryExportReport()
+        started = time.perf_counter()
+        sink = self._open()
+        pending = {}
+
+        def collect(done):
+            for task in done:
+                lead_id, lead_email = pending.pop(task)
+                response, error, attempts = task.result()
+                record = None if error is not None else self._record(lead_id, lead_email, response)
+                self._add(report, sink, record, lead_id, error, attempts)
+
+        try:
+            try:
+                async for row in leads:
+                    lead_id, lead_email = self._lead(row)
+                    if lead_id in sink.done:
+                        report.skipped += 1
+                        continue
+                    if len(pending) >= self.max_concurrency:
+                        collect((await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED))[0])
+                    pending[asyncio.ensure_future(self._fetch_one_async(lead_id))] = (lead_id, lead_email)
+            except Exception as e:
+                report.error = repr(e)
+            if pending:
+                collect((await asyncio.wait(pending))[0])
+        finally:
+            for task in pending:
+                task.cancel()
+            sink.close()
+        report.elapsed = time.perf_counter() - started
+        return report
+
+
+class StatisticsColumns:
+    """
+    The statistics rows of a campaign stored column by column, as NumPy arrays when NumPy is installed and
+    as lists otherwise, with vectorized aggregations. Build it with campaigns.get_statistics_columns, which
+    appends every page straight into the columns, or from any rows with from_rows.
+
+    The columns are lead_email, sequence_number (-1 when missing), email_status, sent_time, open_time,
+    click_time and reply_time (datetime64[ms] with NaT, or ISO strings and None without NumPy), and the
+    booleans opened, clicked, replied, bounced and unsubscribed. to_arrow() converts them to a pyarrow Table.
+    """
+
+    metrics = ('opened', 'clicked', 'replied', 'bounced', 'unsubscribed')
+    _times = ('sent_time', 'open_time', 'click_time', 'reply_time')
+
+    def __init__(self):
+        self._lists = {name: [] for name in ('lead_email', 'sequence_number', 'email_status') + self._times + self.metrics}
+        self.columns = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict]) -> 'StatisticsColumns':
+        """
+        Builds the columns from statistics rows, e.g. the data of get_statistics pages
+        """
+        columns = cls()
+        columns._append(rows)
+        return columns._finish()
+
+    def _append(self, rows: Iterable[Dict]):
+        lists = self._lists
+        for row in rows:
+            row = _plain_record(row)
+            lists['lead_email'].append(row.get('lead_email'))
+            sequence_number = row.get('sequence_number')
+            lists['sequence_number'].append(-1 if sequence_number is None else int(sequence_number))
+            lists['email_status'].append(row.get('email_status'))
+            for name in self._times:
+                value = row.get(name)
+                # numpy rejects the Z suffix of the API's UTC timestamps.
+                lists[name].append(value[:-1] if value and value.endswith('Z') else value)
+            lists['opened'].append(bool(row.get('open_time') or row.get('open_count')))
+            lists['clicked'].append(bool(row.get('click_time') or row.get('click_count')))
+            lists['replied'].append(bool(row.get('reply_time')))
+            lists['bounced'].append(bool(row.get('is_bounced')))
+            lists['unsubscribed'].append(bool(row.get('is_unsubscribed')))
+
+    def _finish(self) -> 'StatisticsColumns':
+        lists, self._lists = self._lists, None
+        if numpy is None:
+            self.columns = lists
+            return self
+        self.columns = {
+            'lead_email': numpy.array(lists['lead_email'], dtype=object),
+            'sequence_number': numpy.array(lists['sequence_number'], dtype=numpy.int64),
+            'email_status': numpy.array(lists['email_status'], dtype=object),
+            **{name: numpy.array([value or 'NaT' for value in lists[name]], dtype='datetime64[ms]') for name in self._times},
+            **{name: numpy.array(lists[name], dtype=bool) for name in self.metrics},
+        }
+        return self
+
+    def __len__(self):
+        return len(self.columns['sequence_number'])
+
+    def summary(self) -> Dict:
+        """
+        Returns the counts and rates of every metric over all rows,
+        e.g. {'sent': 1000, 'opened': 400, 'open_rate': 0.4, ...}
+        """
+        keys = [0] * len(self) if numpy is None else numpy.zeros(len(self), dtype=numpy.int8)
+        return self._aggregate(keys, convert=int).get(0) or self._rates(0, dict.fromkeys(self.metrics, 0))
+
+    def by_sequence(self) -> Dict[int, Dict]:
+        """
+        Returns the counts and rates of every metric per sequence number
+        """
+        return self._aggregate(self.columns['sequence_number'], convert=int)
+
+    def by_status(self) -> Dict[str, Dict]:
+        """
+        Returns the counts and rates of every metric per email status
+        """
+        keys = self.columns['email_status']
+        if numpy is None:
+            return self._aggregate(keys)
+        # Missing statuses are grouped under None, like without NumPy.
+        keys = numpy.array([status or '' for status in keys], dtype=str)
+        return self._aggregate(keys, convert=lambda key: str(key) or None)
+
+    def by_date(self, bucket: Literal['day', 'week', 'month'] = 'day',
+                field: Literal['sent_time', 'open_time', 'click_time', 'reply_time'] = 'sent_time') -> Dict[str, Dict]:
+        """
+        Returns the counts and rates of every metric per day, week (starting on Monday) or month of a timestamp.
+        Rows without that timestamp are left out.
+
+        ### Args:
+            * bucket (str): 'day', 'week' or 'month'. Defaults to 'day'.
+            * field (str): The timestamp to bucket by. Defaults to 'sent_time'.
+        """
+        if bucket not in ('day', 'week', 'month'):
+            raise ValueError(f"Unknown bucket {bucket!r}, expected 'day', 'week' or 'month'")
+        times = self.columns[field]
+        if numpy is None:
+            keys = [None if value is None else _date_bucket(value, bucket) for value in times]
+            return {key: value for key, value in self._aggregate(keys).items() if key is not None}
+        valid = ~numpy.isnat(times)
+        if bucket == 'month':
+            keys = times.astype('datetime64[M]')
+        else:
+            keys = times.astype('datetime64[D]')
+            if bucket == 'week':
+                # 1970-01-01 was a Thursday, so day 0 is weekday 3 counting from Monday.
+                keys = keys - ((keys.view(numpy.int64) + 3) % 7).astype('timedelta64[D]')
+        return self._aggregate(keys, valid, convert=str)
+
+    def _aggregate(self, keys, valid=None, convert: Callable = None) -> Dict:
+        if numpy is None:
+            counts = {}
+            for i, key in enumerate(keys):
+                group = counts.setdefault(key, dict.fromkeys(('sent',) + self.metrics, 0))
+                group['sent'] += 1
+                for name in self.metrics:
+                    group[name] += self.columns[name][i]
+            return {key: self._rates(group.pop('sent'), group)
+                    for key, group in sorted(counts.items(), key=lambda item: (item[0] is None, item[0]))}
+        if valid is not None:
+            keys = keys[valid]
+        groups, inverse = numpy.unique(keys, return_inverse=True)
+        sent = numpy.bincount(inverse, minlength=len(groups))
+        totals = {name: numpy.bincount(inverse, weights=self.columns[name] if valid is None else self.columns[name][valid],
+                                       minlength=len(groups)) for name in self.metrics}
+        return {convert(group): self._rates(int(sent[i]), {name: int(totals[name][i]) for name in self.metrics})
+                for i, group in enumerate(groups)}
+
+    @staticmethod
+    def _rates(sent: int, counts: Dict[str, int]) -> Dict:
+        return {'sent': sent, **counts,
+                'open_rate': counts['opened'] / sent if sent else 0.0,
+                'click_rate': counts['clicked'] / sent if sent else 0.0,
+                'reply_rate': counts['replied'] / sent if sent else 0.0,
+                'bounce_rate': counts['bounced'] / sent if sent else 0.0,
+                'unsubscribe_rate': counts['unsubscribed'] / sent if sent else 0.0}
+
+    def to_arrow(self):
+        """
+        Returns the columns as a pyarrow Table. Needs pyarrow.
+        """
+        if pyarrow is None:
+            raise ImportError(
+                'to_arrow requires pyarrow. Install it with: pip install pyarrow')
+        return pyarrow.table({name: pyarrow.array(values) for name, values in self.columns.items()})
+
+    def __repr__(self):
+        return f"StatisticsColumns(rows={len(self)}, backend={'numpy' if numpy is not None else 'python'})"
+
+
+def _date_bucket(value: str, bucket: str) -> str:
+    if bucket == 'month':
+        return value[:7]
+    if bucket == 'week':
+        day = date.fromisoformat(value[:10])
+        return (day - timedelta(days=day.weekday())).isoformat()
+    return value[:10]
+
+
+class _Unknown:
+    def __repr__(self):
+        return '?'
+
+
+# The current value of a field the API does not report.
+_UNKNOWN = _Unknown()
+
+
+def _field(*path: str, convert: Union[Callable, None] = None) -> Callable[[Dict], object]:
+    def get(record: Dict):
+        for key in path:
+            if not isinstance(record, dict) or key not in record:
+                return _UNKNOWN
+            record = _plain_record(record[key])
+        return record if convert is None else convert(record)
+    return get
+
+
+def _same(current, desired) -> bool:
+    if current is _UNKNOWN:
+        return False
+    return current == desired or (current is not None and desired is not None and str(current) == str(desired))
+
+
+class ReconcilePlan:
+    """
+    The changes found by a reconcile between the desired and the current state. Each change is a dict with
+    the action (the client method that applies it, e.g. 'update' or 'add_email_accounts'), its target (the
+    email account or campaign id), a label and the diff, as {field: (current, desired)} for email accounts
+    and {'email_account_ids': [...]} for campaigns. unchanged counts the targets already in the desired
+    state, and missing lists the desired entries that match nothing. incomplete lists the changes that
+    were not planned because their request sets fields the entry leaves out and the API does not report,
+    as dicts with the action, target, label and the names of those fields.
+
+    A dry run returns the plan as is; print it to review the changes. Otherwise the plan is applied and
+    every change gets a 'result' or an 'error'.
+    """
+
+    def __init__(self):
+        self.changes = []
+        self.unchanged = 0
+        self.missing = []
+        self.incomplete = []
+        self.applied = False
+        self._calls = []
+
+    def _add(self, action: str, target: int, label: str, diff: Dict, call: Callable):
+        self.changes.append({'action': action, 'target': target, 'label': label, 'diff': diff})
+        self._calls.append(call)
+
+    @property
+    def errors(self) -> List[Dict]:
+        return [change for change in self.changes if 'error' in change]
+
+    def _run(self, index: int):
+        try:
+            response = self._calls[index]()
+        except Exception as e:
+            return index, None, repr(e)
+        return index, response, _response_error(response)
+
+    async def _arun(self, index: int, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            try:
+                response = await self._calls[index]()
+            except Exception as e:
+                return index, None, repr(e)
+        return index, response, _response_error(response)
+
+    def _record(self, index: int, response, error: Union[str, None]):
+        if error is None:
+            self.changes[index]['result'] = response
+        else:
+            self.changes[index]['error'] = error
+
+    def _apply(self, max_concurrency: int) -> 'ReconcilePlan':
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            for result in executor.map(self._run, range(len(self.changes))):
+                self._record(*result)
+        self.applied = True
+        return self
+
+    async def _aapply(self, max_concurrency: int) -> 'ReconcilePlan':
+        semaphore = asyncio.Semaphore(max_concurrency)
+        for result in await asyncio.gather(*[self._arun(index, semaphore) for index in range(len(self.changes))]):
+            self._record(*result)
+        self.applied = True
+        return self
+
+    def __str__(self):
+        lines = []
+        for change in self.changes:
+            action = change['action']
+            if action.startswith('add'):
+                sign, details = '+', ', '.join(map(str, change['diff']['email_account_ids']))
+            elif action.startswith('remove'):
+                sign, details = '-', ', '.join(map(str, change['diff']['email_account_ids']))
+            else:
+                sign, details = '~', ', '.join(f'{name} {current!r} -> {desired!r}'
+                                               for name, (current, desired) in change['diff'].items())
+            status = f" [failed: {change['error']}]" if 'error' in change else ''
+            lines.append(f"{sign} {change['label']} {action}: {details}{status}")
+        lines.extend(f'! not found: {entry!r}' for entry in self.missing)
+        lines.extend(f"! {change['label']} {change['action']}: set {', '.join(change['fields'])} to plan it"
+                     for change in self.incomplete)
+        lines.append(f'{self.unchanged} unchanged')
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return (f"ReconcilePlan(changes={len(self.changes)}, unchanged={self.unchanged}, missing={len(self.missing)}, "
+                f"incomplete={len(self.incomplete)}, applied={self.applied}, failed={len(self.errors)})")
+
+
+class CampaignAnalyticsReport:
+    """
+    Merged result of campaigns.fetch_analytics. campaigns maps every campaign id to the resources fetched for
+    it, e.g. {'top_level_analytics': {...}, 'email_accounts': [...]}. errors maps the ids of campaigns with
+    failed requests to {resource: error}; the resources that succeeded are still in campaigns.
+    """
+
+    def __init__(self):
+        self.campaigns = {}
+        self.errors = {}
+        self.elapsed = 0.0
+
+    def _add(self, campaign_id: int, resource: str, response, error: Union[str, None]):
+        self.campaigns.setdefault(campaign_id, {})
+        if error is None:
+            self.campaigns[campaign_id][resource] = response
+        else:
+            self.errors.setdefault(campaign_id, {})[resource] = error
+
+    def __repr__(self):
+        return f"CampaignAnalyticsReport(campaigns={len(self.campaigns)}, failed={len(self.errors)}, elapsed={self.elapsed:.2f})"
+
+
+def _has_emails(desired: Mapping[int, Iterable[Union[int, str]]]) -> bool:
+    return any(isinstance(account, str) for accounts in desired.values() for account in accounts)
+
+
+def _remaining_offsets(first: Dict, total_key: str, page_size: int) -> range:
+    # The API caps the rows per page, so the first page may hold fewer than page_size rows: step by what it held.
+    step = min(page_size, len(first.get('data') or [])) or page_size
+    return range(step, int(first[total_key] or 0), step)
+
+
+def _statistics_page(page) -> Dict:
+    error = _response_error(page)
+    if error is not None or not isinstance(page, dict):
+        raise RuntimeError(error or f'Unexpected statistics page: {page!r}')
+    return page
+
+
+def _response_error(response) -> Union[str, None]:
+    if isinstance(response, dict) and (response.get('ok') is False or 'error' in response):
+        return str(response.get('error') or response.get('message') or response)
+    return None
+
+
+def _retrying(call: Callable, retries: int, backoff: float,
+              check: Callable = _response_error) -> Tuple[object, Union[str, None], int]:
+    """
+    Calls call until check accepts its response, at most retries + 1 times with exponential backoff, and
+    returns the response or None, the last error or None, and the number of attempts.
+
+    These retries come on top of the ones of the transport: every attempt is a request the transport itself
+    retries up to max_retries times on 429 and 5xx responses, so one call sends at most
+    (retries + 1) * (max_retries + 1) requests. Lower one of the two when both are set.
+    """
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            response = call()
+        except Exception as e:
+            error = repr(e)
+            continue
+        error = check(response)
+        if error is None:
+            return response, None, attempt + 1
+    return None, error, retries + 1
+
+
+async def _aretrying(call: Callable, retries: int, backoff: float,
+                     check: Callable = _response_error) -> Tuple[object, Union[str, None], int]:
+    """
+    The asyncio version of _retrying, for a call returning an awaitable
+    """
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            response = await call()
+        except Exception as e:
+            error = repr(e)
+            continue
+        error = check(response)
+        if error is None:
+            return response, None, attempt + 1
+    return None, error, retries + 1
+
+
+class _DefaultV1:
+    """
+    Smartlead.v1 read on the class itself: the v1 of a default client shared by the whole process, created on
+    first use without an API key so that it follows Smartlead.api_key. Clients shadow it with their own v1.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __get__(self, instance, owner):
+        with self._lock:
+            if self._client is None:
+                self._client = owner()
+        return self._client.v1
 
 
 class Smartlead:
     """
     Python implementation of Smartlead API
         https://help.smartlead.ai/API-Documentation-a0d223bdd3154a77b3735497aad9419f
+
+    Every resource of a client sends its requests through one pooled Transport. Use the client as a
+    context manager, or call close(), to release its connections.
+
+    Each client has its own API key, base url, connection pool and settings, and can be shared between
+    threads. Give every tenant its own client, and use run_for_tenants to run one operation across them.
+    Smartlead.v1, read on the class, still works as before: it uses a default client keyed by Smartlead.api_key.
+
+    ### Args:
+        * api_key (str | None): The API key of this client. None falls back to the class-wide Smartlead.api_key.
+          Defaults to None.
+        * base_url (str | None): The base url of the API, e.g. to target a MockSmartleadServer. Defaults to None, the
+          Smartlead API.
+        * pool_connections (int): The number of per-host connection pools to keep. Defaults to 10.
+        * pool_maxsize (int): The maximum number of connections kept alive per host. Defaults to 10.
+        * pool_block (bool): Whether pool_maxsize is a hard per-host limit. Defaults to False.
+        * timeout (float | Tuple[float, float] | None): The connect and read timeout in seconds. Defaults to (10, 60).
+        * rate_limiter (RateLimiter | None): The token bucket shared by every request of the client. Defaults to None.
+        * max_retries (int): How many times a 429 or 5xx response is retried. Defaults to 3.
+        * cache (ResponseCache | None): The opt-in cache of read-mostly GET responses. Defaults to None.
+        * typed (bool): Whether campaigns, leads, statistics rows and email accounts are returned as Record objects
+          instead of dicts. Defaults to False.
+        * coalescer (RequestCoalescer | None): Makes identical GETs issued concurrently share one in-flight request.
+          Defaults to None.
+        * timeouts (Dict[str, float | Tuple[float, float]], optional): The timeout of each endpoint template that
+          overrides timeout. Defaults to None.
+        * hedging (HedgePolicy | None): Sends a second GET when the first is slower than usual. Defaults to None.
+        * circuit_breaker (CircuitBreaker | None): Fails fast on endpoints whose error rate spiked. Defaults to None.
+        * compress_requests (int | None): The minimum size in bytes of a JSON body sent gzip-compressed, e.g. 16384 for
+          large add_leads_to_campaign calls. None never compresses. Defaults to None.
+        * compress_responses (bool): Whether gzip-compressed responses are requested. Defaults to True.
+        * transport (Transport, optional): An existing transport to use instead of creating one. The other arguments are
+          ignored when it is set. Defaults to None.
     """
 
     api_key = None
+    v1 = _DefaultV1()
+
+    def __init__(self, api_key: Union[str, None] = None, base_url: Union[str, None] = None, pool_connections: int = 10,
+                 pool_maxsize: int = 10, pool_block: bool = False,
+                 timeout: Union[float, Tuple[float, float], None] = (10, 60),
+                 rate_limiter: Union[RateLimiter, None] = None, max_retries: int = 3,
+                 cache: Union[ResponseCache, None] = None, typed: bool = False,
+                 coalescer: Union[RequestCoalescer, None] = None,
+                 timeouts: Union[Dict[str, Union[float, Tuple[float, float]]], None] = None,
+                 hedging: Union[HedgePolicy, None] = None, circuit_breaker: Union[CircuitBreaker, None] = None,
+                 compress_requests: Union[int, None] = None, compress_responses: bool = True,
+                 transport: Union[Transport, None] = None):
+        self.transport = transport or Transport(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                                pool_block=pool_block, timeout=timeout,
+                                                rate_limiter=rate_limiter, max_retries=max_retries,
+                                                cache=cache, api_key=api_key, base_url=base_url, typed=typed,
+                                                coalescer=coalescer, timeouts=timeouts, hedging=hedging,
+                                                circuit_breaker=circuit_breaker, compress_requests=compress_requests,
+                                                compress_responses=compress_responses)
+        self.v1 = Smartlead._V1(self.transport)
+
+    def add_hook(self, name: Literal['before_request', 'after_response', 'on_error'],
+                 callback: Callable[[RequestEvent], None]):
+        """
+        Registers a callback called with the RequestEvent of every request this client sends. See Transport.add_hook.
+        """
+        self.transport.add_hook(name, callback)
+
+    def remove_hook(self, name: str, callback: Callable[[RequestEvent], None]):
+        """
+        Unregisters a callback added with add_hook
+        """
+        self.transport.remove_hook(name, callback)
+
+    def close(self):
+        """
+        Closes the connections held by this client's transport
+        """
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     class _V1:
         _base_url = 'https://server.smartlead.ai/api/v1'
 
+        def __init__(self, transport: Union[Transport, AsyncTransport]):
+            self.campaigns = Smartlead._V1._CampaignsV1(transport)
+            self.leads = Smartlead._V1._LeadsV1(transport)
+            self.email_accounts = Smartlead._V1._EmailAccountsV1(transport)
+            self.clients = Smartlead._V1._ClientsV1(transport)
+
         @staticmethod
-        def endpoint(endpoint: str, query_params="") -> str:
+        def endpoint(endpoint: str, query_params="", api_key: Union[str, None] = None,
+                     base_url: Union[str, None] = None) -> str:
             api_endpoint = endpoint if endpoint.startswith(
                 '/') else f"/{endpoint}"
-            api_key_suffix = f"?api_key={Smartlead.api_key}"
-            return f"{Smartlead._V1._base_url}{api_endpoint}{api_key_suffix}{query_params}"
+            api_key_suffix = f"?api_key={Smartlead.api_key if api_key is None else api_key}"
+            return f"{base_url or Smartlead._V1._base_url}{api_endpoint}{api_key_suffix}{query_params}"
 
-        class _CampaignsV1():
+        class _ResourceV1():
+            def __init__(self, transport: Union[Transport, AsyncTransport]):
+                self._transport = transport
+
+            @property
+            def _is_async(self) -> bool:
+                return isinstance(self._transport, AsyncTransport)
+
+        class _CampaignsV1(_ResourceV1):
             def get(self, campaign_id: int):
                 """
                 This endpoint fetches a campaign based on its id.
@@ -28,9 +3183,7 @@ class Smartlead:
                 ### Args:
                     * campaign_id (int): The id of the campaign you want to fetch
                 """
-                r = requests.get(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}'))
-                return r.json()
+                return self._transport.request('GET', '/campaigns/{campaign_id}', campaign_id=campaign_id)
 
             def create(self, name: str, client_id: Union[int, None]):
                 """
@@ -40,11 +3193,10 @@ class Smartlead:
                     * name (str): Name of campaign to be created
                     * client_id (int | None): The id of the client you want to associate with the campaign. If None, the campaign will be created without a client
                 """
-                r = requests.post(Smartlead._V1.endpoint(f'/campaigns/create'), json={
+                return self._transport.request('POST', '/campaigns/create', json={
                     'name': name,
                     'client_id': client_id
                 })
-                return r.json()
 
             def update_schedule(self, timezone: str, days_of_the_week: List[int], start_hour: str, end_hour: str, min_time_btw_emails: int, max_new_leads_per_day: int, schedule_start_time: str):
                 """
@@ -59,7 +3211,7 @@ class Smartlead:
                     * max_new_leads_per_day (int): The maximum number of new leads you want to send emails to per day.
                     * schedule_start_time (str): The time you want to start the campaign. This is in standard ISO format. For example, 2021-01-01T00:00:00Z is January 1st, 2021 at 12:00 AM UTC.
                 """
-                r = requests.post(Smartlead._V1.endpoint(f'/campaigns/create'), json={
+                return self._transport.request('POST', '/campaigns/create', json={
                     'timezone': timezone,
                     'days_of_the_week': days_of_the_week,
                     'start_hour': start_hour,
@@ -68,7 +3220,6 @@ class Smartlead:
                     'max_new_leads_per_day': max_new_leads_per_day,
                     'schedule_start_time': schedule_start_time,
                 })
-                return r.json()
 
             def update_settings(self, campaign_id: int, track_settings: List[Literal['DONT_TRACK_EMAIL_OPEN',  'DONT_TRACK_LINK_CLICK', 'DONT_TRACK_REPLY_TO_AN_EMAIL']], stop_lead_settings: List[Literal['REPLY_TO_AN_EMAIL', 'CLICK_ON_A_LINK', 'OPEN_AN_EMAIL']], unsubscribe_text: str, send_as_plain_text: bool, follow_up_percentage: int, client_id: Union[int, None]):
                 """
@@ -82,15 +3233,14 @@ class Smartlead:
                     * follow_up_percentage (int): The percentage of leads you want to follow up with. For example, if you want to follow up with 50% of leads, set this to 50.
                     * client_id (int | None): The id of the client you want to associate with the campaign. If None, the campaign will have no client set.
                 """
-                r = requests.post(Smartlead._V1.endpoint(f'/campaigns/{campaign_id}/settings'), json={
+                return self._transport.request('POST', '/campaigns/{campaign_id}/settings', json={
                     'track_settings': track_settings,
                     'stop_lead_settings': stop_lead_settings,
                     'unsubscribe_text': unsubscribe_text,
                     'send_as_plain_text': str(send_as_plain_text).lower(),
                     'follow_up_percentage': follow_up_percentage,
                     'client_id': client_id
-                })
-                return r.json()
+                }, campaign_id=campaign_id)
 
             def get_sequences(self, campaign_id: int):
                 """
@@ -99,9 +3249,7 @@ class Smartlead:
                 ### Args:
                     * campaign_id (int): The id of the campaign you want to fetch sequence data for.
                 """
-                r = requests.get(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/sequences'))
-                return r.json()
+                return self._transport.request('GET', '/campaigns/{campaign_id}/sequences', campaign_id=campaign_id)
 
             def save_sequences(self, campaign_id: int, sequences: list):
                 """
@@ -111,17 +3259,15 @@ class Smartlead:
                     * campaign_id (int): The id of the campaign you want to save sequence data for.
                     * sequences (list): The sequence data you want to save.
                 """
-                r = requests.post(Smartlead._V1.endpoint(f'/campaigns/{campaign_id}/sequences'), json={
+                return self._transport.request('POST', '/campaigns/{campaign_id}/sequences', json={
                     'sequences': sequences
-                })
-                return r.json()
+                }, campaign_id=campaign_id)
 
             def all(self):
                 """
                 This endpoint fetches all the campaigns in your account
                 """
-                r = requests.get(Smartlead._V1.endpoint(f'/campaigns'))
-                return r.json()
+                return self._transport.request('GET', '/campaigns')
 
             def delete(self, campaign_id: int):
                 """
@@ -130,9 +3276,7 @@ class Smartlead:
                 ### Args:
                     * campaign_id (int): The id of the campaign you want to delete
                 """
-                r = requests.delete(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}'))
-                return r.json()
+                return self._transport.request('DELETE', '/campaigns/{campaign_id}', campaign_id=campaign_id)
 
             def get_all_email_accounts(self, campaign_id: int):
                 """
@@ -141,9 +3285,7 @@ class Smartlead:
                 ### Args:
                     * campaign_id (int): The id of the campaign you want to fetch email accounts for
                 """
-                r = requests.get(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/email-accounts'))
-                return r.json()
+                return self._transport.request('GET', '/campaigns/{campaign_id}/email-accounts', campaign_id=campaign_id)
 
             def add_email_accounts(self, campaign_id: int, email_account_ids: List[int]):
                 """
@@ -153,10 +3295,9 @@ class Smartlead:
                     * campaign_id (int): The id of the campaign you want to add email accounts to
                     * email_account_ids (List[int]): The ids of the email accounts you want to add
                 """
-                r = requests.post(Smartlead._V1.endpoint(f'/campaigns/{campaign_id}/email-accounts'), json={
+                return self._transport.request('POST', '/campaigns/{campaign_id}/email-accounts', json={
                     'email_account_ids': email_account_ids
-                })
-                return r.json()
+                }, campaign_id=campaign_id)
 
             def remove_email_accounts(self, campaign_id: int, email_account_ids: List[int]):
                 """
@@ -166,10 +3307,74 @@ class Smartlead:
                     * campaign_id (int): The id of the campaign you want to remove email accounts from
                     * email_account_ids (List[int]): The ids of the email accounts you want to remove
                 """
-                r = requests.delete(Smartlead._V1.endpoint(f'/campaigns/{campaign_id}/email-accounts'), json={
+                return self._transport.request('DELETE', '/campaigns/{campaign_id}/email-accounts', json={
                     'email_account_ids': email_account_ids
-                })
-                return r.json()
+                }, campaign_id=campaign_id)
+
+            def reconcile_email_accounts(self, desired: Mapping[int, Iterable[Union[int, str]]], dry_run: bool = False,
+                                         max_concurrency: int = 8) -> ReconcilePlan:
+                """
+                This makes the email accounts of campaigns match a desired assignment. The current accounts of every
+                campaign are fetched concurrently, and add_email_accounts/remove_email_accounts are only sent for the
+                campaigns that differ.
+
+                ### Args:
+                    * desired (Mapping[int, Iterable[int | str]]): The email accounts each campaign should have, by id
+                      or by from_email, e.g. {campaign_id: [1, 'b@example.com']}. Campaigns left out are not touched.
+                    * dry_run (bool): Whether to only return the plan without sending anything. Defaults to False.
+                    * max_concurrency (int): The maximum number of requests in flight. Defaults to 8.
+                """
+                email_accounts = Smartlead._V1._EmailAccountsV1(self._transport)
+                if self._is_async:
+                    return self._reconcile_email_accounts_async(email_accounts, desired, dry_run, max_concurrency)
+                accounts = email_accounts.all() if _has_emails(desired) else []
+                with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                    current = dict(zip(desired, executor.map(self.get_all_email_accounts, desired)))
+                plan = self._plan_email_accounts(accounts, current, desired)
+                return plan if dry_run else plan._apply(max_concurrency)
+
+            async def _reconcile_email_accounts_async(self, email_accounts,
+                                                      desired: Mapping[int, Iterable[Union[int, str]]], dry_run: bool,
+                                                      max_concurrency: int) -> ReconcilePlan:
+                semaphore = asyncio.Semaphore(max_concurrency)
+
+                async def fetch(campaign_id):
+                    async with semaphore:
+                        return await self.get_all_email_accounts(campaign_id)
+                accounts = await email_accounts.all() if _has_emails(desired) else []
+                current = dict(zip(desired, await asyncio.gather(*[fetch(campaign_id) for campaign_id in desired])))
+                plan = self._plan_email_accounts(accounts, current, desired)
+                return plan if dry_run else await plan._aapply(max_concurrency)
+
+            def _plan_email_accounts(self, accounts, current: Dict,
+                                     desired: Mapping[int, Iterable[Union[int, str]]]) -> ReconcilePlan:
+                for response in [accounts, *current.values()]:
+                    error = _response_error(response)
+                    if error is not None:
+                        raise RuntimeError(f'Could not list email accounts: {error}')
+                ids = {str(account.get('from_email')).lower(): account.get('id') for account in map(_plain_record, accounts or [])}
+                plan = ReconcilePlan()
+                for campaign_id, wanted in desired.items():
+                    want = set()
+                    for account in wanted:
+                        if isinstance(account, str):
+                            if account.lower() not in ids:
+                                plan.missing.append(account)
+                                continue
+                            account = ids[account.lower()]
+                        want.add(account)
+                    have = {_plain_record(account).get('id') for account in current[campaign_id] or []}
+                    add, remove = sorted(want - have), sorted(have - want)
+                    label = f'campaign {campaign_id}'
+                    if add:
+                        plan._add('add_email_accounts', campaign_id, label, {'email_account_ids': add},
+                                  lambda campaign_id=campaign_id, add=add: self.add_email_accounts(campaign_id, add))
+                    if remove:
+                        plan._add('remove_email_accounts', campaign_id, label, {'email_account_ids': remove},
+                                  lambda campaign_id=campaign_id, remove=remove: self.remove_email_accounts(campaign_id, remove))
+                    if not add and not remove:
+                        plan.unchanged += 1
+                return plan
 
             def get_leads(self, campaign_id: int, offset: int, limit: int):
                 """
@@ -180,20 +3385,64 @@ class Smartlead:
                     * offset (int): The offset of the leads you want to fetch. For example, if you want to fetch leads from 10 to 20, set offset to 10.
                     * limit (int): The limit of the leads you want to fetch. For example, if you want to fetch 10 leads, set limit to 10.
                 """
-                r = requests.get(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/leads', f'&offset={offset}&limit={limit}'))
-                return r.json()
+                return self._transport.request('GET', '/campaigns/{campaign_id}/leads', query={'offset': offset, 'limit': limit},
+                                               campaign_id=campaign_id)
+
+            def iter_leads(self, campaign_id: int, page_size: int = 100, offset: int = 0,
+                           prefetch: bool = True) -> Paginator:
+                """
+                This iterates over all the leads in a campaign, fetching them lazily page by page with get_leads
+
+                ### Args:
+                    * campaign_id (int): The id of the campaign you want to fetch leads for
+                    * page_size (int): The number of leads to fetch per request. Defaults to 100.
+                    * offset (int): The offset to start from. Pass the offset of an interrupted iterator to resume it.
+                      Defaults to 0.
+                    * prefetch (bool): Whether to fetch the next page in the background while the current one is
+                      consumed. Defaults to True.
+                """
+                return Paginator(lambda offset, limit: self.get_leads(campaign_id, offset, limit),
+                                 page_size=page_size, offset=offset, prefetch=prefetch, total_key='total_leads')
 
             def export_leads_data(self, campaign_id: int):
                 """
-                This endpoint exports all the leads in a campaign
+                This endpoint exports all the leads in a campaign. The whole export is loaded in memory; use
+                iter_leads_export or download_leads_export for large campaigns.
+
+                ### Args:
+                    * campaign_id (int): The id of the campaign you want to export leads for
+                """
+                return self._transport.request('GET', '/campaigns/{campaign_id}/leads-export', campaign_id=campaign_id)
+
+            def iter_leads_export(self, campaign_id: int,
+                                  chunk_size: int = 65536) -> Union[Iterator[Dict], AsyncIterator[Dict]]:
+                """
+                This streams the leads export of a campaign and yields its rows as dicts while the body is still
+                downloading, so memory stays constant whatever the campaign size. With an async client, call aclose() on
+                the iterator when you stop before its end, to release the connection right away.
+
+                ### Args:
+                    * campaign_id (int): The id of the campaign you want to export leads for
+                    * chunk_size (int): The size in bytes of the chunks read from the response. Defaults to 65536.
+                """
+                chunks = self._transport.stream('GET', '/campaigns/{campaign_id}/leads-export', chunk_size=chunk_size,
+                                                campaign_id=campaign_id)
+                return _aiter_export_rows(chunks) if self._is_async else _iter_export_rows(chunks)
+
+            def download_leads_export(self, campaign_id: int, destination: Union[str, os.PathLike, BinaryIO],
+                                      chunk_size: int = 65536) -> int:
+                """
+                This streams the leads export of a campaign straight into a file and returns the number of bytes written
 
                 ### Args:
                     * campaign_id (int): The id of the campaign you want to export leads for
+                    * destination (str | PathLike | BinaryIO): The path of the file to write, or a binary
+                      file-like object
+                    * chunk_size (int): The size in bytes of the chunks read from the response. Defaults to 65536.
                 """
-                r = requests.get(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/leads-export'))
-                return r.json()
+                chunks = self._transport.stream('GET', '/campaigns/{campaign_id}/leads-export', chunk_size=chunk_size,
+                                                campaign_id=campaign_id)
+                return _awrite_chunks(chunks, destination) if self._is_async else _write_chunks(chunks, destination)
 
             def get_lead_message_history(self, campaign_id: int, lead_id: str):
                 """
@@ -203,9 +3452,37 @@ class Smartlead:
                     * campaign_id (int): The id of the campaign you want to fetch message history for
                     * lead_id (str): The id of the lead you want to fetch message history for
                 """
-                r = requests.get(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/leads/{lead_id}/message-history'))
-                return r.json()
+                return self._transport.request('GET', '/campaigns/{campaign_id}/leads/{lead_id}/message-history',
+                                               campaign_id=campaign_id, lead_id=lead_id)
+
+            def export_message_histories(self, campaign_id: int, destination: Union[str, os.PathLike],
+                                         format: Literal['jsonl', 'parquet'] = 'jsonl', max_concurrency: int = 8,
+                                         page_size: int = 100, resume: bool = True, retries: int = 2,
+                                         backoff: float = 1.0) -> MessageHistoryExportReport:
+                """
+                This pages through the leads of a campaign and writes the message history of every lead to a file,
+                fetching up to max_concurrency histories at once. Memory stays bounded whatever the campaign size, and
+                an interrupted export resumes where it stopped. If a page of leads fails, the export stops and the
+                report's error is set.
+
+                ### Args:
+                    * campaign_id (int): The id of the campaign you want to export message histories for
+                    * destination (str | os.PathLike): The JSONL file, or the directory of Parquet files, to write to
+                    * format (str): 'jsonl', or 'parquet' (needs pyarrow). Defaults to 'jsonl'.
+                    * max_concurrency (int): The maximum number of history requests in flight. Defaults to 8.
+                    * page_size (int): The number of leads to fetch per request. Defaults to 100.
+                    * resume (bool): Whether to skip the leads already in the output instead of overwriting it.
+                      Defaults to True.
+                    * retries (int): How many times a failed history request is retried, see MessageHistoryExporter.
+                      Defaults to 2.
+                    * backoff (float): The delay in seconds before the first retry, doubled after every attempt.
+                      Defaults to 1.0.
+                """
+                exporter = MessageHistoryExporter(campaign_id, lambda lead_id: self.get_lead_message_history(campaign_id, lead_id),
+                                                  destination, format=format, max_concurrency=max_concurrency, retries=retries,
+                                                  backoff=backoff, resume=resume)
+                leads = self.iter_leads(campaign_id, page_size=page_size)
+                return exporter.arun(leads) if self._is_async else exporter.run(leads)
 
             def get_statistics(self, campaign_id: int, offset: int, limit: int, email_sequence_number: Union[int, None] = None, email_status: Union[Literal['opened', 'clicked', 'replied', 'unsubscribed', 'bounced'], None] = None):
                 """
@@ -218,9 +3495,36 @@ class Smartlead:
                     * email_sequence_number (int, optional): The email sequence number of the statistics you want to fetch. For example, if you want to fetch statistics for the first email sequence, set email_sequence_number to 1. Defaults to None.
                     * email_status (str, optional): The email status of the statistics you want to fetch. For example, if you want to fetch statistics for opened emails, set email_status to 'opened'. Defaults to None.
                 """
-                r = requests.get(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/statistics', f'&offset={offset}&limit={limit}&email_sequence_number={email_sequence_number}&email_status={email_status}'))
-                return r.json()
+                return self._transport.request('GET', '/campaigns/{campaign_id}/statistics', query={
+                    'offset': offset,
+                    'limit': limit,
+                    'email_sequence_number': email_sequence_number,
+                    'email_status': email_status
+                }, campaign_id=campaign_id)
+
+            def iter_statistics(self, campaign_id: int, page_size: int = 100, offset: int = 0,
+                                email_sequence_number: Union[int, None] = None,
+                                email_status: Union[Literal['opened', 'clicked', 'replied', 'unsubscribed', 'bounced'], None] = None,
+                                prefetch: bool = True) -> Paginator:
+                """
+                This iterates over all the statistics of a campaign, fetching them lazily page by page
+                with get_statistics
+
+                ### Args:
+                    * campaign_id (int): The id of the campaign you want to fetch statistics for
+                    * page_size (int): The number of statistics to fetch per request. Defaults to 100.
+                    * offset (int): The offset to start from. Pass the offset of an interrupted iterator to resume it.
+                      Defaults to 0.
+                    * email_sequence_number (int, optional): The email sequence number of the statistics you want to
+                      fetch. Defaults to None.
+                    * email_status (str, optional): The email status of the statistics you want to fetch.
+                      Defaults to None.
+                    * prefetch (bool): Whether to fetch the next page in the background while the current one is
+                      consumed. Defaults to True.
+                """
+                return Paginator(lambda offset, limit: self.get_statistics(campaign_id, offset, limit,
+                                                                           email_sequence_number, email_status),
+                                 page_size=page_size, offset=offset, prefetch=prefetch, total_key='total_stats')
 
             def get_statistics_date_range(self, campaign_id: int, start_date: str, end_date: str):
                 """
@@ -231,9 +3535,67 @@ class Smartlead:
                     * start_date (str): The start date of the date range you want to fetch statistics for. For example, if you want to fetch statistics from 2021-01-01 to 2021-01-31, set start_date to '2021-01-01'.
                     * end_date (str): The end date of the date range you want to fetch statistics for. For example, if you want to fetch statistics from 2021-01-01 to 2021-01-31, set end_date to '2021-01-31'.
                 """
-                r = requests.get(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/analytics-by-date', f'&start_date={start_date}&end_date={end_date}'))
-                return r.json()
+                return self._transport.request('GET', '/campaigns/{campaign_id}/analytics-by-date',
+                                               query={'start_date': start_date, 'end_date': end_date}, campaign_id=campaign_id)
+
+            def get_statistics_columns(self, campaign_id: int, email_sequence_number: Union[int, None] = None,
+                                       email_status: Union[Literal['opened', 'clicked', 'replied', 'unsubscribed', 'bounced'], None] = None,
+                                       page_size: int = 100, max_concurrency: int = 4) -> StatisticsColumns:
+                """
+                This fetches all the statistics of a campaign into a StatisticsColumns, for vectorized aggregations by
+                sequence number, email status and date. Once the first page tells the total, the other pages are fetched
+                concurrently.
+
+                ### Args:
+                    * campaign_id (int): The id of the campaign you want to fetch statistics for
+                    * email_sequence_number (int, optional): The email sequence number of the statistics you want to
+                      fetch. Defaults to None.
+                    * email_status (str, optional): The email status of the statistics you want to fetch.
+                      Defaults to None.
+                    * page_size (int): The number of statistics to fetch per request. Defaults to 100.
+                    * max_concurrency (int): The maximum number of pages fetched at once. Defaults to 4.
+                """
+                def fetch(offset):
+                    return self.get_statistics(campaign_id, offset, page_size, email_sequence_number, email_status)
+                if self._is_async:
+                    return self._get_statistics_columns_async(fetch, page_size, max_concurrency)
+                columns = StatisticsColumns()
+                first = _statistics_page(fetch(0))
+                columns._append(first.get('data') or [])
+                if 'total_stats' in first:
+                    offsets = _remaining_offsets(first, 'total_stats', page_size)
+                    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                        for page in executor.map(fetch, offsets):
+                            columns._append(_statistics_page(page).get('data') or [])
+                else:
+                    rows, offset = first.get('data') or [], 0
+                    while len(rows) == page_size:
+                        offset += page_size
+                        rows = _statistics_page(fetch(offset)).get('data') or []
+                        columns._append(rows)
+                return columns._finish()
+
+            async def _get_statistics_columns_async(self, fetch: Callable, page_size: int,
+                                                    max_concurrency: int) -> StatisticsColumns:
+                columns = StatisticsColumns()
+                first = _statistics_page(await fetch(0))
+                columns._append(first.get('data') or [])
+                if 'total_stats' in first:
+                    semaphore = asyncio.Semaphore(max_concurrency)
+
+                    async def fetch_page(offset):
+                        async with semaphore:
+                            return await fetch(offset)
+                    offsets = _remaining_offsets(first, 'total_stats', page_size)
+                    for page in await asyncio.gather(*[fetch_page(offset) for offset in offsets]):
+                        columns._append(_statistics_page(page).get('data') or [])
+                else:
+                    rows, offset = first.get('data') or [], 0
+                    while len(rows) == page_size:
+                        offset += page_size
+                        rows = _statistics_page(await fetch(offset)).get('data') or []
+                        columns._append(rows)
+                return columns._finish()
 
             def get_top_level_analytics(self, campaign_id: int):
                 """
@@ -242,9 +3604,92 @@ class Smartlead:
                 ### Args:
                     * campaign_id (int): The id of the campaign you want to fetch top level analytics for
                 """
-                r = requests.get(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/analytics'))
-                return r.json()
+                return self._transport.request('GET', '/campaigns/{campaign_id}/analytics', campaign_id=campaign_id)
+
+            def fetch_analytics(self, campaign_ids: Union[Iterable[int], Literal['all']] = 'all',
+                                start_date: Union[str, None] = None, end_date: Union[str, None] = None,
+                                include: Iterable[Literal['top_level_analytics', 'statistics_by_date', 'email_accounts']] = (
+                                    'top_level_analytics', 'statistics_by_date', 'email_accounts'),
+                                max_concurrency: int = 8) -> CampaignAnalyticsReport:
+                """
+                This fetches the analytics of many campaigns concurrently and merges them into one
+                CampaignAnalyticsReport keyed by campaign id. A failed request is reported in the report's errors and
+                does not stop the others. With 'all', a failure to list the campaigns raises RuntimeError.
+
+                ### Args:
+                    * campaign_ids (Iterable[int] | 'all'): The ids of the campaigns you want analytics for. 'all'
+                      fetches every campaign of your account. Defaults to 'all'.
+                    * start_date (str, optional): The start date of get_statistics_date_range, e.g. '2021-01-01'.
+                      statistics_by_date is only fetched when both dates are set. Defaults to None.
+                    * end_date (str, optional): The end date of get_statistics_date_range, e.g. '2021-01-31'.
+                      Defaults to None.
+                    * include (Iterable[str]): The resources to fetch for each campaign: 'top_level_analytics'
+                      (get_top_level_analytics), 'statistics_by_date' (get_statistics_date_range) and 'email_accounts'
+                      (get_all_email_accounts). Defaults to all three.
+                    * max_concurrency (int): The maximum number of requests in flight. Defaults to 8.
+                """
+                if self._is_async:
+                    return self._fetch_analytics_async(campaign_ids, start_date, end_date, include, max_concurrency)
+                started = time.perf_counter()
+                if campaign_ids == 'all':
+                    campaign_ids = self._campaign_ids(self.all())
+                report = CampaignAnalyticsReport()
+
+                def fetch(call):
+                    campaign_id, resource, fn = call
+                    try:
+                        response = fn()
+                    except Exception as e:
+                        return campaign_id, resource, None, repr(e)
+                    return campaign_id, resource, response, _response_error(response)
+
+                with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                    for result in executor.map(fetch, self._analytics_calls(campaign_ids, start_date, end_date, include)):
+                        report._add(*result)
+                report.elapsed = time.perf_counter() - started
+                return report
+
+            @staticmethod
+            def _campaign_ids(campaigns) -> List[int]:
+                error = _response_error(campaigns)
+                if error is not None or not isinstance(campaigns, list):
+                    raise RuntimeError(f'Could not list campaigns: {error or campaigns!r}')
+                return [campaign['id'] for campaign in campaigns]
+
+            async def _fetch_analytics_async(self, campaign_ids, start_date, end_date, include, max_concurrency):
+                started = time.perf_counter()
+                if campaign_ids == 'all':
+                    campaign_ids = self._campaign_ids(await self.all())
+                report = CampaignAnalyticsReport()
+                semaphore = asyncio.Semaphore(max_concurrency)
+
+                async def fetch(call):
+                    campaign_id, resource, fn = call
+                    async with semaphore:
+                        try:
+                            response = await fn()
+                        except Exception as e:
+                            return campaign_id, resource, None, repr(e)
+                    return campaign_id, resource, response, _response_error(response)
+
+                calls = self._analytics_calls(campaign_ids, start_date, end_date, include)
+                for result in await asyncio.gather(*[fetch(call) for call in calls]):
+                    report._add(*result)
+                report.elapsed = time.perf_counter() - started
+                return report
+
+            def _analytics_calls(self, campaign_ids, start_date, end_date, include):
+                include = set(include)
+                for campaign_id in campaign_ids:
+                    if 'top_level_analytics' in include:
+                        yield (campaign_id, 'top_level_analytics',
+                               lambda campaign_id=campaign_id: self.get_top_level_analytics(campaign_id))
+                    if 'statistics_by_date' in include and start_date and end_date:
+                        yield (campaign_id, 'statistics_by_date',
+                               lambda campaign_id=campaign_id: self.get_statistics_date_range(campaign_id, start_date, end_date))
+                    if 'email_accounts' in include:
+                        yield (campaign_id, 'email_accounts',
+                               lambda campaign_id=campaign_id: self.get_all_email_accounts(campaign_id))
 
             def add_leads_to_campaign(self, campaign_id: int, lead_list: List[Dict]):
                 """
@@ -255,10 +3700,29 @@ class Smartlead:
                     * lead_list (List[Dict]): The leads you want to add (max 100 leads per request)
                 """
 
-                r = requests.post(Smartlead._V1.endpoint(f'/campaigns/{campaign_id}/leads'), json={
+                return self._transport.request('POST', '/campaigns/{campaign_id}/leads', json={
                     'lead_list': lead_list
-                })
-                return r.json()
+                }, campaign_id=campaign_id)
+
+            def add_leads_in_bulk(self, campaign_id: int, leads: Iterable[Dict], chunk_size: int = 100,
+                                  max_concurrency: int = 4, retries: int = 2, backoff: float = 1.0) -> BulkUploadReport:
+                """
+                This adds any number of leads to a campaign by splitting them into add_leads_to_campaign requests of at
+                most 100 leads, sent concurrently
+
+                ### Args:
+                    * campaign_id (int): The id of the campaign you want to add leads to
+                    * leads (Iterable[Dict]): The leads you want to add. Any iterable works, including generators over
+                      large files.
+                    * chunk_size (int): The number of leads per request, at most 100. Defaults to 100.
+                    * max_concurrency (int): The maximum number of requests in flight. Defaults to 4.
+                    * retries (int): How many times a failed chunk is retried, see BulkLeadUploader. Defaults to 2.
+                    * backoff (float): The delay in seconds before the first retry, doubled after every attempt.
+                      Defaults to 1.0.
+                """
+                uploader = BulkLeadUploader(lambda chunk: self.add_leads_to_campaign(campaign_id, chunk), chunk_size=chunk_size,
+                                            max_concurrency=max_concurrency, retries=retries, backoff=backoff)
+                return uploader.arun(leads) if self._is_async else uploader.run(leads)
 
             def delete_lead_from_campaign(self, campaign_id: int, lead_id: int):
                 """
@@ -269,9 +3733,8 @@ class Smartlead:
                     * lead_id (int): The id of the lead you want to delete
                 """
 
-                r = requests.delete(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/leads/{lead_id}'))
-                return r.json()
+                return self._transport.request('DELETE', '/campaigns/{campaign_id}/leads/{lead_id}',
+                                               campaign_id=campaign_id, lead_id=lead_id)
 
             def unsubscribe_lead_from_campaign(self, campaign_id: int, lead_id: int):
                 """
@@ -282,9 +3745,8 @@ class Smartlead:
                     * lead_id (int): The id of the lead you want to unsubscribe
                 """
 
-                r = requests.post(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/leads/{lead_id}/unsubscribe'))
-                return r.json()
+                return self._transport.request('POST', '/campaigns/{campaign_id}/leads/{lead_id}/unsubscribe',
+                                               campaign_id=campaign_id, lead_id=lead_id)
 
             def update_lead_category(self, campaign_id: int, lead_id: int, category_id: int):
                 """
@@ -296,11 +3758,9 @@ class Smartlead:
                     * category_id (int): The id of the category you want to update the lead to
                 """
 
-                r = requests.post(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/leads/{lead_id}/category'), json={
+                return self._transport.request('POST', '/campaigns/{campaign_id}/leads/{lead_id}/category', json={
                         'category_id': category_id
-                })
-                return r.json()
+                }, campaign_id=campaign_id, lead_id=lead_id)
 
             def update_status(self, campaign_id: int, status: Literal['PAUSED', 'STOPPED', 'START']):
                 """
@@ -311,11 +3771,9 @@ class Smartlead:
                     * status (Literal['PAUSED', 'STOPPED', 'START']): The status you want to update the campaign to
                 """
 
-                r = requests.post(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/status'), json={
+                return self._transport.request('POST', '/campaigns/{campaign_id}/status', json={
                         'status': status
-                })
-                return r.json()
+                }, campaign_id=campaign_id)
 
             def get_webhooks(self, campaign_id: int):
                 """
@@ -325,9 +3783,7 @@ class Smartlead:
                     * campaign_id (int): The id of the campaign you want to fetch webhooks for
                 """
 
-                r = requests.get(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/webhooks'))
-                return r.json()
+                return self._transport.request('GET', '/campaigns/{campaign_id}/webhooks', campaign_id=campaign_id)
 
             def update_webhook(self, campaign_id: int, webhook_id: int, name: str, webhook_url: str, event_types: List[Literal['EMAIL_SENT', 'EMAIL_OPEN', 'EMAIL_LINK_CLICK', 'EMAIL_REPLY', 'LEAD_UNSUBSCRIBED', 'LEAD_CATEGORY_UPDATED']], categories: List[Literal['Interested', 'Meeting Request', 'Not Interested', 'Do Not Contact', 'Information Request', 'Out Of Office', 'Wrong Person']]):
                 """
@@ -342,15 +3798,13 @@ class Smartlead:
                     * categories (List[Literal[]]): The categories you want to subscribe to
                 """
 
-                r = requests.post(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/webhooks'), json={
+                return self._transport.request('POST', '/campaigns/{campaign_id}/webhooks', json={
                         'id': webhook_id,
                         'name': name,
                         'webhook_url': webhook_url,
                         'event_types': event_types,
                         'categories': categories
-                })
-                return r.json()
+                }, campaign_id=campaign_id)
 
             def delete_webhook(self, campaign_id: int, webhook_id: int):
                 """
@@ -361,13 +3815,11 @@ class Smartlead:
                     * webhook_id (int): The id of the webhook you want to delete
                 """
 
-                r = requests.delete(Smartlead._V1.endpoint(
-                    f'/campaigns/{campaign_id}/webhooks'), json={
+                return self._transport.request('DELETE', '/campaigns/{campaign_id}/webhooks', json={
                         'id': webhook_id
-                })
-                return r.json()
+                }, campaign_id=campaign_id)
 
-        class _LeadsV1():
+        class _LeadsV1(_ResourceV1):
             def get_campaigns(self, lead_id: int):
                 """
                 This endpoint fetches all the campaigns a lead is in
@@ -375,17 +3827,13 @@ class Smartlead:
                 ### Args:
                     * lead_id (int): The id of the lead you want to fetch campaigns for
                 """
-                r = requests.get(Smartlead._V1.endpoint(
-                    f'/leads/{lead_id}/campaigns'))
-                return r.json()
+                return self._transport.request('GET', '/leads/{lead_id}/campaigns', lead_id=lead_id)
 
             def get_categories(self):
                 """
                 This endpoint fetches all the categories in your account
                 """
-                r = requests.get(Smartlead._V1.endpoint(
-                    f'/leads/fetch-categories'))
-                return r.json()
+                return self._transport.request('GET', '/leads/fetch-categories')
 
             def get_by_email_address(self, email_address: str):
                 """
@@ -394,9 +3842,7 @@ class Smartlead:
                 ### Args:
                     * email_address (str): The email address of the lead you want to fetch
                 """
-                r = requests.get(Smartlead._V1.endpoint(
-                    f'/leads', f'&email={email_address}'))
-                return r.json()
+                return self._transport.request('GET', '/leads', query={'email': email_address})
 
             def unsubscribe_from_all_campaigns(self, lead_id: int):
                 """
@@ -405,9 +3851,7 @@ class Smartlead:
                 ### Args:
                     * lead_id (int): The id of the lead you want to unsubscribe from all campaigns
                 """
-                r = requests.post(Smartlead._V1.endpoint(
-                    f'/leads/{lead_id}/unsubscribe'))
-                return r.json()
+                return self._transport.request('POST', '/leads/{lead_id}/unsubscribe', lead_id=lead_id)
 
             def add_to_block_list(self, domain_block_list: List[str], client_id: Union[int, None]):
                 """
@@ -417,12 +3861,10 @@ class Smartlead:
                     * domain_block_list (List[str]): The domains you want to add to the block list
                     * client_id (int, optional): The id of the client you want to add the domains to the block list for. Defaults to None.
                 """
-                r = requests.post(Smartlead._V1.endpoint(
-                    f'/leads/add-domain-block-list'), json={
+                return self._transport.request('POST', '/leads/add-domain-block-list', json={
                         'domain_block_list': domain_block_list,
                         'client_id': client_id
                 })
-                return r.json()
 
             def update(self, lead_id: int, lead_input: Dict):
                 """
@@ -432,17 +3874,31 @@ class Smartlead:
                     * lead_id (int): The id of the lead you want to update
                     * lead_input (Dict): The updated lead information
                 """
-                r = requests.post(Smartlead._V1.endpoint(
-                    f'/leads/{lead_id}'), json=lead_input)
-                return r.json()
+                return self._transport.request('POST', '/leads/{lead_id}', json=lead_input, lead_id=lead_id)
+
+        class _EmailAccountsV1(_ResourceV1):
+            # The fields reconcile compares, per method that sets them, and where all() reports their current value.
+            reconcile_fields = {
+                'update': {
+                    'max_email_per_day': _field('max_email_per_day'),
+                    'custom_tracking_url': _field('custom_tracking_domain'),
+                    'bcc': _field('bcc_email'),
+                    'signature': _field('signature'),
+                    'client_id': _field('client_id'),
+                },
+                'set_warmup_settings': {
+                    'warmup_enabled': _field('warmup_details', 'status', convert=lambda status: status == 'ACTIVE'),
+                    'total_warmup_per_day': _field('warmup_details', 'total_warmup_per_day'),
+                    'daily_rampup': _field('warmup_details', 'daily_rampup'),
+                    'reply_rate_percentage': _field('warmup_details', 'reply_rate'),
+                },
+            }
 
-        class _EmailAccountsV1():
             def all(self):
                 """
                 This endpoint fetches all the email accounts in your account
                 """
-                r = requests.get(Smartlead._V1.endpoint(f'/email-accounts'))
-                return r.json()
+                return self._transport.request('GET', '/email-accounts')
 
             def create(self, from_name: str, from_email: str, user_name: str, password: str, smtp_host: str, smtp_port: int, imap_host: str, imap_port: int, max_email_per_day: int, custom_tracking_url: str, bcc: str, signature: str, warmup_enabled: bool, total_warmup_per_day: Union[int, None], daily_rampup: Union[int, None], reply_rate_percentage: Union[int, None], client_id: Union[int, None]):
                 """
@@ -467,7 +3923,7 @@ class Smartlead:
                     * reply_rate_percentage (int | None): The percentage of replies you want to send during warmup
                     * client_id (int | None): The id of the client you want to associate with the email account. If None, the email account will have no client set.
                 """
-                r = requests.post(Smartlead._V1.endpoint(f'/email-accounts'), json={
+                return self._transport.request('POST', '/email-accounts', json={
                     'id': None,
                     'from_name': from_name,
                     'from_email': from_email,
@@ -487,7 +3943,6 @@ class Smartlead:
                     'reply_rate_percentage': reply_rate_percentage,
                     'client_id': client_id
                 })
-                return r.json()
 
             def update(self, email_account_id: int, max_email_per_day: int, custom_tracking_url: str, bcc: str, signature: str, client_id: Union[int, None]):
                 """
@@ -501,14 +3956,13 @@ class Smartlead:
                     * signature (str): The signature you want to use
                     * client_id (int | None): The id of the client you want to associate with the email account. If None, the email account will have no client set.
                 """
-                r = requests.post(Smartlead._V1.endpoint(f'/email-accounts/{email_account_id}'), json={
+                return self._transport.request('POST', '/email-accounts/{email_account_id}', json={
                     'max_email_per_day': max_email_per_day,
                     'custom_tracking_url': custom_tracking_url,
                     'bcc': bcc,
                     'signature': signature,
                     'client_id': client_id
-                })
-                return r.json()
+                }, email_account_id=email_account_id)
 
             def set_warmup_settings(self, email_account_id: int, warmup_enabled: bool, total_warmup_per_day: int, daily_rampup: int, reply_rate_percentage: int):
                 """
@@ -521,22 +3975,83 @@ class Smartlead:
                     * daily_rampup (int): The number of emails you want to increase per day during warmup
                     * reply_rate_percentage (int): The percentage of replies you want to send during warmup
                 """
-                r = requests.post(Smartlead._V1.endpoint(f'/email-accounts/{email_account_id}/warmup'), json={
+                return self._transport.request('POST', '/email-accounts/{email_account_id}/warmup', json={
                     'warmup_enabled': str(warmup_enabled).lower(),
                     'total_warmup_per_day': total_warmup_per_day,
                     'daily_rampup': daily_rampup,
                     'reply_rate_percentage': reply_rate_percentage
-                })
-                return r.json()
+                }, email_account_id=email_account_id)
             
+            def reconcile(self, desired: Iterable[Dict], dry_run: bool = False,
+                          max_concurrency: int = 8) -> ReconcilePlan:
+                """
+                This brings email accounts to a desired configuration, sending only what changed. The current state is
+                fetched once with all(), and an update or set_warmup_settings request is only sent for the accounts
+                whose fields differ, concurrently. Fields left out of a desired entry are kept as they are. A field
+                whose current value the API does not report counts as changed, and as each request sets all of its
+                fields, a change is only planned when the entry gives every such field of its request (e.g.
+                total_warmup_per_day and daily_rampup for set_warmup_settings); otherwise it is listed in the plan's
+                incomplete.
+
+                ### Args:
+                    * desired (Iterable[Dict]): The desired accounts, each identified by 'id' or 'from_email', with any
+                      of the fields of update and set_warmup_settings, e.g. {'from_email': 'a@example.com',
+                      'max_email_per_day': 40, 'warmup_enabled': True}
+                    * dry_run (bool): Whether to only return the plan without sending anything. Defaults to False.
+                    * max_concurrency (int): The maximum number of requests in flight. Defaults to 8.
+                """
+                if self._is_async:
+                    return self._reconcile_async(desired, dry_run, max_concurrency)
+                plan = self._plan(self.all(), desired)
+                return plan if dry_run else plan._apply(max_concurrency)
+
+            async def _reconcile_async(self, desired: Iterable[Dict], dry_run: bool,
+                                       max_concurrency: int) -> ReconcilePlan:
+                plan = self._plan(await self.all(), desired)
+                return plan if dry_run else await plan._aapply(max_concurrency)
+
+            def _plan(self, current, desired: Iterable[Dict]) -> ReconcilePlan:
+                error = _response_error(current)
+                if error is not None:
+                    raise RuntimeError(f'Could not list email accounts: {error}')
+                accounts = [_plain_record(account) for account in current or []]
+                by_id = {account.get('id'): account for account in accounts}
+                by_email = {str(account.get('from_email')).lower(): account for account in accounts}
+                plan = ReconcilePlan()
+                for entry in desired:
+                    account = by_id.get(entry['id']) if 'id' in entry else by_email.get(str(entry.get('from_email')).lower())
+                    if account is None:
+                        plan.missing.append(entry)
+                        continue
+                    changed = False
+                    for action, fields in self.reconcile_fields.items():
+                        values = {name: get(account) for name, get in fields.items()}
+                        diff = {name: (values[name], entry[name]) for name in fields
+                                if name in entry and not _same(values[name], entry[name])}
+                        if not diff:
+                            continue
+                        label = account.get('from_email') or str(account['id'])
+                        unknown = [name for name in fields if name not in entry and values[name] is _UNKNOWN]
+                        changed = True
+                        if unknown:
+                            # Sending a placeholder would overwrite the value on the server.
+                            plan.incomplete.append({'action': action, 'target': account['id'], 'label': label, 'fields': unknown})
+                            continue
+                        arguments = {name: entry[name] if name in entry else values[name] for name in fields}
+                        plan._add(action, account['id'], label, diff,
+                                  lambda send=getattr(self, action), account_id=account['id'], arguments=arguments:
+                                  send(account_id, **arguments))
+                    if not changed:
+                        plan.unchanged += 1
+                return plan
+
             def reconnect_failed_email_accounts(self):
                 """
                 This endpoint reconnects failed email accounts. Rate limited to 3 times in a 24 hour period
                 """
-                r = requests.post(Smartlead._V1.endpoint(f'/email-accounts/reconnect-failed-email-accounts'))
-                return r.json()
+                return self._transport.request('POST', '/email-accounts/reconnect-failed-email-accounts')
         
-        class _ClientsV1():
+        class _ClientsV1(_ResourceV1):
             def create(self, name: str, email: str, permission: List[Literal['reply_master_inbox', 'full_access']], logo: str, logo_url: str, password: str):
                 """
                 This endpoint creates a client
@@ -549,7 +4064,7 @@ class Smartlead:
                     * logo_url (str): The logo url of the client
                     * password (str): The password of the client
                 """
-                r = requests.post(Smartlead._V1.endpoint(f'/client/save'), json={
+                return self._transport.request('POST', '/client/save', json={
                     'name': name,
                     'email': email,
                     'permission': permission,
@@ -557,18 +4072,458 @@ class Smartlead:
                     'logo_url': logo_url,
                     'password': password
                 })
-                return r.json()
             
             def all(self):
                 """
                 This endpoint returns all clients
                 """
-                r = requests.get(Smartlead._V1.endpoint(f'/client'))
-                return r.json()
+                return self._transport.request('GET', '/client')
+
+
+class AsyncSmartlead:
+    """
+    Asyncio implementation of Smartlead API with the same namespaces and method signatures as Smartlead.
+    Every method returns a coroutine, e.g. await client.v1.campaigns.get(campaign_id).
+
+    Requests go through one pooled AsyncTransport. Use the client as an async context manager, or await
+    close(), to release its connections. Like Smartlead, each client has its own API key and base url.
+
+    ### Args:
+        * api_key (str | None): The API key of this client. None falls back to the class-wide Smartlead.api_key.
+          Defaults to None.
+        * base_url (str | None): The base url of the API. Defaults to None, the Smartlead API.
+        * limit (int): The maximum number of open connections across all hosts. Defaults to 100.
+        * limit_per_host (int): The maximum number of open connections per host. 0 means no per-host limit.
+          Defaults to 0.
+        * max_concurrency (int | None): The maximum number of requests in flight at once. None means no limit.
+          Defaults to None.
+        * timeout (float | Tuple[float, float] | None): The connect and read timeout in seconds. Defaults to (10, 60).
+        * rate_limiter (RateLimiter | None): The token bucket shared by every request of the client. Defaults to None.
+        * max_retries (int): How many times a 429 or 5xx response is retried. Defaults to 3.
+        * cache (ResponseCache | None): The opt-in cache of read-mostly GET responses. Defaults to None.
+        * typed (bool): Whether campaigns, leads, statistics rows and email accounts are returned as Record objects
+          instead of dicts. Defaults to False.
+        * coalescer (RequestCoalescer | None): Makes identical GETs issued concurrently share one in-flight request.
+          Defaults to None.
+        * timeouts (Dict[str, float | Tuple[float, float]], optional): The timeout of each endpoint template that
+          overrides timeout. Defaults to None.
+        * hedging (HedgePolicy | None): Sends a second GET when the first is slower than usual. Defaults to None.
+        * circuit_breaker (CircuitBreaker | None): Fails fast on endpoints whose error rate spiked. Defaults to None.
+        * compress_requests (int | None): The minimum size in bytes of a JSON body sent gzip-compressed, e.g. 16384 for
+          large add_leads_to_campaign calls. None never compresses. Defaults to None.
+        * compress_responses (bool): Whether gzip-compressed responses are requested. Defaults to True.
+        * transport (AsyncTransport, optional): An existing transport to use instead of creating one. The other
+          arguments are ignored when it is set. Defaults to None.
+    """
+
+    def __init__(self, api_key: Union[str, None] = None, base_url: Union[str, None] = None, limit: int = 100,
+                 limit_per_host: int = 0, max_concurrency: Union[int, None] = None,
+                 timeout: Union[float, Tuple[float, float], None] = (10, 60),
+                 rate_limiter: Union[RateLimiter, None] = None, max_retries: int = 3,
+                 cache: Union[ResponseCache, None] = None, typed: bool = False,
+                 coalescer: Union[RequestCoalescer, None] = None,
+                 timeouts: Union[Dict[str, Union[float, Tuple[float, float]]], None] = None,
+                 hedging: Union[HedgePolicy, None] = None, circuit_breaker: Union[CircuitBreaker, None] = None,
+                 compress_requests: Union[int, None] = None, compress_responses: bool = True,
+                 transport: Union[AsyncTransport, None] = None):
+        self.transport = transport or AsyncTransport(limit=limit, limit_per_host=limit_per_host,
+                                                     max_concurrency=max_concurrency, timeout=timeout,
+                                                     rate_limiter=rate_limiter, max_retries=max_retries,
+                                                     cache=cache, api_key=api_key, base_url=base_url, typed=typed,
+                                                     coalescer=coalescer, timeouts=timeouts, hedging=hedging,
+                                                     circuit_breaker=circuit_breaker, compress_requests=compress_requests,
+                                                     compress_responses=compress_responses)
+        self.v1 = Smartlead._V1(self.transport)
+
+    def add_hook(self, name: Literal['before_request', 'after_response', 'on_error'],
+                 callback: Callable[[RequestEvent], None]):
+        """
+        Registers a callback called with the RequestEvent of every request this client sends. See Transport.add_hook.
+        """
+        self.transport.add_hook(name, callback)
+
+    def remove_hook(self, name: str, callback: Callable[[RequestEvent], None]):
+        """
+        Unregisters a callback added with add_hook
+        """
+        self.transport.remove_hook(name, callback)
+
+    async def close(self):
+        """
+        Closes the connections held by this client's transport
+        """
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class TenantRunReport:
+    """
+    Result of run_for_tenants. results maps every tenant whose operation succeeded to its return value, and
+    errors maps every tenant whose operation raised to the exception.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return f"TenantRunReport(succeeded={len(self.results)}, failed={len(self.errors)}, elapsed={self.elapsed:.2f})"
+
+
+def run_for_tenants(clients: Mapping, operation: Callable, max_concurrency: int = 8) -> TenantRunReport:
+    """
+    Runs one operation concurrently across many tenant clients, e.g.
+
+        run_for_tenants({'acme': Smartlead('key-1'), 'globex': Smartlead('key-2')},
+                        lambda client: client.v1.campaigns.all())
+
+    With AsyncSmartlead clients, operation must return a coroutine and run_for_tenants returns a coroutine too.
+
+    ### Args:
+        * clients (Mapping[Hashable, Smartlead | AsyncSmartlead]): The clients keyed by tenant
+        * operation (Callable[[Smartlead], Any]): The operation to run with every client
+        * max_concurrency (int): The maximum number of tenants processed at once. Defaults to 8.
+    """
+    if any(isinstance(client, AsyncSmartlead) for client in clients.values()):
+        return _arun_for_tenants(clients, operation, max_concurrency)
+    report = TenantRunReport()
+    started = time.perf_counter()
+
+    def run(tenant):
+        try:
+            return tenant, operation(clients[tenant]), None
+        except Exception as e:
+            return tenant, None, e
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for tenant, result, error in executor.map(run, list(clients)):
+            if error is None:
+                report.results[tenant] = result
+            else:
+                report.errors[tenant] = error
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+async def _arun_for_tenants(clients: Mapping, operation: Callable, max_concurrency: int) -> TenantRunReport:
+    report = TenantRunReport()
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(tenant):
+        async with semaphore:
+            try:
+                report.results[tenant] = await operation(clients[tenant])
+            except Exception as e:
+                report.errors[tenant] = e
+
+    await asyncio.gather(*[run(tenant) for tenant in clients])
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+class SyncReport:
+    """
+    Result of SQLiteMirror.sync. upserted, deleted and unchanged count the records of each table, e.g.
+    report.upserted['leads']. Records skipped because they are below the high-water mark count as unchanged.
+    errors maps the ids of campaigns that could not be synced to the error; their high-water marks are
+    left as they were, so the next sync retries them.
+    """
+
+    tables = ('campaigns', 'sequences', 'leads', 'statistics')
+
+    def __init__(self):
+        self.upserted = dict.fromkeys(self.tables, 0)
+        self.deleted = dict.fromkeys(self.tables, 0)
+        self.unchanged = dict.fromkeys(self.tables, 0)
+        self.errors = {}
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return (f"SyncReport(upserted={sum(self.upserted.values())}, deleted={sum(self.deleted.values())}, "
+                f"unchanged={sum(self.unchanged.values())}, failed={len(self.errors)}, elapsed={self.elapsed:.2f})")
+
+
+class SQLiteMirror:
+    """
+    Local SQLite mirror of the campaigns, sequences, leads and per-lead statistics of an account. sync()
+    brings it up to date and reporting queries then run locally with query().
+
+    The first sync pulls everything. Later syncs only fetch what changed:
+        * campaigns are listed once and their sequences are only fetched again when the campaign changed
+        * leads and statistics are fetched from the offset where the last sync stopped, rewound to the oldest
+          record created (leads) or sent (statistics) within lookback before the newest one mirrored (its
+          high-water mark), so recent status changes, opens and replies are picked up even when the mirror
+          was not synced for longer than lookback
+        * when the API reports fewer records than were mirrored, records were deleted and the offsets shifted,
+          so that campaign's records are fetched again in full and the missing ones deleted
+    An incremental sync misses changes to records older than that lookback window, and deletions made up for
+    by as many new records, which leave the total unchanged. Pass full=True to refetch everything, or set
+    full_every to do so periodically.
+
+    Every table keeps the full JSON of each record in its data column, next to indexed columns for the
+    common queries (lead email and status, statistics sequence number, status and sent time).
+
+    ### Args:
+        * client (Smartlead): The client to sync through
+        * path (str): The path of the database file
+        * page_size (int): The number of records to request per page. Defaults to 100.
+        * lookback (float): How far back in seconds recent leads and statistics are fetched again on every sync.
+          Defaults to 7 days.
+        * max_concurrency (int): The number of campaigns synced at once. Defaults to 4.
+        * full_every (float | None): How often in seconds the leads and statistics of a campaign are fetched again in
+          full. None only does it when needed. Defaults to None.
+    """
+
+    _columns = {
+        'campaigns': ('id', 'name', 'status', 'client_id', 'created_at', 'updated_at'),
+        'sequences': ('campaign_id', 'seq_number', 'id', 'subject'),
+        'leads': ('campaign_id', 'campaign_lead_map_id', 'lead_id', 'email', 'status', 'lead_category_id', 'created_at', 'position'),
+        'statistics': ('campaign_id', 'lead_email', 'sequence_number', 'email_status', 'sent_time', 'open_time', 'click_time',
+                       'reply_time', 'is_unsubscribed', 'is_bounced', 'position'),
+    }
+    _keys = {
+        'campaigns': ('id',),
+        'sequences': ('campaign_id', 'seq_number'),
+        'leads': ('campaign_id', 'campaign_lead_map_id'),
+        'statistics': ('campaign_id', 'lead_email', 'sequence_number'),
+    }
+    _indexes = (
+        'CREATE INDEX IF NOT EXISTS leads_email ON leads (email)',
+        'CREATE INDEX IF NOT EXISTS leads_status ON leads (campaign_id, status)',
+        'CREATE INDEX IF NOT EXISTS leads_position ON leads (campaign_id, position)',
+        'CREATE INDEX IF NOT EXISTS statistics_sequence ON statistics (campaign_id, sequence_number)',
+        'CREATE INDEX IF NOT EXISTS statistics_status ON statistics (campaign_id, email_status)',
+        'CREATE INDEX IF NOT EXISTS statistics_sent ON statistics (campaign_id, sent_time)',
+        'CREATE INDEX IF NOT EXISTS statistics_position ON statistics (campaign_id, position)',
+    )
+
+    def __init__(self, client: Smartlead, path: str, page_size: int = 100, lookback: float = 7 * 86400,
+                 max_concurrency: int = 4, full_every: Union[float, None] = None):
+        if isinstance(client, AsyncSmartlead):
+            raise TypeError('SQLiteMirror syncs through a Smartlead client, not an AsyncSmartlead one')
+        self.client = client
+        self.page_size = page_size
+        self.lookback = lookback
+        self.max_concurrency = max_concurrency
+        self.full_every = full_every
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        for table, columns in self._columns.items():
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)}, synced INTEGER, data TEXT, "
+                             f"PRIMARY KEY ({', '.join(self._keys[table])}))")
+        self._db.execute('CREATE TABLE IF NOT EXISTS sync_state (campaign_id, resource, next_offset INTEGER, high_water TEXT, '
+                         'synced_at REAL, full_synced_at REAL, PRIMARY KEY (campaign_id, resource))')
+        try:
+            self._db.execute('ALTER TABLE sync_state ADD COLUMN full_synced_at REAL')
+        except sqlite3.OperationalError:
+            pass  # The mirror was created with the column
+        for index in self._indexes:
+            self._db.execute(index)
+        self._db.commit()
+
+    def query(self, sql: str, params: Union[Iterable, Mapping] = ()) -> List[Dict]:
+        """
+        Runs a SQL query against the mirror and returns its rows as dicts, e.g.
+
+            mirror.query('SELECT email_status, COUNT(*) AS n FROM statistics '
+                         'WHERE campaign_id = ? GROUP BY email_status', (campaign_id,))
+
+        ### Args:
+            * sql (str): The query
+            * params (Iterable | Mapping): The parameters of the query. Defaults to ().
+        """
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def sync(self, campaign_ids: Union[List[int], None] = None, full: bool = False) -> SyncReport:
+        """
+        Brings the mirror up to date and returns a SyncReport
+
+        ### Args:
+            * campaign_ids (List[int], optional): The campaigns to sync. None syncs every campaign and deletes the ones
+              that no longer exist. Defaults to None.
+            * full (bool): Whether to refetch every record instead of only what changed. Defaults to False.
+        """
+        report = SyncReport()
+        started = time.perf_counter()
+        synced = time.time_ns()
+        campaigns = self.client.v1.campaigns.all()
+        error = _response_error(campaigns)
+        if error is not None:
+            raise RuntimeError(f'Could not list campaigns: {error}')
+        campaigns = [_plain_record(campaign) for campaign in campaigns]
+        if campaign_ids is not None:
+            wanted = set(campaign_ids)
+            campaigns = [campaign for campaign in campaigns if campaign['id'] in wanted]
+        with self._lock:
+            changed = self._write('campaigns', [
+                (tuple(campaign.get(column) for column in self._columns['campaigns']), campaign) for campaign in campaigns
+            ], synced, report)
+            if campaign_ids is None:
+                for row in self._db.execute('SELECT id FROM campaigns WHERE synced != ?', (synced,)).fetchall():
+                    self._delete_campaign(row['id'], report)
+            self._db.commit()
+
+        def run(campaign_id):
+            try:
+                self._sync_campaign(campaign_id, full or campaign_id in changed, full, synced, report)
+            except Exception as e:
+                report.errors[campaign_id] = e
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            list(executor.map(run, [campaign['id'] for campaign in campaigns]))
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def _sync_campaign(self, campaign_id: int, sequences: bool, full: bool, synced: int, report: SyncReport):
+        campaigns = self.client.v1.campaigns
+        if sequences or self._state(campaign_id, 'sequences') is None:
+            response = campaigns.get_sequences(campaign_id)
+            error = _response_error(response)
+            if error is not None:
+                raise RuntimeError(error)
+            with self._lock:
+                self._write('sequences', [
+                    ((campaign_id, sequence.get('seq_number'), sequence.get('id'), sequence.get('subject')), sequence)
+                    for sequence in map(_plain_record, response or [])
+                ], synced, report)
+                self._sweep('sequences', campaign_id, synced, report)
+                self._save_state(campaign_id, 'sequences', len(response or []), None, time.time())
+        else:
+            with self._lock:
+                report.unchanged['sequences'] += self._count('sequences', campaign_id)
+
+        self._sync_rows('leads', campaign_id, 'total_leads', 'created_at',
+                        lambda offset, limit: campaigns.get_leads(campaign_id, offset, limit),
+                        lambda row, position: (campaign_id, row.get('campaign_lead_map_id'), (row.get('lead') or {}).get('id'),
+                                               (row.get('lead') or {}).get('email'), row.get('status'),
+                                               row.get('lead_category_id'), row.get('created_at'), position),
+                        full, synced, report)
+        self._sync_rows('statistics', campaign_id, 'total_stats', 'sent_time',
+                        lambda offset, limit: campaigns.get_statistics(campaign_id, offset, limit),
+                        lambda row, position: (campaign_id, row.get('lead_email'), row.get('sequence_number'),
+                                               row.get('email_status'), row.get('sent_time'), row.get('open_time'),
+                                               row.get('click_time'), row.get('reply_time'), row.get('is_unsubscribed'),
+                                               row.get('is_bounced'), position),
+                        full, synced, report)
+
+    def _sync_rows(self, table: str, campaign_id: int, total_key: str, timestamp: str,
+                   fetch: Callable[[int, int], Dict], columns: Callable[[Dict, int], Tuple], full: bool, synced: int,
+                   report: SyncReport):
+        state = None if full else self._state(campaign_id, table)
+        if state is not None and self.full_every is not None and time.time() - (state[2] or 0) >= self.full_every:
+            state = None
+        offset, high_water, full_synced_at = (0, None, time.time()) if state is None else state
+        if state is not None:
+            newest = min(time.time(), _epoch(high_water) or time.time())
+            cutoff = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(newest - self.lookback))
+            with self._lock:
+                rewind = self._db.execute(f'SELECT MIN(position) FROM {table} WHERE campaign_id = ? AND {timestamp} >= ?',
+                                          (campaign_id, cutoff)).fetchone()[0]
+            if rewind is not None:
+                offset = min(offset, rewind)
+        skipped = offset
+        while True:
+            page = fetch(offset, self.page_size)
+            error = _response_error(page)
+            if error is not None or not isinstance(page, dict):
+                raise RuntimeError(error or f'Unexpected {table} page: {page!r}')
+            if state is not None and int(page.get(total_key) or 0) < state[0]:
+                # Records were deleted upstream, which shifted every offset after them.
+                return self._sync_rows(table, campaign_id, total_key, timestamp, fetch, columns, True, synced, report)
+            rows = [_plain_record(row) for row in page.get('data') or []]
+            with self._lock:
+                self._write(table, [(columns(row, offset + i), row) for i, row in enumerate(rows)], synced, report)
+                self._db.commit()
+            stamps = [row[timestamp] for row in rows if row.get(timestamp)]
+            if stamps:
+                high_water = max(stamps + ([high_water] if high_water else []))
+            offset += len(rows)
+            # Stop at the reported total when there is one: the API may return fewer rows than page_size.
+            if not rows or (offset >= int(page[total_key]) if page.get(total_key) is not None else len(rows) < self.page_size):
+                break
+        with self._lock:
+            if state is None:
+                self._sweep(table, campaign_id, synced, report)
+            else:
+                report.unchanged[table] += skipped
+            self._save_state(campaign_id, table, offset, high_water, full_synced_at)
+
+    def _write(self, table: str, records: List[Tuple[Tuple, Dict]], synced: int, report: SyncReport) -> set:
+        # Upserts (columns, record) pairs and returns the keys of the new or changed records. Call with the lock held.
+        columns = self._columns[table]
+        key_columns = self._keys[table]
+        key_positions = [columns.index(column) for column in key_columns]
+        where = ' AND '.join(f'{column} = ?' for column in key_columns)
+        changed = set()
+        rows = []
+        for values, record in records:
+            data = json.dumps(record, sort_keys=True)
+            key = tuple(values[i] for i in key_positions)
+            existing = self._db.execute(f'SELECT data FROM {table} WHERE {where}', key).fetchone()
+            if existing is not None and existing['data'] == data:
+                report.unchanged[table] += 1
+            else:
+                report.upserted[table] += 1
+                changed.add(key[0] if len(key) == 1 else key)
+            rows.append((*values, synced, data))
+        self._db.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({', '.join('?' * (len(columns) + 2))})", rows)
+        return changed
+
+    def _sweep(self, table: str, campaign_id: int, synced: int, report: SyncReport):
+        report.deleted[table] += self._db.execute(f'DELETE FROM {table} WHERE campaign_id = ? AND synced != ?',
+                                                  (campaign_id, synced)).rowcount
+
+    def _delete_campaign(self, campaign_id: int, report: SyncReport):
+        report.deleted['campaigns'] += self._db.execute('DELETE FROM campaigns WHERE id = ?', (campaign_id,)).rowcount
+        for table in ('sequences', 'leads', 'statistics'):
+            report.deleted[table] += self._db.execute(f'DELETE FROM {table} WHERE campaign_id = ?', (campaign_id,)).rowcount
+        self._db.execute('DELETE FROM sync_state WHERE campaign_id = ?', (campaign_id,))
+
+    def _count(self, table: str, campaign_id: int) -> int:
+        return self._db.execute(f'SELECT COUNT(*) FROM {table} WHERE campaign_id = ?', (campaign_id,)).fetchone()[0]
+
+    def _state(self, campaign_id: int, resource: str) -> Union[Tuple[int, Union[str, None], Union[float, None]], None]:
+        with self._lock:
+            row = self._db.execute('SELECT next_offset, high_water, full_synced_at FROM sync_state '
+                                   'WHERE campaign_id = ? AND resource = ?', (campaign_id, resource)).fetchone()
+        return None if row is None else (row['next_offset'], row['high_water'], row['full_synced_at'])
+
+    def _save_state(self, campaign_id: int, resource: str, offset: int, high_water: Union[str, None],
+                    full_synced_at: Union[float, None]):
+        self._db.execute('INSERT OR REPLACE INTO sync_state (campaign_id, resource, next_offset, high_water, synced_at, '
+                         'full_synced_at) VALUES (?, ?, ?, ?, ?, ?)',
+                         (campaign_id, resource, offset, high_water, time.time(), full_synced_at))
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _plain_record(record):
+    return record.to_dict() if isinstance(record, Record) else record
 
-        campaigns = _CampaignsV1()
-        leads = _LeadsV1()
-        email_accounts = _EmailAccountsV1()
-        clients = _ClientsV1()
 
-    v1 = _V1()
+def _epoch(timestamp: Union[str, None]) -> Union[float, None]:
+    # API timestamps are ISO 8601, e.g. '2024-01-01T10:00:00.000Z'; ones without a timezone are UTC.
+    if not timestamp:
+        return None
+    try:
+        value = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
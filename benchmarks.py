@@ -0,0 +1,209 @@
+"""
+Throughput and latency benchmarks of the client against a local MockSmartleadServer.
+
+Run from the directory that contains the smartlead package:
+
+    python -m smartlead.benchmarks --latency 0.02 --json results.json
+
+Every workload reports calls per second, p50/p99 latency per call and the peak memory allocated by the
+client while it ran (tracemalloc). The mock server runs in a child process, so its own allocations are not
+counted. The statistics workloads keep every row in memory, so their bytes per item and items per second
+compare dict rows with typed Record rows.
+The mock server gzips responses for clients that accept it, as the API does. wire_kb counts the body bytes
+that went over the wire, so the uncompressed pagination and gzip bulk upload workloads show the savings of
+compression against their default counterparts; pass --bandwidth to throttle the mock server to a
+realistic link and see the latency difference too.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Union
+
+from . import Smartlead, AsyncSmartlead, aiohttp
+from .mock_server import MockSmartleadServer
+
+
+class BenchmarkResult:
+    """
+    Measurements of one workload
+    """
+
+    def __init__(self, name: str, calls: int, items: int, elapsed: float, latencies: List[float], peak_memory: int,
+                 wire_bytes: int = 0):
+        self.name = name
+        self.calls = calls
+        self.items = items
+        self.elapsed = elapsed
+        self.latencies = sorted(latencies)
+        self.peak_memory = peak_memory
+        self.wire_bytes = wire_bytes
+
+    def _percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        return self.latencies[min(len(self.latencies) - 1, int(q * len(self.latencies)))]
+
+    def as_dict(self) -> Dict:
+        return {
+            'workload': self.name,
+            'calls': self.calls,
+            'items': self.items,
+            'seconds': round(self.elapsed, 4),
+            'calls_per_second': round(self.calls / self.elapsed, 1) if self.elapsed else 0.0,
+            'items_per_second': round(self.items / self.elapsed, 1) if self.elapsed else 0.0,
+            'p50_ms': round(self._percentile(0.5) * 1000, 2),
+            'p99_ms': round(self._percentile(0.99) * 1000, 2),
+            'mean_ms': round(statistics.fmean(self.latencies) * 1000, 2) if self.latencies else 0.0,
+            'peak_memory_kb': round(self.peak_memory / 1024, 1),
+            'bytes_per_item': round(self.peak_memory / self.items) if self.items else 0,
+            'wire_kb': round(self.wire_bytes / 1024, 1),
+        }
+
+
+def _serve(connection, options: Dict):
+    with MockSmartleadServer(**options) as server:
+        connection.send(server.base_url)
+        while connection.recv() == 'bytes':
+            connection.send(server.bytes_sent + server.bytes_received)
+
+
+class _ServerProcess:
+    """
+    A MockSmartleadServer running in a child process, so that tracemalloc only sees the client's allocations
+    """
+
+    def __init__(self, **options):
+        self._connection, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve, args=(child, options), daemon=True)
+        self._process.start()
+        self.base_url = self._connection.recv()
+
+    @property
+    def wire_bytes(self) -> int:
+        self._connection.send('bytes')
+        return self._connection.recv()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._connection.send('stop')
+        self._process.join()
+
+
+def _measure(name: str, client, workload: Callable[[], int], server: _ServerProcess) -> BenchmarkResult:
+    latencies = []
+    client.add_hook('after_response', lambda event: latencies.append(event.latency))
+    wire_bytes = server.wire_bytes
+    tracemalloc.start()
+    started = time.perf_counter()
+    items = workload()
+    elapsed = time.perf_counter() - started
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    wire_bytes = server.wire_bytes - wire_bytes
+    return BenchmarkResult(name, len(latencies), items, elapsed, latencies, peak_memory, wire_bytes)
+
+
+def run(calls: int = 500, page_size: int = 100, bulk_leads: int = 5000, concurrency: int = 16, latency: float = 0.0,
+        leads_per_campaign: int = 5000, campaigns: int = 50,
+        bandwidth: Union[float, None] = None) -> List[BenchmarkResult]:
+    """
+    Runs every workload against a fresh mock server and returns their results
+
+    ### Args:
+        * calls (int): The number of sequential calls of the single-call workload. Defaults to 500.
+        * page_size (int): The page size of the pagination workload. Defaults to 100.
+        * bulk_leads (int): The number of leads uploaded by the bulk workload. Defaults to 5000.
+        * concurrency (int): The parallelism of the bulk and fan-out workloads. Defaults to 16.
+        * latency (float): The latency in seconds the mock server adds to every response. Defaults to 0.
+        * leads_per_campaign (int): The number of leads in every mock campaign. Defaults to 5000.
+        * campaigns (int): The number of mock campaigns, fanned out over by the fan-out workloads. Defaults to 50.
+        * bandwidth (float | None): The bytes per second the mock server throttles every body to. None means no limit.
+          Defaults to None.
+    """
+    results = []
+    with _ServerProcess(campaigns=campaigns, leads_per_campaign=leads_per_campaign, latency=latency, bandwidth=bandwidth) as server:
+        leads = [{'first_name': f'Bench{i}', 'email': f'bench{i}@example.com'} for i in range(bulk_leads)]
+
+        def measure(name: str, client, workload: Callable[[], int]):
+            results.append(_measure(name, client, workload, server))
+
+        with Smartlead('benchmark', server.base_url, pool_maxsize=concurrency) as client:
+            measure('single calls', client, lambda: sum(
+                1 for i in range(calls) if client.v1.campaigns.get(i % campaigns + 1)))
+        with Smartlead('benchmark', server.base_url, pool_maxsize=concurrency) as client:
+            measure('pagination (iter_leads)', client, lambda: sum(
+                1 for _ in client.v1.campaigns.iter_leads(1, page_size=page_size)))
+        for typed in (False, True):
+            with Smartlead('benchmark', server.base_url, pool_maxsize=concurrency, typed=typed) as client:
+                measure(f"statistics as {'records' if typed else 'dicts'} (iter_statistics)", client, lambda: len(
+                    list(client.v1.campaigns.iter_statistics(1, page_size=page_size))))
+        with Smartlead('benchmark', server.base_url, pool_maxsize=concurrency) as client:
+            measure('bulk upload (add_leads_in_bulk)', client, lambda: client.v1.campaigns.add_leads_in_bulk(
+                2, leads, max_concurrency=concurrency).upload_count)
+        with Smartlead('benchmark', server.base_url, pool_maxsize=concurrency) as client:
+            measure('fan-out (fetch_analytics)', client, lambda: len(client.v1.campaigns.fetch_analytics(
+                'all', '2024-01-01', '2024-01-31', max_concurrency=concurrency).campaigns))
+        # Compare with the pagination and bulk upload workloads above: responses are gzip-compressed by default.
+        with Smartlead('benchmark', server.base_url, pool_maxsize=concurrency, compress_responses=False) as client:
+            measure('uncompressed pagination (iter_leads)', client, lambda: sum(
+                1 for _ in client.v1.campaigns.iter_leads(1, page_size=page_size)))
+        with Smartlead('benchmark', server.base_url, pool_maxsize=concurrency, compress_requests=1024) as client:
+            measure('gzip bulk upload (add_leads_in_bulk)', client, lambda: client.v1.campaigns.add_leads_in_bulk(
+                3, leads, max_concurrency=concurrency).upload_count)
+
+        if aiohttp is not None:
+            async def fan_out(client):
+                return len((await client.v1.campaigns.fetch_analytics(
+                    'all', '2024-01-01', '2024-01-31', max_concurrency=concurrency)).campaigns)
+
+            client = AsyncSmartlead('benchmark', server.base_url, max_concurrency=concurrency)
+            measure('async fan-out (fetch_analytics)', client, lambda: asyncio.run(_run_and_close(client, fan_out)))
+    return results
+
+
+async def _run_and_close(client, workload):
+    async with client:
+        return await workload(client)
+
+
+def _print_table(results: List[BenchmarkResult]):
+    rows = [result.as_dict() for result in results]
+    columns = ['workload', 'calls', 'items', 'calls_per_second', 'items_per_second', 'p50_ms', 'p99_ms', 'peak_memory_kb',
+               'bytes_per_item', 'wire_kb']
+    widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+    print('  '.join(column.ljust(widths[column]) for column in columns))
+    for row in rows:
+        print('  '.join(str(row[column]).ljust(widths[column]) for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--bulk-leads', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='latency in seconds added to every mock response')
+    parser.add_argument('--leads-per-campaign', type=int, default=5000)
+    parser.add_argument('--campaigns', type=int, default=50)
+    parser.add_argument('--bandwidth', type=float, default=None,
+                        help='bytes per second the mock server throttles every body to')
+    parser.add_argument('--json', metavar='PATH', help='also write the results as JSON to PATH')
+    args = parser.parse_args()
+    results = run(calls=args.calls, page_size=args.page_size, bulk_leads=args.bulk_leads, concurrency=args.concurrency,
+                  latency=args.latency, leads_per_campaign=args.leads_per_campaign, campaigns=args.campaigns,
+                  bandwidth=args.bandwidth)
+    _print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([result.as_dict() for result in results], f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,456 @@
+import csv
+import gzip
+import io
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Union, Dict, List, Tuple
+from urllib.parse import urlparse, parse_qs
+
+
+class MockSmartleadServer:
+    """
+    Local stand-in for the Smartlead API, serving the v1 endpoints used by this library from in-memory data.
+    It runs in a background thread and is meant for tests and benchmarks, e.g.
+
+        with MockSmartleadServer(latency=0.02) as server:
+            smartlead = Smartlead('test-key', base_url=server.base_url)
+
+    ### Args:
+        * campaigns (int): The number of campaigns generated. Defaults to 10.
+        * leads_per_campaign (int): The number of leads generated in every campaign. Defaults to 1000.
+        * email_accounts (int): The number of email accounts generated. Defaults to 20.
+        * latency (float): The delay in seconds added to every response. Defaults to 0.
+        * jitter (float): A random extra delay of up to jitter seconds added to every response. Defaults to 0.
+        * error_rate (float): The fraction of requests answered with a 500 error. Defaults to 0.
+        * rate_limit (float | None): The number of requests per second allowed before answering 429 with Retry-After.
+          None means no limit. Defaults to None.
+        * bandwidth (float | None): The bytes per second every request and response body is throttled to, to simulate a
+          slow link. None means no limit. Defaults to None.
+        * compression (bool): Whether responses are gzip-compressed for clients that accept it, and gzip-compressed
+          request bodies are accepted. When False, compressed bodies are rejected with 415. Defaults to True.
+        * seed (int): The seed of the generated data and of the injected errors, for reproducible runs. Defaults to 0.
+        * host (str): The interface to listen on. Defaults to '127.0.0.1'.
+        * port (int): The port to listen on. 0 picks a free port. Defaults to 0.
+    """
+
+    def __init__(self, campaigns: int = 10, leads_per_campaign: int = 1000, email_accounts: int = 20,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: Union[float, None] = None, bandwidth: Union[float, None] = None, compression: bool = True,
+                 seed: int = 0, host: str = '127.0.0.1', port: int = 0):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.compression = compression
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.host = host
+        self.port = port
+        self.requests_served = 0
+        self.errors_injected = 0
+        self.rate_limited = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.calls = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = (0, 0)
+        self._httpd = None
+        self._thread = None
+        self._seed_data(campaigns, leads_per_campaign, email_accounts)
+        self._routes = [(method, re.compile(f"^{pattern}$"), handler) for method, pattern, handler in [
+            ('GET', r'/campaigns', self._all_campaigns),
+            ('POST', r'/campaigns/create', self._create_campaign),
+            ('GET', r'/campaigns/(\d+)', self._get_campaign),
+            ('DELETE', r'/campaigns/(\d+)', self._delete_campaign),
+            ('POST', r'/campaigns/(\d+)/settings', self._ok),
+            ('POST', r'/campaigns/(\d+)/status', self._update_status),
+            ('GET', r'/campaigns/(\d+)/sequences', self._get_sequences),
+            ('POST', r'/campaigns/(\d+)/sequences', self._save_sequences),
+            ('GET', r'/campaigns/(\d+)/email-accounts', self._campaign_email_accounts),
+            ('POST', r'/campaigns/(\d+)/email-accounts', self._add_campaign_email_accounts),
+            ('DELETE', r'/campaigns/(\d+)/email-accounts', self._remove_campaign_email_accounts),
+            ('GET', r'/campaigns/(\d+)/leads', self._get_leads),
+            ('POST', r'/campaigns/(\d+)/leads', self._add_leads),
+            ('GET', r'/campaigns/(\d+)/leads-export', self._export_leads),
+            ('GET', r'/campaigns/(\d+)/leads/(\d+)/message-history', self._message_history),
+            ('DELETE', r'/campaigns/(\d+)/leads/(\d+)', self._ok),
+            ('POST', r'/campaigns/(\d+)/leads/(\d+)/unsubscribe', self._ok),
+            ('POST', r'/campaigns/(\d+)/leads/(\d+)/category', self._ok),
+            ('GET', r'/campaigns/(\d+)/statistics', self._statistics),
+            ('GET', r'/campaigns/(\d+)/analytics-by-date', self._analytics_by_date),
+            ('GET', r'/campaigns/(\d+)/analytics', self._analytics),
+            ('GET', r'/campaigns/(\d+)/webhooks', self._get_webhooks),
+            ('POST', r'/campaigns/(\d+)/webhooks', self._ok),
+            ('DELETE', r'/campaigns/(\d+)/webhooks', self._ok),
+            ('GET', r'/leads', self._lead_by_email),
+            ('GET', r'/leads/fetch-categories', self._categories),
+            ('POST', r'/leads/add-domain-block-list', self._ok),
+            ('GET', r'/leads/(\d+)/campaigns', self._lead_campaigns),
+            ('POST', r'/leads/(\d+)/unsubscribe', self._ok),
+            ('POST', r'/leads/(\d+)', self._ok),
+            ('GET', r'/email-accounts', self._all_email_accounts),
+            ('POST', r'/email-accounts', self._ok),
+            ('POST', r'/email-accounts/reconnect-failed-email-accounts', self._ok),
+            ('POST', r'/email-accounts/(\d+)', self._update_email_account),
+            ('POST', r'/email-accounts/(\d+)/warmup', self._set_warmup),
+            ('GET', r'/client', self._all_clients),
+            ('POST', r'/client/save', self._ok),
+        ]]
+
+    def _seed_data(self, campaigns: int, leads_per_campaign: int, email_accounts: int):
+        rnd = self._random
+        statuses = ['opened', 'clicked', 'replied', 'unsubscribed', 'bounced']
+        self.campaigns = {i: {'id': i, 'name': f'Campaign {i}', 'status': 'ACTIVE', 'client_id': None,
+                              'created_at': '2024-01-01T00:00:00.000Z', 'updated_at': '2024-01-01T00:00:00.000Z'}
+                          for i in range(1, campaigns + 1)}
+        self.leads = {}
+        self.statistics = {}
+        for campaign_id in self.campaigns:
+            base = campaign_id * 1000000
+            self.leads[campaign_id] = [{
+                'campaign_lead_map_id': base + i,
+                'status': 'INPROGRESS',
+                'created_at': '2024-01-01T00:00:00.000Z',
+                'lead': {'id': base + i, 'first_name': f'First{i}', 'last_name': f'Last{i}',
+                         'email': f'lead{i}@campaign{campaign_id}.example.com', 'company_name': f'Company {i % 97}'}
+            } for i in range(leads_per_campaign)]
+            self.statistics[campaign_id] = [{
+                'lead_name': f'First{i} Last{i}',
+                'lead_email': f'lead{i}@campaign{campaign_id}.example.com',
+                'lead_category': None,
+                'sequence_number': i % 3 + 1,
+                'email_campaign_seq_id': i % 3 + 1,
+                'sent_time': f'2024-01-{i % 28 + 1:02d}T10:00:00.000Z',
+                'open_time': f'2024-01-{i % 28 + 1:02d}T11:00:00.000Z' if rnd.random() < 0.4 else None,
+                'click_time': None,
+                'reply_time': f'2024-01-{i % 28 + 1:02d}T12:00:00.000Z' if rnd.random() < 0.05 else None,
+                'is_unsubscribed': rnd.random() < 0.01,
+                'is_bounced': rnd.random() < 0.02,
+                'email_status': rnd.choice(statuses),
+            } for i in range(leads_per_campaign)]
+        self.email_accounts = [{'id': i, 'from_name': f'Sender {i}', 'from_email': f'sender{i}@example.com',
+                                'max_email_per_day': 50, 'custom_tracking_domain': None, 'bcc_email': None,
+                                'signature': '', 'client_id': None,
+                                'warmup_details': {'status': 'ACTIVE', 'total_sent_count': 0, 'reply_rate': 30}}
+                               for i in range(1, email_accounts + 1)]
+        # Like the API, warmup_details does not report these settings.
+        self.warmup_settings = {account['id']: {'total_warmup_per_day': 20, 'daily_rampup': 2} for account in self.email_accounts}
+        self.campaign_email_accounts = {campaign_id: [account['id'] for account in self.email_accounts[:5]]
+                                        for campaign_id in self.campaigns}
+        self.sequences = {campaign_id: [] for campaign_id in self.campaigns}
+        self.next_campaign_id = campaigns + 1
+
+    @property
+    def base_url(self) -> str:
+        """
+        The base url to give to a client, e.g. http://127.0.0.1:53211/api/v1
+        """
+        return f"http://{self.host}:{self.port}/api/v1"
+
+    def start(self) -> 'MockSmartleadServer':
+        """
+        Starts serving in a background thread
+        """
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops serving and closes the listening socket
+        """
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _admit(self) -> Tuple[Union[int, None], Dict[str, str]]:
+        with self._lock:
+            self.requests_served += 1
+            if self.rate_limit is not None:
+                second = int(time.time())
+                window, count = self._window
+                count = count + 1 if window == second else 1
+                self._window = (second, count)
+                remaining = max(0, int(self.rate_limit) - count)
+                headers = {'X-RateLimit-Limit': str(int(self.rate_limit)),
+                           'X-RateLimit-Remaining': str(remaining),
+                           'X-RateLimit-Reset': str(second + 1)}
+                if count > self.rate_limit:
+                    self.rate_limited += 1
+                    return 429, {**headers, 'Retry-After': '1'}
+            else:
+                headers = {}
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors_injected += 1
+                return 500, headers
+        return None, headers
+
+    def handle(self, method: str, target: str, body: bytes) -> Tuple[int, Union[Dict, List, bytes], Dict[str, str]]:
+        """
+        Answers one request and returns (status, payload, headers). A bytes payload is sent as CSV.
+        """
+        url = urlparse(target)
+        path = url.path[len('/api/v1'):] if url.path.startswith('/api/v1') else url.path
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if not query.get('api_key') or query['api_key'] == 'None':
+            return 401, {'error': 'api_key is required'}, {}
+        status, headers = self._admit()
+        if status == 429:
+            return status, {'error': 'Too many requests'}, headers
+        if status == 500:
+            return status, {'error': 'Injected server error'}, headers
+        payload = json.loads(body) if body else None
+        for route_method, pattern, handler in self._routes:
+            match = pattern.match(path) if route_method == method else None
+            if match:
+                key = f"{method} {pattern.pattern[1:-1]}"
+                with self._lock:
+                    self.calls[key] = self.calls.get(key, 0) + 1
+                status, result = handler(*[int(group) for group in match.groups()], query=query, body=payload)
+                return status, result, headers
+        return 404, {'error': f'Cannot {method} {path}'}, headers
+
+    def _ok(self, *ids, query, body):
+        return 200, {'ok': True}
+
+    def _campaign(self, campaign_id: int):
+        return self.campaigns.get(campaign_id)
+
+    def _all_campaigns(self, query, body):
+        return 200, list(self.campaigns.values())
+
+    def _create_campaign(self, query, body):
+        with self._lock:
+            campaign_id = self.next_campaign_id
+            self.next_campaign_id += 1
+            self.campaigns[campaign_id] = {'id': campaign_id, 'name': (body or {}).get('name'), 'status': 'DRAFTED',
+                                           'client_id': (body or {}).get('client_id')}
+            self.leads[campaign_id] = []
+            self.statistics[campaign_id] = []
+            self.sequences[campaign_id] = []
+        return 200, {'ok': True, 'id': campaign_id, 'name': self.campaigns[campaign_id]['name']}
+
+    def _get_campaign(self, campaign_id, query, body):
+        campaign = self._campaign(campaign_id)
+        return (200, campaign) if campaign else (404, {'error': 'Campaign not found'})
+
+    def _delete_campaign(self, campaign_id, query, body):
+        with self._lock:
+            self.campaigns.pop(campaign_id, None)
+        return 200, {'ok': True}
+
+    def _update_status(self, campaign_id, query, body):
+        if campaign_id in self.campaigns:
+            self.campaigns[campaign_id]['status'] = (body or {}).get('status')
+        return 200, {'ok': True}
+
+    def _get_sequences(self, campaign_id, query, body):
+        return 200, self.sequences.get(campaign_id, [])
+
+    def _save_sequences(self, campaign_id, query, body):
+        self.sequences[campaign_id] = (body or {}).get('sequences', [])
+        return 200, {'ok': True, 'data': 'success'}
+
+    def _campaign_email_accounts(self, campaign_id, query, body):
+        ids = set(self.campaign_email_accounts.get(campaign_id, []))
+        return 200, [account for account in self.email_accounts if account['id'] in ids]
+
+    def _add_campaign_email_accounts(self, campaign_id, query, body):
+        with self._lock:
+            ids = self.campaign_email_accounts.setdefault(campaign_id, [])
+            ids.extend(i for i in (body or {}).get('email_account_ids') or [] if i not in ids)
+        return 200, {'ok': True}
+
+    def _remove_campaign_email_accounts(self, campaign_id, query, body):
+        removed = set((body or {}).get('email_account_ids') or [])
+        with self._lock:
+            self.campaign_email_accounts[campaign_id] = [i for i in self.campaign_email_accounts.get(campaign_id, [])
+                                                         if i not in removed]
+        return 200, {'ok': True}
+
+    def _email_account(self, email_account_id: int) -> Union[Dict, None]:
+        return next((account for account in self.email_accounts if account['id'] == email_account_id), None)
+
+    def _update_email_account(self, email_account_id, query, body):
+        account = self._email_account(email_account_id)
+        if account is None:
+            return 404, {'error': 'Email account not found'}
+        body = body or {}
+        account.update({'max_email_per_day': body.get('max_email_per_day'), 'custom_tracking_domain': body.get('custom_tracking_url'),
+                        'bcc_email': body.get('bcc'), 'signature': body.get('signature'), 'client_id': body.get('client_id')})
+        return 200, {'ok': True}
+
+    def _set_warmup(self, email_account_id, query, body):
+        account = self._email_account(email_account_id)
+        if account is None:
+            return 404, {'error': 'Email account not found'}
+        body = body or {}
+        account['warmup_details'].update({'status': 'ACTIVE' if body.get('warmup_enabled') == 'true' else 'INACTIVE',
+                                          'reply_rate': body.get('reply_rate_percentage')})
+        self.warmup_settings[email_account_id] = {'total_warmup_per_day': body.get('total_warmup_per_day'),
+                                                  'daily_rampup': body.get('daily_rampup')}
+        return 200, {'ok': True}
+
+    def _page(self, rows: List, query: Dict, max_limit: Union[int, None] = None) -> List:
+        offset = int(query.get('offset', 0))
+        limit = int(query.get('limit', 100))
+        if max_limit is not None:
+            limit = min(limit, max_limit)
+        return rows[offset:offset + limit]
+
+    def _get_leads(self, campaign_id, query, body):
+        leads = self.leads.get(campaign_id, [])
+        # Like the API, at most 100 leads are returned per request whatever the limit.
+        return 200, {'total_leads': str(len(leads)), 'offset': int(query.get('offset', 0)),
+                     'limit': int(query.get('limit', 100)), 'data': self._page(leads, query, 100)}
+
+    def _add_leads(self, campaign_id, query, body):
+        lead_list = (body or {}).get('lead_list') or []
+        if len(lead_list) > 100:
+            return 400, {'error': 'lead_list can contain at most 100 leads'}
+        leads = self.leads.setdefault(campaign_id, [])
+        with self._lock:
+            known = {lead['lead']['email'] for lead in leads[-1000:]}
+            new = [lead for lead in lead_list if lead.get('email') not in known]
+            base = campaign_id * 1000000 + len(leads)
+            leads.extend({'campaign_lead_map_id': base + i, 'status': 'STARTED', 'lead': {'id': base + i, **lead}}
+                         for i, lead in enumerate(new))
+        return 200, {'ok': True, 'upload_count': len(new), 'total_leads': len(lead_list), 'already_added_to_campaign': 0,
+                     'duplicate_count': len(lead_list) - len(new), 'invalid_email_count': 0, 'unsubscribed_leads': []}
+
+    def _export_leads(self, campaign_id, query, body):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(['id', 'campaign_lead_map_id', 'status', 'first_name', 'last_name', 'email', 'company_name'])
+        for lead in self.leads.get(campaign_id, []):
+            info = lead['lead']
+            writer.writerow([info['id'], lead['campaign_lead_map_id'], lead['status'], info.get('first_name'),
+                             info.get('last_name'), info.get('email'), info.get('company_name')])
+        return 200, buf.getvalue().encode()
+
+    def _message_history(self, campaign_id, lead_id, query, body):
+        return 200, {'history': [
+            {'type': 'SENT', 'message_id': f'<{lead_id}.1@example.com>', 'time': '2024-01-02T10:00:00.000Z',
+             'email_body': '<p>Hi there, do you have a minute?</p>', 'subject': 'Quick question', 'email_seq_number': '1'},
+            {'type': 'REPLY', 'message_id': f'<{lead_id}.2@example.com>', 'time': '2024-01-03T09:00:00.000Z',
+             'email_body': '<p>Sure, tell me more.</p>', 'subject': 'Re: Quick question'},
+        ], 'from': 'sender1@example.com', 'to': f'lead{lead_id % 1000000}@example.com'}
+
+    def _statistics(self, campaign_id, query, body):
+        rows = self.statistics.get(campaign_id, [])
+        if query.get('email_sequence_number') not in (None, 'None'):
+            rows = [row for row in rows if row['sequence_number'] == int(query['email_sequence_number'])]
+        if query.get('email_status') not in (None, 'None'):
+            rows = [row for row in rows if row['email_status'] == query['email_status']]
+        return 200, {'total_stats': str(len(rows)), 'offset': int(query.get('offset', 0)),
+                     'limit': int(query.get('limit', 100)), 'data': self._page(rows, query)}
+
+    def _analytics(self, campaign_id, query, body):
+        rows = self.statistics.get(campaign_id, [])
+        return 200, {'id': campaign_id, 'name': self.campaigns.get(campaign_id, {}).get('name'),
+                     'sent_count': str(len(rows)),
+                     'open_count': str(sum(1 for row in rows if row['open_time'])),
+                     'click_count': '0',
+                     'reply_count': str(sum(1 for row in rows if row['reply_time'])),
+                     'bounce_count': str(sum(1 for row in rows if row['is_bounced'])),
+                     'unsubscribed_count': str(sum(1 for row in rows if row['is_unsubscribed'])),
+                     'campaign_lead_stats': {'total': len(self.leads.get(campaign_id, []))}}
+
+    def _analytics_by_date(self, campaign_id, query, body):
+        return 200, {'id': campaign_id, 'start_date': query.get('start_date'), 'end_date': query.get('end_date'),
+                     'sent_count': str(len(self.statistics.get(campaign_id, []))), 'open_count': '0', 'reply_count': '0'}
+
+    def _get_webhooks(self, campaign_id, query, body):
+        return 200, [{'id': 1, 'name': 'Default', 'webhook_url': 'https://example.com/hook',
+                      'event_types': ['EMAIL_REPLY'], 'categories': []}]
+
+    def _lead_by_email(self, query, body):
+        email = query.get('email')
+        for leads in self.leads.values():
+            for lead in leads:
+                if lead['lead'].get('email') == email:
+                    return 200, lead['lead']
+        return 200, {}
+
+    def _categories(self, query, body):
+        return 200, [{'id': i, 'name': name} for i, name in enumerate(
+            ['Interested', 'Meeting Request', 'Not Interested', 'Do Not Contact', 'Information Request',
+             'Out Of Office', 'Wrong Person'], start=1)]
+
+    def _lead_campaigns(self, lead_id, query, body):
+        campaign_id = lead_id // 1000000
+        return 200, [self.campaigns[campaign_id]] if campaign_id in self.campaigns else []
+
+    def _all_email_accounts(self, query, body):
+        return 200, self.email_accounts
+
+    def _all_clients(self, query, body):
+        return 200, [{'id': 1, 'name': 'Client 1', 'email': 'client1@example.com', 'permission': ['full_access']}]
+
+
+def _make_handler(server: MockSmartleadServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are written separately; without TCP_NODELAY every keep-alive response stalls on delayed ACKs.
+        disable_nagle_algorithm = True
+
+        def _throttle(self, size: int):
+            if server.bandwidth:
+                time.sleep(size / server.bandwidth)
+
+        def _respond(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            self._throttle(len(body))
+            if self.headers.get('Content-Encoding') == 'gzip':
+                if server.compression:
+                    status, payload, headers = server.handle(self.command, self.path, gzip.decompress(body))
+                else:
+                    status, payload, headers = 415, {'error': 'Content-Encoding gzip is not supported'}, {}
+            else:
+                status, payload, headers = server.handle(self.command, self.path, body)
+            if isinstance(payload, bytes):
+                data, content_type = payload, 'text/csv; charset=utf-8'
+            else:
+                data, content_type = json.dumps(payload).encode(), 'application/json; charset=utf-8'
+            compressed = (server.compression and len(data) >= 1024
+                          and 'gzip' in self.headers.get('Accept-Encoding', ''))
+            if compressed:
+                data = gzip.compress(data, compresslevel=5)
+            with server._lock:
+                server.bytes_received += len(body)
+                server.bytes_sent += len(data)
+            self._throttle(len(data))
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            if compressed:
+                self.send_header('Content-Encoding', 'gzip')
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_DELETE = _respond
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
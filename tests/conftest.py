@@ -0,0 +1,28 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+# The repository root is the smartlead package itself; load it under that name.
+ROOT = Path(__file__).resolve().parent.parent
+if 'smartlead' not in sys.modules:
+    spec = importlib.util.spec_from_file_location('smartlead', ROOT / '__init__.py', submodule_search_locations=[str(ROOT)])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['smartlead'] = module
+    spec.loader.exec_module(module)
+
+from smartlead import Smartlead  # noqa: E402
+from smartlead.mock_server import MockSmartleadServer  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    with MockSmartleadServer(campaigns=3, leads_per_campaign=250, email_accounts=5) as server:
+        yield server
+
+
+@pytest.fixture
+def client(server):
+    with Smartlead(api_key='test', base_url=server.base_url, max_retries=0) as client:
+        yield client
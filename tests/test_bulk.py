@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from smartlead import Smartlead, AsyncSmartlead, BulkMutationExecutor
+
+OPERATIONS = [{'operation': 'update_lead_category', 'campaign_id': 1, 'lead_id': 1000000 + i, 'category_id': 1} for i in range(10)]
+
+
+def test_run_rejects_an_async_client(server, tmp_path):
+    checkpoint = tmp_path / 'checkpoint'
+    executor = BulkMutationExecutor(AsyncSmartlead(api_key='test', base_url=server.base_url), checkpoint=str(checkpoint))
+    with pytest.raises(TypeError):
+        executor.run(OPERATIONS)
+    assert not checkpoint.exists() or checkpoint.read_text() == ''
+
+
+def test_arun_rejects_a_sync_client(client):
+    with pytest.raises(TypeError):
+        asyncio.run(BulkMutationExecutor(client).arun(OPERATIONS))
+
+
+def test_failed_operations_are_retried(server, client):
+    server.error_rate = 0.3
+    report = BulkMutationExecutor(client, retries=8, backoff=0.01).run(OPERATIONS)
+    assert len(report.succeeded) == len(OPERATIONS)
+    assert report.requests_sent >= len(OPERATIONS)
+
+
+def test_arun_runs_every_operation(server):
+    async def main():
+        async with AsyncSmartlead(api_key='test', base_url=server.base_url, max_retries=0) as client:
+            return await BulkMutationExecutor(client).arun(OPERATIONS)
+
+    report = asyncio.run(main())
+    assert len(report.succeeded) == len(OPERATIONS)
+    assert report.failed == []
+
+
+def test_invalid_operation_fails_without_a_request(client):
+    report = BulkMutationExecutor(client).run([{'operation': 'update_lead_category', 'campaign_id': 1}])
+    assert len(report.failed) == 1
+    assert report.requests_sent == 0
+
+
+def test_upload_report_counts_retried_requests(server, client):
+    server.error_rate = 0.5
+    served = server.requests_served
+    report = client.v1.campaigns.add_leads_in_bulk(1, [{'email': f'new{i}@example.com'} for i in range(500)],
+                                                   retries=10, backoff=0.01)
+    assert report.failed_leads == []
+    assert report.requests_sent == server.requests_served - served
+    assert report.requests_sent > 5
+
+
+def test_fetch_analytics_raises_when_campaigns_cannot_be_listed(server, client):
+    server.error_rate = 1.0
+    with pytest.raises(RuntimeError, match='Could not list campaigns'):
+        client.v1.campaigns.fetch_analytics('all')
@@ -0,0 +1,28 @@
+from smartlead import Smartlead, ResponseCache, SQLiteCacheBackend, MemoryCacheBackend
+import pytest
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def cache(request, tmp_path):
+    backend = MemoryCacheBackend() if request.param == 'memory' else SQLiteCacheBackend(str(tmp_path / 'cache.db'))
+    return ResponseCache(backend=backend)
+
+
+def test_tenants_sharing_a_cache_do_not_share_responses(server, cache):
+    first = Smartlead(api_key='first', base_url=server.base_url, cache=cache)
+    second = Smartlead(api_key='second', base_url=server.base_url, cache=cache)
+    first.v1.campaigns.all()
+    first.v1.campaigns.all()
+    second.v1.campaigns.all()
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_a_write_invalidates_every_tenant(server, cache):
+    first = Smartlead(api_key='first', base_url=server.base_url, cache=cache)
+    second = Smartlead(api_key='second', base_url=server.base_url, cache=cache)
+    first.v1.campaigns.all()
+    second.v1.campaigns.all()
+    first.v1.campaigns.update_status(1, 'PAUSED')
+    first.v1.campaigns.all()
+    second.v1.campaigns.all()
+    assert (cache.hits, cache.misses) == (0, 4)
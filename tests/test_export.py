@@ -0,0 +1,43 @@
+import asyncio
+import codecs
+
+from smartlead import AsyncSmartlead, _ExportRowParser
+
+
+def test_export_format_is_detected_past_a_bom_and_whitespace_chunks():
+    parser = _ExportRowParser()
+    assert parser.feed(codecs.BOM_UTF8[:2]) == []
+    assert parser.feed(codecs.BOM_UTF8[2:] + b'\n  ') == []
+    assert parser.feed(b'[{"id": 1}, ') == []
+    assert parser.feed(b'{"id": 2}]\n', final=True) == [{'id': 1}, {'id': 2}]
+
+    parser = _ExportRowParser()
+    assert parser.feed(codecs.BOM_UTF8 + b'id,email\n1,a@example.com\n') == [{'id': '1', 'email': 'a@example.com'}]
+
+
+def test_iter_leads_export_rows(client):
+    rows = list(client.v1.campaigns.iter_leads_export(1, chunk_size=256))
+    assert len(rows) == 250
+
+
+def test_closing_an_async_export_early_releases_its_concurrency_slot(server):
+    async def main():
+        async with AsyncSmartlead(api_key='test', base_url=server.base_url, max_retries=0, max_concurrency=1) as client:
+            rows = client.v1.campaigns.iter_leads_export(1, chunk_size=256)
+            async for row in rows:
+                break
+            await rows.aclose()
+            assert not client.v1.campaigns._transport._semaphore.locked()
+            return await asyncio.wait_for(client.v1.campaigns.get(1), 5)
+
+    assert asyncio.run(main())['id'] == 1
+
+
+def test_resumed_history_export_refetches_leads_of_unreadable_lines(client, tmp_path):
+    path = tmp_path / 'histories.jsonl'
+    assert client.v1.campaigns.export_message_histories(1, str(path), retries=0).exported == 250
+    lines = path.read_bytes().splitlines(keepends=True)
+    path.write_bytes(b'{"lead_id": \n' + b'{"history": []}\n' + b''.join(lines[2:]) + b'{"lead_id": 12')
+
+    report = client.v1.campaigns.export_message_histories(1, str(path), retries=0)
+    assert (report.exported, report.skipped) == (2, 248)
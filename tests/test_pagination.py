@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from smartlead import Smartlead, AsyncSmartlead, SQLiteMirror
+
+
+def test_iter_leads_returns_every_lead(client):
+    leads = list(client.v1.campaigns.iter_leads(1, page_size=100))
+    assert len(leads) == 250
+
+
+def test_iter_leads_raises_on_error_page(server, client):
+    server.error_rate = 1.0
+    with pytest.raises(RuntimeError, match='Could not fetch page'):
+        list(client.v1.campaigns.iter_leads(1, page_size=100))
+
+
+def test_iter_leads_raises_without_api_key(server):
+    with Smartlead(api_key='', base_url=server.base_url, max_retries=0) as client:
+        with pytest.raises(RuntimeError, match='api_key is required'):
+            list(client.v1.campaigns.iter_leads(1))
+
+
+def test_async_iter_leads_raises_on_error_page(server):
+    async def main():
+        async with AsyncSmartlead(api_key='test', base_url=server.base_url, max_retries=0) as client:
+            return [lead async for lead in client.v1.campaigns.iter_leads(1, page_size=100)]
+
+    assert len(asyncio.run(main())) == 250
+    server.error_rate = 1.0
+    with pytest.raises(RuntimeError, match='Could not fetch page'):
+        asyncio.run(main())
+
+
+def test_page_size_above_the_api_cap_still_returns_every_lead(server, client):
+    assert len(list(client.v1.campaigns.iter_leads(1, page_size=250))) == 250
+
+    async def main():
+        async with AsyncSmartlead(api_key='test', base_url=server.base_url, max_retries=0) as client:
+            return [lead async for lead in client.v1.campaigns.iter_leads(1, page_size=250)]
+
+    assert len(asyncio.run(main())) == 250
+
+
+def test_mirror_page_size_above_the_api_cap_syncs_every_lead(client, tmp_path):
+    with SQLiteMirror(client, str(tmp_path / 'mirror.db'), page_size=250) as mirror:
+        mirror.sync([1])
+        assert mirror.query('SELECT COUNT(*) AS n FROM leads')[0]['n'] == 250
@@ -0,0 +1,25 @@
+def test_warmup_change_without_unreported_fields_is_not_sent(server, client):
+    plan = client.v1.email_accounts.reconcile([{'id': 1, 'reply_rate_percentage': 50}])
+    assert plan.changes == []
+    assert plan.incomplete == [{'action': 'set_warmup_settings', 'target': 1, 'label': 'sender1@example.com',
+                                'fields': ['total_warmup_per_day', 'daily_rampup']}]
+    assert server.warmup_settings[1] == {'total_warmup_per_day': 20, 'daily_rampup': 2}
+    assert server.email_accounts[0]['warmup_details']['reply_rate'] == 30
+
+
+def test_warmup_change_with_every_unreported_field_is_sent(server, client):
+    plan = client.v1.email_accounts.reconcile([{'id': 1, 'reply_rate_percentage': 50, 'total_warmup_per_day': 30,
+                                                'daily_rampup': 3}])
+    assert plan.errors == [] and plan.incomplete == []
+    assert [change['action'] for change in plan.changes] == ['set_warmup_settings']
+    assert server.warmup_settings[1] == {'total_warmup_per_day': 30, 'daily_rampup': 3}
+    assert server.email_accounts[0]['warmup_details'] == {'status': 'ACTIVE', 'total_sent_count': 0, 'reply_rate': 50}
+
+
+def test_reported_fields_left_out_are_kept(server, client):
+    server.email_accounts[0]['signature'] = 'Kept'
+    plan = client.v1.email_accounts.reconcile([{'from_email': 'SENDER1@example.com', 'max_email_per_day': 40}])
+    assert [change['action'] for change in plan.changes] == ['update']
+    assert server.email_accounts[0]['max_email_per_day'] == 40
+    assert server.email_accounts[0]['signature'] == 'Kept'
+    assert client.v1.email_accounts.reconcile([{'id': 1, 'max_email_per_day': 40}]).changes == []
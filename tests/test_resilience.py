@@ -0,0 +1,43 @@
+import threading
+import time
+
+import pytest
+
+from smartlead import Smartlead, RequestCoalescer, CircuitBreaker, CircuitOpenError
+
+
+def test_concurrent_identical_gets_share_one_request(server):
+    server.latency = 0.2
+    coalescer = RequestCoalescer()
+    client = Smartlead(api_key='test', base_url=server.base_url, coalescer=coalescer)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def fetch():
+        barrier.wait()
+        results.append(client.v1.campaigns.all())
+
+    threads = [threading.Thread(target=fetch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (coalescer.misses, coalescer.hits) == (1, 7)
+    assert all(result == results[0] for result in results)
+    assert len({id(result) for result in results}) == 8
+
+
+def test_circuit_opens_on_errors_and_closes_after_a_probe(server):
+    breaker = CircuitBreaker(min_calls=4, cooldown=0.2)
+    client = Smartlead(api_key='test', base_url=server.base_url, max_retries=0, circuit_breaker=breaker)
+    server.error_rate = 1.0
+    for _ in range(4):
+        client.v1.campaigns.all()
+    assert breaker.state('GET /campaigns') == 'open'
+    with pytest.raises(CircuitOpenError):
+        client.v1.campaigns.all()
+    server.error_rate = 0.0
+    time.sleep(0.25)
+    client.v1.campaigns.all()
+    assert breaker.state('GET /campaigns') == 'closed'
+    assert breaker.trips == 1
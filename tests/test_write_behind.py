@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from smartlead import AsyncSmartlead, WriteBehindQueue
+
+STATUS_CALLS = r'POST /campaigns/(\d+)/status'
+
+
+@pytest.fixture
+def queue(client, tmp_path):
+    queue = WriteBehindQueue(client, tmp_path / 'queue.db', retries=5, backoff=0.3)
+    yield queue
+    queue.close()
+
+
+def test_newer_status_supersedes_a_failed_older_one(server, queue):
+    server.error_rate = 1.0
+    queue.submit({'operation': 'update_status', 'campaign_id': 1, 'status': 'PAUSED'})
+    queue.start()
+    time.sleep(0.2)
+    server.error_rate = 0.0
+    queue.submit({'operation': 'update_status', 'campaign_id': 1, 'status': 'START'})
+    assert queue.join(5)
+    time.sleep(0.5)
+    assert server.campaigns[1]['status'] == 'START'
+    assert server.calls[STATUS_CALLS] == 1
+    assert queue.snapshot()['superseded'] == 1
+
+
+def test_last_queued_status_wins(server, queue):
+    for i in range(20):
+        queue.submit({'operation': 'update_status', 'campaign_id': 2, 'status': ['START', 'PAUSED'][i % 2]})
+    queue.start()
+    assert queue.join(5)
+    assert server.campaigns[2]['status'] == 'PAUSED'
+    assert server.calls[STATUS_CALLS] < 20
+
+
+def test_failed_operations_are_kept_and_retried(server, client, tmp_path):
+    with WriteBehindQueue(client, tmp_path / 'queue.db', retries=1, backoff=0.01) as queue:
+        server.error_rate = 1.0
+        queue.submit({'operation': 'update_status', 'campaign_id': 1, 'status': 'PAUSED'})
+        queue.start()
+        assert queue.join(5)
+        assert len(queue.failed()) == 1
+        server.error_rate = 0.0
+        queue.retry_failed()
+        assert queue.join(5)
+        assert queue.failed() == []
+    assert server.campaigns[1]['status'] == 'PAUSED'
+
+
+def test_large_lead_list_is_split(server, queue):
+    queue.submit({'operation': 'add_leads_to_campaign', 'campaign_id': 3,
+                  'lead_list': [{'email': f'new{i}@example.com'} for i in range(250)]})
+    queue.start()
+    assert queue.join(5)
+    assert queue.failed() == []
+    assert len(server.leads[3]) == 500
+    assert queue.snapshot()['requests'] == 3
+
+
+def test_invalid_operation_is_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.submit({'operation': 'update_status', 'campaign_id': 1})
+
+
+def test_async_client_is_rejected(server, tmp_path):
+    with pytest.raises(TypeError):
+        WriteBehindQueue(AsyncSmartlead(api_key='test', base_url=server.base_url), tmp_path / 'queue.db')
@@ -0,0 +1,453 @@
+"""
+Receiver for Smartlead webhooks, to react to sent emails, opens, replies and lead category changes as they
+happen instead of polling campaign statistics.
+
+    def handle(events):
+        for event in events:
+            if isinstance(event, EmailReplyEvent):
+                notify(event.sl_lead_email, event.reply_message.text)
+
+    receiver = WebhookReceiver(handle, secret='my-secret').serve(port=8080)
+    receiver.register(smartlead, campaign_ids, 'https://hooks.example.com/smartlead')
+
+The receiver is also a WSGI app (receiver.wsgi_app) and an ASGI app (receiver.asgi_app), to mount it in an
+existing web server instead of serve().
+"""
+import asyncio
+import hmac
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Union, Dict, List, Tuple, Callable, Iterable
+
+from . import Record, Smartlead, AsyncSmartlead, _loads, _response_error
+
+
+class WebhookMessage(Record):
+    """
+    The sent or reply message carried by an event
+    """
+    __slots__ = ('message_id', 'html', 'text', 'time')
+
+
+class WebhookEvent(Record):
+    """
+    A webhook event. Events of a known type are parsed into the matching subclass, e.g. EmailReplyEvent, and
+    any other type into WebhookEvent itself. The messages are decoded into WebhookMessage when first accessed.
+    """
+    __slots__ = ('event_type', 'event_timestamp', 'time_sent', 'time_replied', 'campaign_id', 'campaign_name',
+                 'campaign_status', 'client_id', 'sl_email_lead_id', 'sl_email_lead_map_id', 'sl_lead_email',
+                 'from_email', 'to_email', 'to_name', 'subject', 'sequence_number', 'webhook_id', 'webhook_name',
+                 'webhook_url', 'lead_category', 'app_url', 'ui_master_inbox_link', 'description', 'metadata',
+                 'secret_key', '_sent_message', '_reply_message')
+    _nested = {'sent_message': WebhookMessage, 'reply_message': WebhookMessage}
+
+
+class EmailSentEvent(WebhookEvent):
+    __slots__ = ()
+
+
+class EmailOpenEvent(WebhookEvent):
+    __slots__ = ()
+
+
+class EmailLinkClickEvent(WebhookEvent):
+    __slots__ = ()
+
+
+class EmailReplyEvent(WebhookEvent):
+    __slots__ = ()
+
+
+class LeadUnsubscribedEvent(WebhookEvent):
+    __slots__ = ()
+
+
+class LeadCategoryUpdatedEvent(WebhookEvent):
+    __slots__ = ()
+
+
+event_classes = {
+    'EMAIL_SENT': EmailSentEvent,
+    'EMAIL_OPEN': EmailOpenEvent,
+    'EMAIL_LINK_CLICK': EmailLinkClickEvent,
+    'EMAIL_REPLY': EmailReplyEvent,
+    'LEAD_UNSUBSCRIBED': LeadUnsubscribedEvent,
+    'LEAD_CATEGORY_UPDATED': LeadCategoryUpdatedEvent,
+}
+
+
+def parse_event(body: Union[bytes, str, Dict]) -> WebhookEvent:
+    """
+    Validates a webhook payload and parses it into its typed event. Raises ValueError if it is not a JSON
+    object with an event_type and a campaign_id.
+
+    ### Args:
+        * body (bytes | str | Dict): The raw request body, or the already decoded payload
+    """
+    if isinstance(body, (bytes, str)):
+        try:
+            body = _loads(body)
+        except ValueError as e:
+            raise ValueError(f'Invalid JSON payload: {e}') from None
+    if not isinstance(body, dict):
+        raise ValueError('The payload must be a JSON object')
+    if not isinstance(body.get('event_type'), str):
+        raise ValueError('The payload has no event_type')
+    try:
+        body['campaign_id'] = int(body['campaign_id'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('The payload has no valid campaign_id') from None
+    return event_classes.get(body['event_type'], WebhookEvent)(body)
+
+
+_STOP = object()
+
+
+class WebhookReceiver:
+    """
+    Receives webhook events, queues them and delivers them to handler in batches from background threads.
+
+    Requests are answered as soon as the event is validated and queued, so bursts are absorbed by the queue
+    rather than by the handler. When the queue is full, a request waits up to put_timeout for room and is
+    then answered 503 with Retry-After, pushing back on the sender instead of growing memory. Delivery waits
+    up to max_wait to fill a batch of batch_size events. A batch whose handler raises is counted in
+    handler_errors and not delivered again.
+
+    ### Args:
+        * handler (Callable[[List[WebhookEvent]], None]): Called with every batch of events
+        * batch_size (int): The maximum number of events per batch. Defaults to 100.
+        * max_wait (float): The maximum time in seconds an event waits for its batch to fill. Defaults to 0.5.
+        * queue_size (int): The maximum number of events queued for delivery. Defaults to 10000.
+        * put_timeout (float): How long in seconds a request waits for room in a full queue before it is rejected.
+          Defaults to 1.
+        * workers (int): The number of threads calling handler. Batches are delivered in order only with 1.
+          Defaults to 1.
+        * secret (str | None): When set, events whose secret_key does not match are rejected with 401. Defaults to None.
+        * max_body (int): The maximum size in bytes of a request body. Defaults to 1 MiB.
+    """
+
+    def __init__(self, handler: Callable[[List[WebhookEvent]], None], batch_size: int = 100, max_wait: float = 0.5,
+                 queue_size: int = 10000, put_timeout: float = 1.0, workers: int = 1, secret: Union[str, None] = None,
+                 max_body: int = 1 << 20):
+        self.handler = handler
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.put_timeout = put_timeout
+        self.workers = workers
+        self.secret = secret
+        self.max_body = max_body
+        self.host = None
+        self.port = None
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._httpd = None
+        self.reset()
+
+    def reset(self):
+        """
+        Resets the metrics
+        """
+        with self._lock:
+            self._started = time.monotonic()
+            self._counts = dict.fromkeys(('received', 'invalid', 'unauthorized', 'rejected', 'delivered', 'batches',
+                                          'handler_errors'), 0)
+            self._max_depth = 0
+            self._latency = 0.0
+            self._handler_time = 0.0
+
+    def start(self) -> 'WebhookReceiver':
+        """
+        Starts the delivery threads. serve() and the context manager call it.
+        """
+        if not self._threads:
+            self._threads = [threading.Thread(target=self._deliver, daemon=True) for _ in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+        return self
+
+    def serve(self, host: str = '0.0.0.0', port: int = 8080) -> 'WebhookReceiver':
+        """
+        Starts the delivery threads and a standalone HTTP server in a background thread
+
+        ### Args:
+            * host (str): The interface to listen on. Defaults to '0.0.0.0'.
+            * port (int): The port to listen on. 0 picks a free port. Defaults to 8080.
+        """
+        self.start()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self.host, self.port = host, self._httpd.server_address[1]
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """
+        Stops the HTTP server, delivers the events still queued and stops the delivery threads
+        """
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def submit(self, body: Union[bytes, str, Dict]) -> Tuple[int, Dict]:
+        """
+        Validates and queues one webhook payload, and returns the HTTP status and JSON body to answer with.
+        The WSGI, ASGI and standalone servers call it for every request.
+
+        ### Args:
+            * body (bytes | str | Dict): The raw request body, or the already decoded payload
+        """
+        status, response, event = self._parse(body)
+        if event is None:
+            return status, response
+        try:
+            self._queue.put((time.monotonic(), event), timeout=self.put_timeout)
+        except queue.Full:
+            return self._reject()
+        return self._accepted()
+
+    async def asubmit(self, body: Union[bytes, str, Dict]) -> Tuple[int, Dict]:
+        """
+        Same as submit, but waits for room in a full queue without blocking the event loop
+        """
+        status, response, event = self._parse(body)
+        if event is None:
+            return status, response
+        deadline = time.monotonic() + self.put_timeout
+        while True:
+            try:
+                self._queue.put_nowait((time.monotonic(), event))
+                return self._accepted()
+            except queue.Full:
+                if time.monotonic() >= deadline:
+                    return self._reject()
+                await asyncio.sleep(0.01)
+
+    def _parse(self, body) -> Tuple[int, Dict, Union[WebhookEvent, None]]:
+        try:
+            event = parse_event(body)
+        except ValueError as e:
+            self._count('invalid')
+            return 400, {'error': str(e)}, None
+        if self.secret is not None and not hmac.compare_digest(str(event.secret_key or ''), self.secret):
+            self._count('unauthorized')
+            return 401, {'error': 'Invalid secret_key'}, None
+        return 200, {}, event
+
+    def _accepted(self) -> Tuple[int, Dict]:
+        with self._lock:
+            self._counts['received'] += 1
+            self._max_depth = max(self._max_depth, self._queue.qsize())
+        return 200, {'ok': True}
+
+    def _reject(self) -> Tuple[int, Dict]:
+        self._count('rejected')
+        return 503, {'error': 'Receiver queue is full, retry later'}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _deliver(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[float, WebhookEvent]]):
+        started = time.monotonic()
+        try:
+            self.handler([event for _, event in batch])
+            failed = False
+        except Exception:
+            failed = True
+        finished = time.monotonic()
+        with self._lock:
+            self._counts['batches'] += 1
+            self._handler_time += finished - started
+            if failed:
+                self._counts['handler_errors'] += 1
+            else:
+                self._counts['delivered'] += len(batch)
+                self._latency += sum(finished - queued for queued, _ in batch)
+
+    def snapshot(self) -> Dict:
+        """
+        Returns the throughput metrics since the receiver was created or reset: the number of events
+        received, rejected as invalid, unauthorized or because the queue was full, and delivered, the number of
+        batches and failed batches, the current and maximum queue depth, events_per_second delivered, and the
+        mean delivery_latency (from queueing to the end of the handler) and handler_time per batch in seconds.
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            counts = dict(self._counts)
+            return {
+                **counts,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_depth,
+                'events_per_second': counts['delivered'] / elapsed if elapsed else 0.0,
+                'delivery_latency': self._latency / counts['delivered'] if counts['delivered'] else 0.0,
+                'handler_time': self._handler_time / counts['batches'] if counts['batches'] else 0.0,
+            }
+
+    @property
+    def url(self) -> Union[str, None]:
+        """
+        The local url of the standalone server once serve() was called, e.g. http://0.0.0.0:8080/
+        """
+        return None if self.port is None else f'http://{self.host}:{self.port}/'
+
+    def wsgi_app(self, environ: Dict, start_response: Callable):
+        """
+        WSGI application accepting webhook events POSTed to any path
+        """
+        if environ['REQUEST_METHOD'] != 'POST':
+            status, response = 405, {'error': 'Method not allowed'}
+        else:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            if length > self.max_body:
+                status, response = 413, {'error': 'Payload too large'}
+            else:
+                status, response = self.submit(environ['wsgi.input'].read(length))
+        data, headers = _encode_response(status, response)
+        start_response(f'{status} {_REASONS[status]}', headers)
+        return [data]
+
+    async def asgi_app(self, scope: Dict, receive: Callable, send: Callable):
+        """
+        ASGI application accepting webhook events POSTed to any path
+        """
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    self.start()
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await asyncio.get_running_loop().run_in_executor(None, self.stop)
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['method'] != 'POST':
+            status, response = 405, {'error': 'Method not allowed'}
+        else:
+            chunks, size, more = [], 0, True
+            while more and size <= self.max_body:
+                message = await receive()
+                chunks.append(message.get('body', b''))
+                size += len(chunks[-1])
+                more = message.get('more_body', False)
+            if size > self.max_body:
+                status, response = 413, {'error': 'Payload too large'}
+            else:
+                status, response = await self.asubmit(b''.join(chunks))
+        data, headers = _encode_response(status, response)
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(name.lower().encode(), value.encode()) for name, value in headers]})
+        await send({'type': 'http.response.body', 'body': data})
+
+    def register(self, client: Smartlead, campaign_ids: Iterable[int], webhook_url: str,
+                 event_types: Union[List[str], None] = None, categories: Union[List[str], None] = None,
+                 name: str = 'Smartlead webhook receiver', max_concurrency: int = 8) -> Dict[int, Union[Dict, str]]:
+        """
+        Subscribes webhook_url to the events of every campaign with campaigns.update_webhook. A campaign's
+        webhook already pointing at webhook_url is updated rather than duplicated. Returns the response of
+        every campaign, or the error for the ones that failed.
+
+        ### Args:
+            * client (Smartlead): The client to register with
+            * campaign_ids (Iterable[int]): The campaigns to subscribe to
+            * webhook_url (str): The public url of this receiver
+            * event_types (List[str], optional): The event types to subscribe to. Defaults to every type in
+              event_classes.
+            * categories (List[str], optional): The lead categories to subscribe to. Defaults to [].
+            * name (str): The name of the webhook. Defaults to 'Smartlead webhook receiver'.
+            * max_concurrency (int): The number of campaigns registered at once. Defaults to 8.
+        """
+        if isinstance(client, AsyncSmartlead):
+            raise TypeError('register needs a Smartlead client, not an AsyncSmartlead one')
+        campaigns = client.v1.campaigns
+
+        def run(campaign_id):
+            try:
+                webhooks = campaigns.get_webhooks(campaign_id)
+                webhook_id = next((webhook.get('id') for webhook in webhooks or []
+                                   if isinstance(webhook, dict) and webhook.get('webhook_url') == webhook_url), None)
+                response = campaigns.update_webhook(campaign_id, webhook_id, name, webhook_url,
+                                                    event_types or list(event_classes), categories or [])
+                return campaign_id, _response_error(response) or response
+            except Exception as e:
+                return campaign_id, str(e)
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            return dict(executor.map(run, list(campaign_ids)))
+
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+            503: 'Service Unavailable'}
+
+
+def _encode_response(status: int, response: Dict) -> Tuple[bytes, List[Tuple[str, str]]]:
+    data = json.dumps(response).encode()
+    headers = [('Content-Type', 'application/json'), ('Content-Length', str(len(data)))]
+    if status == 503:
+        headers.append(('Retry-After', '1'))
+    return data, headers
+
+
+def _make_handler(receiver: WebhookReceiver):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > receiver.max_body:
+                self.close_connection = True
+                self._send(413, {'error': 'Payload too large'})
+            else:
+                self._send(*receiver.submit(self.rfile.read(length)))
+
+        def do_GET(self):
+            self._send(405, {'error': 'Method not allowed'})
+
+        def _send(self, status: int, response: Dict):
+            data, headers = _encode_response(status, response)
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler